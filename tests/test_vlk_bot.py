@@ -2,6 +2,7 @@ import datetime
 import re
 from unittest.mock import MagicMock, AsyncMock
 
+import numpy as np
 import pandas as pd
 import pytest
 from telegram import Update, User, Message, Chat
@@ -18,11 +19,16 @@ from vlk_bot.handlers_admin import grant_admin, perform_queue_cleanup
 from vlk_bot.handlers_common import start
 from vlk_bot.handlers_join import join_start, join_get_id, join_get_date
 from vlk_bot.keyboards import MAIN_KEYBOARD, date_keyboard
-from vlk_bot.prediction import calculate_prediction
+from vlk_bot.prediction import calculate_prediction, calculate_daily_entry_probability, clear_prediction_cache
+from vlk_bot.sheets import invalidate_queue_cache, materialize_queue_df
 from vlk_bot.utils import (
     get_ordinal_date,
+    get_ordinal_dates,
     get_date_from_ordinal,
     extract_main_id,
+    id_to_numeric,
+    ids_to_numeric,
+    parse_date_ddmmyyyy,
     is_admin,
     is_banned,
 )
@@ -83,6 +89,9 @@ def mock_prediction_disabled(monkeypatch):
     monkeypatch.setattr('vlk_bot.sync.sync_daily_sheets', lambda *a, **kw: True)
     monkeypatch.setattr('vlk_bot.sync.load_attendance_from_json', lambda *a, **kw: None)
     monkeypatch.setattr('vlk_bot.sync.get_historical_attendance_data', lambda *a, **kw: None)
+    clear_prediction_cache()
+    yield
+    clear_prediction_cache()
 
 
 @pytest.fixture
@@ -104,13 +113,13 @@ def mock_join_flow(monkeypatch, empty_queue_df):
 @pytest.fixture
 def mock_admin_config(monkeypatch):
     """Налаштовує моки для адмін-команд."""
-    admin_ids = [12345]
+    admin_ids = frozenset({12345})
     mock_config_obj = MagicMock()
     mock_config_obj.__getitem__ = MagicMock(return_value={'ADMIN_IDS': '12345'})
 
     monkeypatch.setattr(config, 'ADMIN_IDS', admin_ids)
     monkeypatch.setattr(config, 'config', mock_config_obj)
-    monkeypatch.setattr(config, 'save_config', lambda: None)
+    monkeypatch.setattr(config, 'schedule_config_save', lambda: None)
 
     return admin_ids
 
@@ -122,12 +131,28 @@ def test_get_ordinal_date():
     assert get_ordinal_date(datetime.date(1970, 1, 12)) == 5
 
 
+def test_get_ordinal_dates_matches_scalar():
+    # Дати до якірної, вихідні та звичайні робочі дні
+    dates = [datetime.date(1969, 12, 27) + datetime.timedelta(days=i) for i in range(21)]
+    dates += [datetime.date(1955, 6, 4), datetime.date(2025, 3, 1), datetime.date(2025, 3, 2), datetime.date(2025, 3, 3)]
+
+    assert get_ordinal_dates(dates).tolist() == [get_ordinal_date(d) for d in dates]
+
+
 def test_get_date_from_ordinal():
     anchor = datetime.date(1970, 1, 5)
     assert get_date_from_ordinal(0) == anchor
     assert get_date_from_ordinal(5) == datetime.date(1970, 1, 12)
 
 
+def test_parse_date_ddmmyyyy_matches_strptime():
+    assert parse_date_ddmmyyyy("25.12.2025") == datetime.date(2025, 12, 25)
+    assert parse_date_ddmmyyyy("1.2.2025") == datetime.date(2025, 2, 1)
+    for bad in ("31.02.2025", "25.12.25", "25.12.2025x", ""):
+        with pytest.raises(ValueError):
+            parse_date_ddmmyyyy(bad)
+
+
 def test_extract_main_id():
     assert extract_main_id("123") == 123
     assert extract_main_id("123/1") == 123
@@ -135,18 +160,42 @@ def test_extract_main_id():
     assert extract_main_id(123) is None
 
 
+def test_ids_to_numeric_matches_scalar():
+    values = ["1234", "1234/1", " 77/12 ", "12/", "12a", "", "abc", "5/x"]
+    result = ids_to_numeric(values)
+    for value, numeric in zip(values, result):
+        expected = id_to_numeric(value)
+        if expected is None:
+            assert np.isnan(numeric)
+        else:
+            assert numeric == expected
+
+
 def test_is_admin(monkeypatch):
-    monkeypatch.setattr(config, 'ADMIN_IDS', [123, 456])
+    monkeypatch.setattr(config, 'ADMIN_IDS', frozenset({123, 456}))
     assert is_admin(123) is True
     assert is_admin(999) is False
 
 
 def test_is_banned(monkeypatch):
-    monkeypatch.setattr(config, 'BANLIST', [111])
+    monkeypatch.setattr(config, 'BANLIST', frozenset({111}))
     assert is_banned(111) is True
     assert is_banned(222) is False
 
 
+def test_status_state_round_trip(monkeypatch, tmp_path):
+    from vlk_bot.utils import load_status_state, save_status_state
+
+    monkeypatch.setattr(config, 'STATUS_FILE', str(tmp_path / 'status.json'))
+    assert load_status_state() == {}
+
+    state = {'100': {'date': '01.01.2025', 'status': 'Ухвалено', 'modified': '', 'confirmation': 'Підтверджено'}}
+    save_status_state(state)
+
+    assert load_status_state() == state
+    assert 'Ухвалено' in (tmp_path / 'status.json').read_text(encoding='utf8')
+
+
 def test_calculate_end_date():
     start = datetime.date(2023, 1, 2)
     assert calculate_end_date(start, 2) == datetime.date(2023, 1, 3)
@@ -159,7 +208,7 @@ def test_date_keyboard_format():
     buttons = keyboard.keyboard
     first_button_text = buttons[0][0].text
 
-    assert "02.12.25" in first_button_text
+    assert first_button_text.startswith("Вт: 02.12.25")
     assert re.search(r'\d{2}\.\d{2}\.\d{2}', first_button_text)
 
 
@@ -200,14 +249,142 @@ def test_calculate_prediction_valid():
     assert isinstance(res['h90'], datetime.date)
 
 
+def test_t_cdf_matches_scipy():
+    from scipy import stats
+    from vlk_bot.prediction import t_cdf
+
+    x = np.arange(20000, 20020, dtype=float)
+    expected = stats.t.cdf(x, 7.3, loc=20005.2, scale=3.1)
+    assert np.allclose(t_cdf(x, 7.3, 20005.2, 3.1), expected, rtol=0, atol=1e-12)
+
+
+def test_prediction_cache_invalidated_by_attendance_revision(mock_prediction_disabled, monkeypatch):
+    calls = []
+    revision = {'value': 1}
+
+    def fake_prediction(user_id, **kwargs):
+        calls.append(user_id)
+        return {'mean': user_id}
+
+    monkeypatch.setattr('vlk_bot.prediction.calculate_prediction_with_daily_data', fake_prediction)
+    monkeypatch.setattr('vlk_bot.sync.get_attendance_revision', lambda *a, **kw: revision['value'])
+
+    calculate_prediction(100)
+    calculate_prediction(100)
+    assert calls == [100]
+
+    revision['value'] = 2
+    calculate_prediction(100)
+    assert calls == [100, 100]
+
+    # Без attendance_data.json прогноз не кешується
+    revision['value'] = None
+    calculate_prediction(100)
+    calculate_prediction(100)
+    assert calls == [100, 100, 100, 100]
+
+
+def test_attendance_json_read_once_per_revision(mock_prediction_disabled, monkeypatch):
+    loads = []
+    points = [{'date': f'2025-01-{day:02d}', 'id': str(5000 + day * 10), 'is_live': False} for day in range(6, 16)]
+
+    def fake_load(*args, **kwargs):
+        loads.append(1)
+        return {'attendance_points': points}
+
+    monkeypatch.setattr('vlk_bot.sync.load_attendance_from_json', fake_load)
+    monkeypatch.setattr('vlk_bot.sync.get_attendance_revision', lambda *a, **kw: 1)
+
+    stats_df = pd.DataFrame({'Зайшов': ['10']})
+    result = calculate_daily_entry_probability(['5200', '5210', '5220'], stats_df, datetime.date(2025, 1, 30))
+
+    assert len(loads) == 1
+    assert all(prob > 0 for prob in result.values())
+
+
+def test_attendance_regression_fitted_once_per_dataset(mock_prediction_disabled, monkeypatch):
+    import vlk_bot.prediction as prediction_module
+
+    fits = []
+    original_fit = prediction_module._fit_regression
+    monkeypatch.setattr(prediction_module, '_fit_regression', lambda df: fits.append(1) or original_fit(df))
+    points = [{'date': f'2025-01-{day:02d}', 'id': str(5000 + day * 10), 'is_live': False} for day in range(6, 16)]
+    attendance_data = {'attendance_points': points}
+
+    first = prediction_module.calculate_prediction_from_attendance_json(5200, attendance_data)
+    second = prediction_module.calculate_prediction_from_attendance_json(5300, attendance_data)
+    assert len(fits) == 1
+    assert first['dist']['loc'] < second['dist']['loc']
+
+    points.append({'date': '2025-01-16', 'id': '5170', 'is_live': False})
+    prediction_module.calculate_prediction_from_attendance_json(5200, attendance_data)
+    assert len(fits) == 2
+
+
+def test_daily_entry_probability_falls_back_per_id(mock_prediction_disabled, monkeypatch):
+    def fake_prediction(user_id, **kwargs):
+        if user_id is None:
+            raise TypeError("некоректний ID")
+        return None
+
+    monkeypatch.setattr('vlk_bot.prediction.calculate_prediction_with_daily_data', fake_prediction)
+    monkeypatch.setattr('vlk_bot.prediction.has_prediction_data', lambda: True)
+    stats_df = pd.DataFrame({'Зайшов': ['10', '12', '0', 'x', '15']})
+
+    result = calculate_daily_entry_probability(['5000', 'abc', '5001'], stats_df, datetime.date(2025, 1, 6))
+
+    assert result == {'5000': 100.0, 'abc': 100.0, '5001': 100.0}
+
+
+def test_daily_entry_probability_skips_predictions_without_data(mock_prediction_disabled, monkeypatch):
+    calls = []
+    monkeypatch.setattr('vlk_bot.prediction.calculate_prediction_with_daily_data', lambda user_id, **kw: calls.append(user_id))
+    monkeypatch.setattr('vlk_bot.sync.DAILY_SHEETS_CACHE_DIR', 'missing_daily_sheets_cache')
+    stats_df = pd.DataFrame({'Зайшов': ['1', '2']})
+
+    result = calculate_daily_entry_probability(['5000', '5001'], stats_df, datetime.date(2025, 1, 6))
+
+    assert calls == []
+    assert result == {'5000': 100.0, '5001': 50.0}
+
+
+def test_daily_entry_probability_fallback_matches_counts(mock_prediction_disabled, monkeypatch):
+    monkeypatch.setattr('vlk_bot.prediction.calculate_prediction_with_daily_data', lambda *a, **kw: None)
+    raw_counts = ['4', '', '7', '0', '7', '2', 'x', '9', '5', '3', '6', '8', '1']
+    stats_df = pd.DataFrame({'Зайшов': raw_counts})
+    ids = [str(1000 + i) for i in range(12)]
+
+    result = calculate_daily_entry_probability(ids, stats_df, datetime.date(2025, 1, 6))
+
+    counts = pd.to_numeric(pd.Series(raw_counts), errors='coerce').dropna()
+    counts = counts[counts > 0].tail(10)
+    expected = {uid: round((counts >= rank).sum() / len(counts) * 100, 1) for rank, uid in enumerate(ids, start=1)}
+    assert result == expected
+
+
 @pytest.mark.asyncio
-async def test_start_private_chat(mock_update, mock_context):
+async def test_start_private_chat(mock_update, mock_context, monkeypatch):
+    monkeypatch.setattr(config, 'INFOGRAPHIC_FILE_ID', '')
     mock_update.message.chat.type = 'private'
     await start(mock_update, mock_context)
 
     assert mock_update.message.reply_photo.called or mock_update.message.reply_html.called
 
 
+@pytest.mark.asyncio
+async def test_start_reuses_infographic_file_id(mock_update, mock_context, monkeypatch):
+    monkeypatch.setattr(config, 'INFOGRAPHIC_FILE_ID', '')
+    monkeypatch.setattr(config, 'INFOGRAPHIC_VERSION', '')
+    mock_update.message.reply_photo.return_value.photo = [MagicMock(file_id='small'), MagicMock(file_id='large')]
+
+    await start(mock_update, mock_context)
+    await start(mock_update, mock_context)
+
+    first, second = mock_update.message.reply_photo.call_args_list
+    assert not isinstance(first.kwargs['photo'], str)
+    assert second.kwargs['photo'] == 'large'
+
+
 @pytest.mark.asyncio
 async def test_join_start_banned(mock_update, mock_context, monkeypatch):
     monkeypatch.setattr('vlk_bot.handlers_join.is_banned', lambda _: True)
@@ -286,18 +463,21 @@ async def test_join_get_date_success(mock_update, mock_context, mock_join_flow):
 
     mock_update.message.text = future_date.strftime("%d.%m.%Y")
     config.queue_df = pd.DataFrame(columns=REQUIRED_COLUMNS)
+    config.queue_df.attrs['revision'] = 'r1'
 
     res = await join_get_date(mock_update, mock_context)
 
     assert res == -1
     assert "успішно створили заявку" in mock_update.message.reply_text.call_args[0][0]
-    assert not config.queue_df.empty
-    assert config.queue_df.iloc[-1]['ID'] == '999'
+    queue_df = materialize_queue_df()
+    assert not queue_df.empty
+    assert queue_df.iloc[-1]['ID'] == '999'
+    assert 'revision' not in queue_df.attrs
 
 
 @pytest.mark.asyncio
 async def test_grant_admin_unauthorized(mock_update, mock_context, monkeypatch):
-    monkeypatch.setattr(config, 'ADMIN_IDS', [999])
+    monkeypatch.setattr(config, 'ADMIN_IDS', frozenset({999}))
 
     await grant_admin(mock_update, mock_context)
 
@@ -313,7 +493,8 @@ async def test_grant_admin_success(mock_update, mock_context, mock_admin_config)
 
     await grant_admin(mock_update, mock_context)
 
-    assert 67890 in mock_admin_config
+    assert 67890 in config.ADMIN_IDS
+    assert 12345 in config.ADMIN_IDS
     assert "успішно доданий" in mock_update.message.reply_text.call_args[0][0]
 
 
@@ -347,3 +528,358 @@ async def test_perform_queue_cleanup(sample_queue_df, monkeypatch):
     assert removed >= 1
     assert len(config.queue_df) < 3
     assert '2' in config.queue_df['ID'].values
+
+
+@pytest.mark.asyncio
+async def test_date_reminder_notifies_only_approved_upcoming_visits(monkeypatch):
+    from vlk_bot.scheduler import date_reminder
+    from vlk_bot.sheets import QueueStore
+
+    today = datetime.date.today()
+    fmt = lambda d: d.strftime("%d.%m.%Y")
+    rows = [
+        ['1', fmt(today + datetime.timedelta(days=1)), '', 'Ухвалено', '01.01.2025 10:00:00', '', '101', '', ''],
+        ['2', fmt(today + datetime.timedelta(days=3)), 'нотатка', 'Ухвалено', '01.01.2025 10:00:00', '', '102', '', ''],
+        ['3', fmt(today + datetime.timedelta(days=1)), '', 'На розгляді', '01.01.2025 10:00:00', '', '103', '', ''],
+        ['4', fmt(today + datetime.timedelta(days=2)), '', 'Ухвалено', '01.01.2025 10:00:00', '', '104', '', ''],
+    ]
+    queue_df = QueueStore.from_sheet_values(rows, REQUIRED_COLUMNS).to_dataframe(REQUIRED_COLUMNS)
+    monkeypatch.setattr('vlk_bot.scheduler.load_queue_data_recent', lambda: queue_df)
+    context = MagicMock()
+    context.bot.send_message = AsyncMock()
+
+    await date_reminder(context)
+
+    sent = {call.kwargs['chat_id']: call.kwargs['text'] for call in context.bot.send_message.call_args_list}
+    assert set(sent) == {101, 102}
+    assert 'на завтра' in sent[101]
+    assert 'за 3 дні' in sent[102] and 'нотатка' in sent[102]
+
+
+@pytest.mark.asyncio
+async def test_notify_status_skips_unchanged_revision(monkeypatch):
+    import vlk_bot.scheduler as scheduler
+    from vlk_bot.sheets import QueueStore
+
+    rows = [['1', '01.02.2026', '', 'Ухвалено', '01.01.2026 10:00:00', '', '101', '', '']]
+    queue_df = QueueStore.from_sheet_values(rows, REQUIRED_COLUMNS).to_dataframe(REQUIRED_COLUMNS)
+    queue_df.attrs['revision'] = '42'
+    saved = []
+    monkeypatch.setattr(scheduler, 'load_queue_data_recent', lambda: queue_df.copy(deep=False))
+    monkeypatch.setattr(scheduler, 'load_status_state', lambda: {})
+    monkeypatch.setattr(scheduler, 'save_status_state', saved.append)
+    monkeypatch.setitem(scheduler._NOTIFY_STATUS_STATE, 'revision', None)
+    context = MagicMock()
+    context.bot.send_message = AsyncMock()
+
+    await scheduler.notify_status(context)
+    await scheduler.notify_status(context)
+
+    assert len(saved) == 1
+    assert context.bot.send_message.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_send_user_notification_retries_after_flood_limit(monkeypatch):
+    import vlk_bot.scheduler as scheduler
+    from telegram.error import RetryAfter
+
+    monkeypatch.setattr(scheduler, 'NOTIFICATIONS_PER_SECOND', 1000)
+    monkeypatch.setitem(scheduler._SEND_RATE_STATE, 'next_slot', 0.0)
+    context = MagicMock()
+    context.bot.send_message = AsyncMock(side_effect=[RetryAfter(0), None])
+
+    await scheduler.send_user_notification(context, '101', 'текст')
+
+    assert context.bot.send_message.call_count == 2
+    assert context.bot.send_message.call_args.kwargs['chat_id'] == 101
+
+
+@pytest.mark.asyncio
+async def test_send_visit_poll_retries_after_flood_limit(monkeypatch):
+    import vlk_bot.scheduler as scheduler
+    from telegram.error import RetryAfter
+
+    users = [{'id': '5000', 'tg_id': '101'}, {'id': '5001', 'tg_id': '102'}, {'id': '5002', 'tg_id': ''}]
+    monkeypatch.setattr(scheduler, 'get_users_for_date_from_active_sheet', lambda sheet: users)
+    monkeypatch.setattr(scheduler, 'NOTIFICATIONS_PER_SECOND', 1000)
+    monkeypatch.setitem(scheduler._SEND_RATE_STATE, 'next_slot', 0.0)
+    context = MagicMock()
+    context.bot_data = {'next_reception_sheet': '06.01.2026'}
+    context.bot.send_message = AsyncMock(side_effect=[RetryAfter(0), None, None])
+
+    await scheduler.send_visit_poll(context)
+
+    assert context.bot.send_message.call_count == 3
+    assert {call.kwargs['chat_id'] for call in context.bot.send_message.call_args_list} == {101, 102}
+
+
+def test_split_message_chunks():
+    from vlk_bot.formatters import split_message_chunks
+
+    lines = [f"**{n}.** " + "x" * 90 for n in range(1, 41)]
+    chunks = split_message_chunks("**Черга: 40 записів**\n", lines)
+
+    assert len(chunks) == 3
+    assert all(len(chunk) <= 1500 for chunk in chunks)
+    assert chunks[0].startswith("**Черга: 40 записів**\n\n**1.** ")
+    assert "\n".join(chunks).split("\n")[2:] == lines
+
+
+@pytest.mark.asyncio
+async def test_display_queue_data_uses_latest_record_per_id(mock_update):
+    from vlk_bot.formatters import display_queue_data
+
+    future = datetime.date.today() + datetime.timedelta(days=5)
+    later = future + datetime.timedelta(days=1)
+    df = pd.DataFrame({
+        'ID': ['100', '100', '101', '102'],
+        'Дата': [future.strftime("%d.%m.%Y"), later.strftime("%d.%m.%Y"), future.strftime("%d.%m.%Y"), future.strftime("%d.%m.%Y")],
+        'Статус': ['Ухвалено', 'Ухвалено', 'На розгляді', 'Ухвалено'],
+        'Змінено': ['01.01.2025 10:00:00', '02.01.2025 10:00:00', '01.01.2025 10:00:00', '01.01.2025 10:00:00'],
+    })
+
+    await display_queue_data(mock_update, df, title="Черга:")
+
+    text = mock_update.message.reply_text.call_args.args[0]
+    assert "2 записів" in text
+    assert f"ID: `100`, Дата: `{later.strftime('%d.%m.%Y')}`" in text
+    assert "`101`" not in text
+    assert text.index("`102`") < text.index("`100`")
+
+
+@pytest.mark.asyncio
+async def test_display_queue_data_reuses_render_for_same_revision(mock_update, monkeypatch):
+    from vlk_bot import formatters
+
+    future = (datetime.date.today() + datetime.timedelta(days=5)).strftime("%d.%m.%Y")
+    df = pd.DataFrame({'ID': ['100'], 'Дата': [future], 'Статус': ['Ухвалено'], 'Змінено': ['01.01.2025 10:00:00']})
+    render = MagicMock(wraps=formatters.render_queue_chunks)
+    monkeypatch.setattr(formatters, '_QUEUE_RENDER_CACHE', {})
+    monkeypatch.setattr(formatters, 'render_queue_chunks', render)
+
+    await formatters.display_queue_data(mock_update, df, title="Черга:", revision="r1")
+    await formatters.display_queue_data(mock_update, df, title="Черга:", revision="r1")
+    await formatters.display_queue_data(mock_update, df, title="Черга:", revision="r2")
+    assert render.call_count == 2
+
+    # Після запису в таблицю відрендерене за тією ж версією не використовується
+    invalidate_queue_cache()
+    await formatters.display_queue_data(mock_update, df, title="Черга:", revision="r1")
+
+    assert render.call_count == 3
+    assert mock_update.message.reply_text.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_display_queue_data_refuses_big_queue_in_group(mock_update, monkeypatch):
+    from vlk_bot import formatters
+
+    mock_update.message.chat.type = 'group'
+    future = (datetime.date.today() + datetime.timedelta(days=5)).strftime("%d.%m.%Y")
+    past = (datetime.date.today() - datetime.timedelta(days=5)).strftime("%d.%m.%Y")
+    size = formatters.GROUP_CHAT_QUEUE_LIMIT + 1
+
+    # Уся таблиця велика, але до показу потрапляють лише два ухвалені майбутні записи
+    history = pd.DataFrame({
+        'ID': [str(i) for i in range(size)],
+        'Дата': [past] * (size - 2) + [future] * 2,
+        'Статус': ['Скасовано'] * (size // 2) + ['Ухвалено'] * (size - size // 2),
+        'Змінено': ['01.01.2025 10:00:00'] * size,
+    })
+    await formatters.display_queue_data(mock_update, history, title="Черга:")
+    assert "2 записів" in mock_update.message.reply_text.call_args.args[0]
+
+    approved = pd.DataFrame({
+        'ID': [str(i) for i in range(size)],
+        'Дата': [future] * size,
+        'Статус': ['Ухвалено'] * size,
+        'Змінено': ['01.01.2025 10:00:00'] * size,
+    })
+    await formatters.display_queue_data(mock_update, approved, title="Черга:")
+    assert "особистих повідомленнях" in mock_update.message.reply_text.call_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_perform_queue_cleanup_rules(monkeypatch):
+    today = datetime.date.today()
+    past = (today - datetime.timedelta(days=10)).strftime("%d.%m.%Y")
+    future = (today + datetime.timedelta(days=10)).strftime("%d.%m.%Y")
+    rows = [
+        # ID, Дата, Примітки (мітка рядка), Статус, Змінено, TG ID
+        ('10', past, 'a', 'Ухвалено', '01.01.2024 10:00:00', '7'),
+        ('10', future, 'b', 'На розгляді', '01.01.2025 10:00:00', '7'),
+        ('20', future, 'c', 'Ухвалено', '01.01.2024 10:00:00', '8'),
+        ('20', future, 'd', 'Ухвалено', '01.01.2025 10:00:00', '8'),
+        ('30', future, 'e', 'На розгляді', '01.01.2024 10:00:00', '9'),
+        ('30', future, 'f', 'На розгляді', '01.01.2025 10:00:00', '9'),
+        ('40', past, 'g', 'Ухвалено', '01.01.2024 10:00:00', '5'),
+        ('40', future, 'h', 'Ухвалено', '01.01.2025 10:00:00', '6'),
+        ('50', future, 'i', ' Відхилено ', '01.01.2025 10:00:00', '4'),
+    ]
+    df = pd.DataFrame(rows, columns=['ID', 'Дата', 'Примітки', 'Статус', 'Змінено', 'TG ID'])
+    for col in REQUIRED_COLUMNS:
+        if col not in df.columns:
+            df[col] = ''
+
+    monkeypatch.setattr('vlk_bot.handlers_admin.load_queue_data', lambda: df[REQUIRED_COLUMNS])
+    monkeypatch.setattr('vlk_bot.handlers_admin.save_queue_data_full', lambda _: True)
+
+    removed = await perform_queue_cleanup()
+
+    assert removed == 3
+    assert config.queue_df['Примітки'].tolist() == ['b', 'd', 'e', 'f', 'g', 'h']
+
+
+def test_load_queue_data_uses_cache_when_revision_unchanged(monkeypatch, tmp_path):
+    import vlk_bot.sheets as sheets
+
+    sheets_service = MagicMock()
+    values_get = sheets_service.spreadsheets.return_value.values.return_value.get
+    values_get.return_value.execute.return_value = {
+        'values': [REQUIRED_COLUMNS, ['100', '01.01.2025', '', 'Ухвалено', '01.01.2025 10:00:00']]
+    }
+    drive_service = MagicMock()
+    drive_service.files.return_value.get.return_value.execute.return_value = {
+        'version': '7', 'modifiedTime': '2025-01-01T10:00:00Z'
+    }
+    monkeypatch.setattr(config, 'SHEETS_SERVICE', sheets_service)
+    monkeypatch.setattr(config, 'DRIVE_SERVICE', drive_service)
+    monkeypatch.setattr(config, 'QUEUE_CACHE_FILE', str(tmp_path / 'queue_cache.parquet'))
+    monkeypatch.setitem(sheets._QUEUE_CACHE, 'disk_checked', False)
+    sheets.invalidate_queue_cache()
+
+    first = sheets.load_queue_data()
+    second = sheets.load_queue_data()
+
+    assert values_get.call_count == 1
+    assert second.equals(first)
+    assert second is not first
+
+    sheets.invalidate_queue_cache()
+    sheets.load_queue_data()
+    assert values_get.call_count == 2
+
+    # Після перезапуску черга береться з локального файлу, якщо версія таблиці не змінилась
+    sheets.invalidate_queue_cache()
+    sheets._QUEUE_CACHE['disk_checked'] = False
+    restored = sheets.load_queue_data()
+    assert values_get.call_count == 2
+    assert restored.equals(first)
+    sheets.invalidate_queue_cache()
+
+
+def test_load_queue_data_recent_reuses_frame_until_invalidated(monkeypatch):
+    import vlk_bot.sheets as sheets
+
+    loads = []
+    monkeypatch.setattr(sheets, 'load_queue_data', lambda: loads.append(1) or pd.DataFrame({'ID': ['1']}))
+    sheets.invalidate_queue_cache()
+
+    first = sheets.load_queue_data_recent()
+    first['extra'] = 1
+    second = sheets.load_queue_data_recent()
+
+    assert len(loads) == 1
+    assert 'extra' not in second.columns
+    sheets.invalidate_queue_cache()
+    sheets.load_queue_data_recent()
+    assert len(loads) == 2
+    sheets.invalidate_queue_cache()
+
+
+def test_save_queue_data_full_writes_before_clearing_tail(monkeypatch):
+    import vlk_bot.sheets as sheets
+
+    sheets_service = MagicMock()
+    values_api = sheets_service.spreadsheets.return_value.values.return_value
+    monkeypatch.setattr(config, 'SHEETS_SERVICE', sheets_service)
+
+    df = pd.DataFrame({'ID': ['100', '101'], 'Дата': ['01.01.2025', ''], 'Дата_dt': [pd.NaT, pd.NaT]})
+    assert sheets.save_queue_data_full(df)
+
+    written = values_api.update.call_args.kwargs['body']['values']
+    assert written[0] == REQUIRED_COLUMNS
+    assert written[1] == ['100', '01.01.2025'] + [''] * (len(REQUIRED_COLUMNS) - 2)
+    assert len(written) == 3
+    cleared = values_api.batchClear.call_args.kwargs['body']['ranges']
+    assert cleared[0].endswith('!A4:Z')
+    values_api.clear.assert_not_called()
+
+
+def test_save_queue_data_appends_dict_entry(monkeypatch):
+    import vlk_bot.sheets as sheets
+
+    sheets_service = MagicMock()
+    values_api = sheets_service.spreadsheets.return_value.values.return_value
+    monkeypatch.setattr(config, 'SHEETS_SERVICE', sheets_service)
+
+    assert sheets.save_queue_data({'ID': '100', 'Дата': '01.01.2025'})
+
+    appended = values_api.append.call_args.kwargs['body']['values']
+    assert appended == [['100', '01.01.2025'] + [''] * (len(REQUIRED_COLUMNS) - 2)]
+
+
+def test_get_parsed_dates_parses_only_missing_rows():
+    from vlk_bot.sheets import get_parsed_dates
+
+    df = pd.DataFrame({
+        'Змінено': ['01.01.2025 10:00:00', '02.01.2025 11:00:00'],
+        'Змінено_dt': [pd.Timestamp('2025-01-01 10:00:00'), pd.NaT],
+    })
+
+    parsed = get_parsed_dates(df, 'Змінено')
+
+    assert parsed.tolist() == [pd.Timestamp('2025-01-01 10:00:00'), pd.Timestamp('2025-01-02 11:00:00')]
+    assert get_parsed_dates(df.drop(columns=['Змінено_dt']), 'Змінено').equals(parsed)
+
+
+def test_get_status_norm_fills_rows_added_after_load():
+    from vlk_bot.sheets import QueueStore, get_status_norm
+
+    store = QueueStore.from_sheet_values([['1', '', '', ' Ухвалено'], ['2', '', '', 'інше']], REQUIRED_COLUMNS)
+    df = pd.concat([store.to_dataframe(REQUIRED_COLUMNS), pd.DataFrame([{'ID': '3', 'Статус': 'Відхилено'}])], ignore_index=True)
+
+    status = get_status_norm(df)
+
+    assert df['Статус'].tolist()[:2] == ['Ухвалено', 'інше']
+    assert status.tolist()[0] == 'ухвалено' and pd.isna(status.tolist()[1]) and status.tolist()[2] == 'відхилено'
+
+
+def test_download_daily_sheets_batches_and_falls_back(monkeypatch, tmp_path):
+    from googleapiclient.errors import HttpError
+    import vlk_bot.sync as sync
+
+    monkeypatch.setattr(sync, 'DAILY_SHEETS_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(sync, 'DAILY_SHEETS_BATCH_SIZE', 2)
+    monkeypatch.setattr(sync.time, 'sleep', lambda _: None)
+    values_api = MagicMock()
+    values_api.batchGet.return_value.execute.side_effect = [
+        {'valueRanges': [{'values': [['№', 'ID']]}, {}]},
+        HttpError(MagicMock(status=400, reason='Bad Request'), b''),
+    ]
+    values_api.get.return_value.execute.return_value = {'values': [['№', 'ID']]}
+    sheets_service = MagicMock()
+    sheets_service.spreadsheets.return_value.values.return_value = values_api
+
+    saved = sync.download_daily_sheets(sheets_service, 'sheet', ['01.02.2026', '02.02.2026', '03.02.2026'])
+
+    assert saved == 2
+    assert values_api.batchGet.call_count == 2
+    assert values_api.get.call_count == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['2026-02-01.csv', '2026-02-03.csv']
+
+
+def test_spreadsheet_revision_disables_drive_after_403(monkeypatch):
+    from googleapiclient.errors import HttpError
+    import vlk_bot.sheets as sheets
+
+    drive_service = MagicMock()
+    drive_get = drive_service.files.return_value.get
+    drive_get.return_value.execute.side_effect = HttpError(MagicMock(status=403, reason='accessNotConfigured'), b'')
+    monkeypatch.setattr(config, 'DRIVE_SERVICE', drive_service)
+
+    assert sheets.get_spreadsheet_revision('sheet') is None
+    assert sheets.get_spreadsheet_revision('sheet') is None
+    assert drive_get.call_count == 1
+    assert config.DRIVE_SERVICE is None
@@ -23,6 +23,7 @@ from vlk_bot.config import (
     STATUS_GETTING_ID,
     POLL_CONFIRM, POLL_RESCHEDULE, POLL_CANCEL, POLL_DATE,
     POLL_CANCEL_CONFIRM, POLL_CANCEL_ABORT, POLL_CANCEL_RESCHEDULE,
+    STATS_CACHE_TTL_MINUTES, flush_config_save,
 )
 from vlk_bot.handlers_admin import (
     perform_queue_cleanup,
@@ -42,10 +43,15 @@ from vlk_bot.handlers_show import show_start, show_get_option, show_get_date
 from vlk_bot.handlers_status import status_start, status_get_id
 from vlk_bot.keyboards import BUTTON_TEXT_JOIN, BUTTON_TEXT_SHOW, BUTTON_TEXT_CANCEL_RECORD, BUTTON_TEXT_PREDICTION, \
     BUTTON_TEXT_CANCEL_OP, BUTTON_TEXT_STATUS
-from vlk_bot.scheduler import notify_status, date_reminder, check_new_daily_sheet
+from vlk_bot.scheduler import notify_status, date_reminder, check_new_daily_sheet, prefetch_stats
 
 logger = logging.getLogger(__name__)
 
+# Кнопки перевіряються точним порівнянням тексту (filters.Text) замість регулярних виразів,
+# а спільні фільтри створюються один раз для всіх розмов
+CANCEL_OP_FILTER = filters.Text([BUTTON_TEXT_CANCEL_OP])
+USER_INPUT_FILTER = filters.TEXT & ~filters.COMMAND & ~CANCEL_OP_FILTER
+
 
 def main() -> None:
     """Головна функція для запуску бота."""
@@ -53,62 +59,62 @@ def main() -> None:
     
     from vlk_bot.config import TOKEN, ENVIRONMENT
     
-    application = Application.builder().token(TOKEN).build()
+    application = Application.builder().token(TOKEN).post_shutdown(flush_config_save).build()
 
     join_conv_handler = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex(f"^{BUTTON_TEXT_JOIN}$"), join_start)],
+        entry_points=[MessageHandler(filters.Text([BUTTON_TEXT_JOIN]), join_start)],
         states={
             JOIN_GETTING_ID: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(f"^{BUTTON_TEXT_CANCEL_OP}$"), join_get_id)
+                MessageHandler(USER_INPUT_FILTER, join_get_id)
             ],
             JOIN_GETTING_DATE: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(f"^{BUTTON_TEXT_CANCEL_OP}$"), join_get_date)
+                MessageHandler(USER_INPUT_FILTER, join_get_date)
             ],
         },
         fallbacks=[
-            MessageHandler(filters.Regex(f"^{BUTTON_TEXT_CANCEL_OP}$"), cancel_conversation),
+            MessageHandler(CANCEL_OP_FILTER, cancel_conversation),
             CommandHandler("cancel", cancel_conversation),
         ],
     )
 
     cancel_conv_handler = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex(f"^{BUTTON_TEXT_CANCEL_RECORD}$"), cancel_record_start)],
+        entry_points=[MessageHandler(filters.Text([BUTTON_TEXT_CANCEL_RECORD]), cancel_record_start)],
         states={
             CANCEL_GETTING_ID[0]: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(f"^{BUTTON_TEXT_CANCEL_OP}$"), cancel_record_get_id)
+                MessageHandler(USER_INPUT_FILTER, cancel_record_get_id)
             ],
         },
         fallbacks=[
-            MessageHandler(filters.Regex(f"^{BUTTON_TEXT_CANCEL_OP}$"), cancel_conversation),
+            MessageHandler(CANCEL_OP_FILTER, cancel_conversation),
             CommandHandler("cancel", cancel_conversation),
         ],
     )
 
     show_conv_handler = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex(f"^{BUTTON_TEXT_SHOW}$"), show_start)],
+        entry_points=[MessageHandler(filters.Text([BUTTON_TEXT_SHOW]), show_start)],
         states={
             SHOW_GETTING_OPTION: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(f"^{BUTTON_TEXT_CANCEL_OP}$"), show_get_option)
+                MessageHandler(USER_INPUT_FILTER, show_get_option)
             ],
             SHOW_GETTING_DATE: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(f"^{BUTTON_TEXT_CANCEL_OP}$"), show_get_date)
+                MessageHandler(USER_INPUT_FILTER, show_get_date)
             ],
         },
         fallbacks=[
-            MessageHandler(filters.Regex(f"^{BUTTON_TEXT_CANCEL_OP}$"), cancel_conversation),
+            MessageHandler(CANCEL_OP_FILTER, cancel_conversation),
             CommandHandler("cancel", cancel_conversation),
         ],
     )
 
     status_conv_handler = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex(f"^{BUTTON_TEXT_STATUS}$"), status_start)],
+        entry_points=[MessageHandler(filters.Text([BUTTON_TEXT_STATUS]), status_start)],
         states={
             STATUS_GETTING_ID[0]: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(f"^{BUTTON_TEXT_CANCEL_OP}$"), status_get_id)
+                MessageHandler(USER_INPUT_FILTER, status_get_id)
             ],
         },
         fallbacks=[
-            MessageHandler(filters.Regex(f"^{BUTTON_TEXT_CANCEL_OP}$"), cancel_conversation),
+            MessageHandler(CANCEL_OP_FILTER, cancel_conversation),
             CommandHandler("cancel", cancel_conversation),
         ],
     )
@@ -133,7 +139,7 @@ def main() -> None:
     application.add_handler(show_conv_handler)
     application.add_handler(status_conv_handler)
 
-    application.add_handler(MessageHandler(filters.Regex(f"^{BUTTON_TEXT_PREDICTION}$"), prediction_command))
+    application.add_handler(MessageHandler(filters.Text([BUTTON_TEXT_PREDICTION]), prediction_command))
 
     application.add_handler(CallbackQueryHandler(handle_poll_cancel_actions, pattern=f"^({POLL_CANCEL_CONFIRM}|{POLL_CANCEL_ABORT}|{POLL_CANCEL_RESCHEDULE})_"))
     application.add_handler(CallbackQueryHandler(handle_poll_response, pattern=f"^({POLL_CONFIRM}|{POLL_RESCHEDULE}|{POLL_CANCEL})_"))
@@ -189,6 +195,16 @@ def main() -> None:
             replace_existing=True
         )
         
+        scheduler.add_job(
+            prefetch_stats,
+            'cron',
+            hour='8-17',
+            minute=f'*/{STATS_CACHE_TTL_MINUTES}',
+            args=[application],
+            id='prefetch_stats',
+            replace_existing=True
+        )
+        
         scheduler.start()
         logger.info("Заплановані завдання увімкнено")
     else:
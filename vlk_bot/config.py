@@ -2,7 +2,9 @@
 Конфігурація бота та глобальні змінні.
 """
 
+import asyncio
 import configparser
+import io
 import locale
 import logging
 import os
@@ -28,10 +30,10 @@ logging.getLogger('asyncio').setLevel(logging.DEBUG)
 config = configparser.ConfigParser()
 
 TOKEN = ""
-ADMIN_IDS = []
+ADMIN_IDS = frozenset()
 GROUP_ID = ""
 STATUS_FILE = ""
-BANLIST = []
+BANLIST = frozenset()
 ENVIRONMENT = "production"
 SERVICE_ACCOUNT_KEY_PATH = ""
 SPREADSHEET_ID = ""
@@ -40,6 +42,9 @@ STATS_SHEET_ID = ""
 STATS_WORKSHEET_NAME = ""
 ACTIVE_SHEET_ID = ""
 ACTIVE_WORKSHEET_NAME = ""
+# file_id інфографіки на серверах Telegram та версія (час зміни) файлу, для якої його отримано
+INFOGRAPHIC_FILE_ID = ""
+INFOGRAPHIC_VERSION = ""
 
 POLL_CONFIRM = "poll_confirm"
 POLL_RESCHEDULE = "poll_reschedule"
@@ -50,13 +55,20 @@ POLL_CANCEL_CONFIRM = "poll_cancel_confirm"
 POLL_CANCEL_ABORT = "poll_cancel_abort"
 POLL_CANCEL_RESCHEDULE = "poll_cancel_reschedule"
 
-SERVICE_ACCOUNT_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+SERVICE_ACCOUNT_SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/drive.metadata.readonly',
+]
 SHEETS_SERVICE = None
+# Drive API використовується лише для дешевої перевірки версії таблиці (кеш читань)
+DRIVE_SERVICE = None
 CREDS = None
 
 queue_df = None
 
 DAILY_SHEETS_CACHE_DIR = "daily_sheets_cache"
+# Локальна копія черги для холодного старту (перевіряється за версією таблиці)
+QUEUE_CACHE_FILE = "queue_cache.parquet"
 
 JOIN_GETTING_ID, JOIN_GETTING_DATE = range(2)
 CANCEL_GETTING_ID = range(2, 3)
@@ -67,21 +79,96 @@ REQUIRED_COLUMNS = ['ID', 'Дата', 'Примітки', 'Статус', 'Зм
 days_ahead = 15
 
 STATS_CACHE_TTL_MINUTES = 30
+# Протягом скількох секунд заплановані завдання повторно використовують щойно завантажену чергу
+QUEUE_RELOAD_TTL_SECONDS = 30
+
+
+def _parse_id_set(value: str) -> frozenset:
+    """Розбирає ID, розділені комою, у frozenset для швидкої перевірки належності."""
+    return frozenset(int(id_str.strip()) for id_str in value.split(',') if id_str.strip())
+
+
+# Налаштування config.ini: назва змінної модуля -> (секція, функція перетворення)
+_CONFIG_SCHEMA = {
+    'TOKEN': ('BOT_SETTINGS', str),
+    'ADMIN_IDS': ('BOT_SETTINGS', _parse_id_set),
+    'GROUP_ID': ('BOT_SETTINGS', str),
+    'STATUS_FILE': ('BOT_SETTINGS', str),
+    'BANLIST': ('BOT_SETTINGS', _parse_id_set),
+    'SERVICE_ACCOUNT_KEY_PATH': ('GOOGLE_SHEETS', str),
+    'SPREADSHEET_ID': ('GOOGLE_SHEETS', str),
+    'SHEET_NAME': ('GOOGLE_SHEETS', str),
+    'STATS_SHEET_ID': ('GOOGLE_SHEETS', str),
+    'STATS_WORKSHEET_NAME': ('GOOGLE_SHEETS', str),
+    'ACTIVE_SHEET_ID': ('GOOGLE_SHEETS', str),
+    'ACTIVE_WORKSHEET_NAME': ('GOOGLE_SHEETS', str),
+}
+
+
+def _sync_config_from_state():
+    """Переносить поточні списки адміністраторів і заблокованих у config перед записом."""
+    if config.has_section('BOT_SETTINGS'):
+        config['BOT_SETTINGS']['ADMIN_IDS'] = ','.join(map(str, sorted(ADMIN_IDS)))
+        config['BOT_SETTINGS']['BANLIST'] = ','.join(map(str, sorted(BANLIST)))
 
 
 def save_config():
     """Зберігає config.ini."""
+    _sync_config_from_state()
     with open('config.ini', 'w') as configfile:
         config.write(configfile)
 
 
+# Затримка, протягом якої кілька змін налаштувань об'єднуються в один запис config.ini
+CONFIG_SAVE_DELAY_SECONDS = 1
+_config_save_task = None
+
+
+def schedule_config_save():
+    """
+    Планує збереження config.ini у фоні, не блокуючи обробник.
+    Зміни, зроблені до початку запису, потрапляють в один запис файлу.
+    """
+    global _config_save_task
+    if _config_save_task is None or _config_save_task.done():
+        _config_save_task = asyncio.get_running_loop().create_task(_save_config_later())
+
+
+async def _save_config_later():
+    """Чекає CONFIG_SAVE_DELAY_SECONDS і записує config.ini в окремому потоці."""
+    global _config_save_task
+    await asyncio.sleep(CONFIG_SAVE_DELAY_SECONDS)
+    # Наступна зміна вже запланує новий запис
+    _config_save_task = None
+    # Серіалізуємо в потоці event loop, де змінюється config, а у файл пишемо в окремому потоці
+    _sync_config_from_state()
+    buffer = io.StringIO()
+    config.write(buffer)
+    try:
+        await asyncio.to_thread(_write_config_file, buffer.getvalue())
+    except OSError as e:
+        logger.error(f"Не вдалося зберегти config.ini: {e}")
+
+
+async def flush_config_save(application=None):
+    """Одразу записує відкладені зміни config.ini (під час зупинки бота)."""
+    global _config_save_task
+    if _config_save_task is not None and not _config_save_task.done():
+        _config_save_task.cancel()
+        _config_save_task = None
+        save_config()
+
+
+def _write_config_file(content: str):
+    """Записує вміст config.ini на диск."""
+    with open('config.ini', 'w') as configfile:
+        configfile.write(content)
+
+
 def initialize_bot():
     """Ініціалізує бота: завантажує конфігурацію та підключається до Google Sheets."""
-    global TOKEN, ADMIN_IDS, GROUP_ID, STATUS_FILE, BANLIST, ENVIRONMENT
-    global SERVICE_ACCOUNT_KEY_PATH, SPREADSHEET_ID, SHEET_NAME
-    global STATS_SHEET_ID, STATS_WORKSHEET_NAME
-    global ACTIVE_SHEET_ID, ACTIVE_WORKSHEET_NAME
-    global SHEETS_SERVICE, CREDS, queue_df
+    global ENVIRONMENT, INFOGRAPHIC_FILE_ID, INFOGRAPHIC_VERSION
+    global SHEETS_SERVICE, DRIVE_SERVICE, CREDS, queue_df
 
     try:
         try:
@@ -91,23 +178,13 @@ def initialize_bot():
 
         config.read('config.ini')
         
-        TOKEN = config['BOT_SETTINGS']['TOKEN']
-        admin_ids_str = config['BOT_SETTINGS']['ADMIN_IDS']
-        ADMIN_IDS = [int(id_str.strip()) for id_str in admin_ids_str.split(',') if id_str.strip()]
-        GROUP_ID = config['BOT_SETTINGS']['GROUP_ID']
-        STATUS_FILE = config['BOT_SETTINGS']['STATUS_FILE']
-        ban_ids_str = config['BOT_SETTINGS']['BANLIST']
-        BANLIST = [int(id_str.strip()) for id_str in ban_ids_str.split(',') if id_str.strip()]    
-
+        globals().update({
+            name: parse(config[section][name])
+            for name, (section, parse) in _CONFIG_SCHEMA.items()
+        })
         ENVIRONMENT = config['BOT_SETTINGS'].get('ENVIRONMENT', 'production').strip().lower()
-
-        SERVICE_ACCOUNT_KEY_PATH = config['GOOGLE_SHEETS']['SERVICE_ACCOUNT_KEY_PATH']
-        SPREADSHEET_ID = config['GOOGLE_SHEETS']['SPREADSHEET_ID']
-        SHEET_NAME = config['GOOGLE_SHEETS']['SHEET_NAME']
-        STATS_SHEET_ID = config['GOOGLE_SHEETS']['STATS_SHEET_ID']
-        STATS_WORKSHEET_NAME = config['GOOGLE_SHEETS']['STATS_WORKSHEET_NAME']
-        ACTIVE_SHEET_ID = config['GOOGLE_SHEETS']['ACTIVE_SHEET_ID']
-        ACTIVE_WORKSHEET_NAME = config['GOOGLE_SHEETS']['ACTIVE_WORKSHEET_NAME']
+        INFOGRAPHIC_FILE_ID = config['BOT_SETTINGS'].get('INFOGRAPHIC_FILE_ID', '')
+        INFOGRAPHIC_VERSION = config['BOT_SETTINGS'].get('INFOGRAPHIC_VERSION', '')
         
         logger.info("Константи успішно завантажено з config.ini")
 
@@ -132,6 +209,10 @@ def initialize_bot():
         authorized_http = AuthorizedHttp(CREDS, http=http)
         SHEETS_SERVICE = build('sheets', 'v4', http=authorized_http)
         logger.info(f"Успішно підключено до Google Sheets API (timeout={API_TIMEOUT}с).")
+        try:
+            DRIVE_SERVICE = build('drive', 'v3', http=authorized_http)
+        except Exception as e:
+            logger.warning(f"Drive API недоступний, кеш таблиць працюватиме без перевірки версії: {e}")
     except FileNotFoundError:
         logger.error(f"Помилка: Файл ключа сервісного облікового запису не знайдено за шляхом: {SERVICE_ACCOUNT_KEY_PATH}")
         if __name__ == "__main__":
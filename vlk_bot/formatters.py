@@ -4,16 +4,21 @@
 
 import datetime
 import logging
+from functools import lru_cache
 
+import numpy as np
 import pandas as pd
 from telegram import Update
+from telegram.constants import ChatType
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=64)
 def calculate_end_date(start_date, days_count):
     """
     Обчислює кінцеву дату, додаючи вказану кількість робочих днів (Пн-Пт) до початкової дати.
+    Протягом дня викликається з тими самими аргументами, тому результат кешується.
     """
     temp_date = start_date
     added = 0
@@ -34,7 +39,7 @@ def format_prediction_range_text(prediction: dict, today: datetime.date = None,
     Форматує текст діапазону прогнозу з ймовірностями.
     """
     from vlk_bot.keyboards import get_prediction_date_range
-    from vlk_bot.prediction import calculate_date_probability
+    from vlk_bot.prediction import calculate_date_probabilities
     
     if prediction is None:
         return ""
@@ -48,15 +53,11 @@ def format_prediction_range_text(prediction: dict, today: datetime.date = None,
         return ""
     
     try:
-        prob_start = calculate_date_probability(start_date, prediction_dist)
-        
-        if end_date:
-            prob_end = calculate_date_probability(end_date, prediction_dist)
-            end_str = f"`{end_date.strftime('%d.%m.%Y')}` ({prob_end:.0f}%)"
-        else:
-            est_end = calculate_end_date(start_date, days_ahead)
-            prob_end = calculate_date_probability(est_end, prediction_dist)
-            end_str = f"`{est_end.strftime('%d.%m.%Y')}` ({prob_end:.0f}%)"
+        if not end_date:
+            end_date = calculate_end_date(start_date, days_ahead)
+        # Обидві ймовірності одним викликом t_cdf
+        prob_start, prob_end = calculate_date_probabilities([start_date, end_date], prediction_dist)
+        end_str = f"`{end_date.strftime('%d.%m.%Y')}` ({prob_end:.0f}%)"
         
         return f"`{start_date.strftime('%d.%m.%Y')}` ({prob_start:.0f}%) - {end_str}"
     except Exception as e:
@@ -64,45 +65,92 @@ def format_prediction_range_text(prediction: dict, today: datetime.date = None,
         return f"`{prediction.get('mean', today).strftime('%d.%m.%Y')}` - `{prediction.get('h90', today).strftime('%d.%m.%Y')}`"
 
 
+# Відрендерені повідомлення черги: (версія таблиці, заголовок, дата) -> частини тексту
+_QUEUE_RENDER_CACHE = {}
+QUEUE_RENDER_CACHE_SIZE = 8
+# Більшу чергу в групових чатах не показуємо: кілька повідомлень поспіль впираються в ліміти Telegram для груп
+GROUP_CHAT_QUEUE_LIMIT = 50
+
+
+def clear_queue_render_cache():
+    """Скидає кеш відрендерених повідомлень черги (після запису в таблицю)."""
+    _QUEUE_RENDER_CACHE.clear()
+
+
 async def display_queue_data(update: Update, data_frame: pd.DataFrame, 
                              title: str = "Поточна черга:", 
-                             reply_markup=None, iConfirmation=False) -> None:
+                             reply_markup=None, iConfirmation=False,
+                             revision: str | None = None) -> None:
     """
     Відображає чергу з пагінацією.
+    Якщо передано версію таблиці, текст між змінами черги береться з кешу.
+    """
+    # Підтвердження читаються з файлу стану, що змінюється окремо від таблиці, тому не кешуються
+    cache_key = (revision, title, datetime.date.today()) if revision is not None and not iConfirmation else None
+    if cache_key in _QUEUE_RENDER_CACHE:
+        chunks, entry_count = _QUEUE_RENDER_CACHE[cache_key]
+    else:
+        chunks, entry_count = render_queue_chunks(data_frame, title, iConfirmation)
+        if cache_key is not None:
+            if len(_QUEUE_RENDER_CACHE) >= QUEUE_RENDER_CACHE_SIZE:
+                _QUEUE_RENDER_CACHE.pop(next(iter(_QUEUE_RENDER_CACHE)))
+            _QUEUE_RENDER_CACHE[cache_key] = (chunks, entry_count)
+
+    # Ліміт для груп рахується за записами, які справді буде надіслано, а не за розміром усієї таблиці
+    if update.message.chat.type != ChatType.PRIVATE and entry_count > GROUP_CHAT_QUEUE_LIMIT:
+        await update.message.reply_text(
+            "Черга завелика для групового чату. Перегляньте її в особистих повідомленнях з ботом.",
+            reply_markup=reply_markup
+        )
+        return
+
+    if chunks is None:
+        await update.message.reply_text(
+            f"{title}\nЧерга порожня або жоден запис ще не ухвалено. Гарна нагода записатися!", 
+            reply_markup=reply_markup
+        )
+        return
+
+    # Надсилаємо частини по черзі: паралельне надсилання могло б змінити порядок частин черги в чаті
+    for chunk in chunks:
+        await update.message.reply_text(chunk, parse_mode='Markdown', reply_markup=reply_markup)
+
+
+def render_queue_chunks(data_frame: pd.DataFrame, title: str, iConfirmation=False) -> tuple[list | None, int]:
+    """
+    Формує текст черги, розбитий на повідомлення.
+    Повертає (частини тексту, кількість записів); для порожньої черги - (None, 0).
     """
+    from vlk_bot.sheets import get_parsed_dates, get_status_norm
     from vlk_bot.utils import load_status_state
     
-    temp_df = data_frame.copy()
-    temp_df['Змінено_dt'] = pd.to_datetime(temp_df['Змінено'].astype(str), 
-                                            format="%d.%m.%Y %H:%M:%S", 
-                                            dayfirst=True, errors='coerce')
-    temp_df['Змінено_dt'] = temp_df['Змінено_dt'].fillna("01.01.2025 00:00:00")
+    # assign повертає нову таблицю (з copy-on-write - без копіювання даних), вхідна не змінюється
+    temp_df = data_frame.assign(
+        Змінено_dt=get_parsed_dates(data_frame, 'Змінено').fillna(pd.Timestamp("2025-01-01 00:00:00"))
+    )
 
-    temp_df_sorted = temp_df.sort_values(by=['ID', 'Змінено_dt'], ascending=[True, True])
-    actual_records = temp_df_sorted.drop_duplicates(subset='ID', keep='last')
+    # Найновіший запис кожного ID без сортування всієї таблиці; обхід у зворотному порядку,
+    # щоб при однаковому 'Змінено' перемагав пізніше доданий рядок
+    latest_idx = temp_df.iloc[::-1].groupby('ID', sort=False, observed=True)['Змінено_dt'].idxmax()
+    actual_records = temp_df.loc[latest_idx]
 
     actual_queue = actual_records[
-        (actual_records['Дата'].astype(str).str.strip() != '') &
-        (actual_records['Статус'].astype(str).str.strip().str.lower() == 'ухвалено')
-    ].copy()
+        (actual_records['Дата'] != '') &
+        (get_status_norm(actual_records) == 'ухвалено')
+    ]
 
     if actual_queue.empty:
-        await update.message.reply_text(
-            f"{title}\nЧерга порожня або жоден запис ще не ухвалено. Гарна нагода записатися!", 
-            reply_markup=reply_markup
-        )
-        return
+        return None, 0
 
     try:
-        current_date_obj = datetime.date.today()
-        actual_queue['Дата_dt'] = pd.to_datetime(actual_queue['Дата'].astype(str), 
-                                                  format="%d.%m.%Y", 
-                                                  dayfirst=True, errors='coerce')
-        actual_queue = actual_queue.dropna(subset=['Дата_dt'])
+        today_ts = pd.Timestamp(datetime.date.today())
+        actual_queue = actual_queue.assign(
+            Дата_dt=get_parsed_dates(actual_queue, 'Дата')
+        ).dropna(subset=['Дата_dt'])
 
         sorted_df_for_display = actual_queue.sort_values(
             by=['Дата_dt', 'ID'], ascending=[True, True]
-        ).loc[actual_queue['Дата_dt'].dt.date >= current_date_obj].drop(
+        ).loc[actual_queue['Дата_dt'] >= today_ts].drop(
             columns=['Дата_dt', 'Змінено_dt']
         )
     except Exception as e:
@@ -111,42 +159,46 @@ async def display_queue_data(update: Update, data_frame: pd.DataFrame,
             by=['Дата', 'ID'], ascending=[True, True]
         ).drop(columns=['Змінено_dt'])
 
-    queue_lines = []
+    ids = sorted_df_for_display['ID'].to_numpy()
+    dates = sorted_df_for_display['Дата'].to_numpy()
     if iConfirmation:
-        last_known_state = load_status_state()       
-        for index, row in sorted_df_for_display.iterrows():
-            last_status_info = last_known_state.get(row['ID'])
-            queue_lines.append(
-                f"**{len(queue_lines) + 1}.** ID: `{row['ID']}`, "
-                f"Дата: `{row['Дата']}`, `{last_status_info['confirmation']}`"
-            )
-    else:    
-        for index, row in sorted_df_for_display.iterrows():
-            queue_lines.append(f"**{len(queue_lines) + 1}.** ID: `{row['ID']}`, Дата: `{row['Дата']}`")
+        last_known_state = load_status_state()
+        confirmations = [last_known_state.get(user_id, {}).get('confirmation', '') for user_id in ids]
+        queue_lines = [
+            f"**{n}.** ID: `{user_id}`, Дата: `{date}`, `{confirmation}`"
+            for n, (user_id, date, confirmation) in enumerate(zip(ids, dates, confirmations), start=1)
+        ]
+    else:
+        queue_lines = [
+            f"**{n}.** ID: `{user_id}`, Дата: `{date}`"
+            for n, (user_id, date) in enumerate(zip(ids, dates), start=1)
+        ]
     
     base_queue_text = f"**{title} {sorted_df_for_display.shape[0]} записів**\n"
-    current_message_parts = [base_queue_text]
-    current_part_length = len(base_queue_text)
-    MAX_MESSAGE_LENGTH = 1500
-
-    for line in queue_lines:
-        if current_part_length + len(line) + 1 > MAX_MESSAGE_LENGTH:
-            await update.message.reply_text(
-                current_message_parts[-1], parse_mode='Markdown', reply_markup=reply_markup
-            )
-            current_message_parts.append(line)
-            current_part_length = len(line)
-        else:
-            if len(current_message_parts) == 1:
-                current_message_parts[0] += f"\n{line}"
-            else:
-                current_message_parts[-1] += f"\n{line}"
-            current_part_length += len(line) + 1
-
-    if current_message_parts[-1]:
-        await update.message.reply_text(
-            current_message_parts[-1], parse_mode='Markdown', reply_markup=reply_markup
-        )
+    return split_message_chunks(base_queue_text, queue_lines), len(queue_lines)
+
+
+def split_message_chunks(header: str, lines: list, max_length: int = 1500) -> list:
+    """
+    Розбиває заголовок і рядки на повідомлення не довші за max_length.
+    Перше повідомлення починається із заголовка.
+    """
+    # bounds[i] - довжина перших i рядків разом з роздільниками '\n'
+    lengths = np.fromiter((len(line) + 1 for line in lines), dtype=np.int64, count=len(lines))
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    
+    end = max(int(np.searchsorted(bounds, max_length - len(header), side='right')) - 1, 0)
+    first_chunk = '\n'.join([header, *lines[:end]]) if end else header
+    chunks = [first_chunk] if first_chunk else []
+    
+    start = end
+    while start < len(lines):
+        # Кожне наступне повідомлення містить щонайменше один рядок
+        end = int(np.searchsorted(bounds, bounds[start] + max_length + 1, side='right')) - 1
+        end = max(end, start + 1)
+        chunks.append('\n'.join(lines[start:end]))
+        start = end
+    return chunks
 
 
 def get_poll_text(user_id: str, date: str) -> str:
@@ -2,6 +2,7 @@
 Обробники адмін-команд.
 """
 
+import asyncio
 import datetime
 import logging
 from functools import wraps
@@ -10,10 +11,12 @@ import pandas as pd
 from telegram import Update
 from telegram.ext import ContextTypes
 
+import vlk_bot.config as config_module
 from vlk_bot.formatters import get_poll_text
 from vlk_bot.keyboards import MAIN_KEYBOARD, get_poll_keyboard
 from vlk_bot.sheets import (
-    load_queue_data, save_queue_data_full, get_users_for_date_from_active_sheet
+    load_queue_data, save_queue_data_full, get_users_for_date_from_active_sheet, get_parsed_dates,
+    get_status_norm, STATUS_DTYPE
 )
 from vlk_bot.utils import get_user_log_info, is_admin, get_next_working_days
 
@@ -35,57 +38,60 @@ def admin_only(func):
 
 async def perform_queue_cleanup(logger_info_prefix: str = "Очищення за розкладом"):
     """Виконує логіку очищення черги."""
-    import vlk_bot.config as config_module
-    
     logger.info(f"{logger_info_prefix}: Розпочато розумне очищення черги.")
 
-    queue_df = load_queue_data()
+    queue_df = await asyncio.to_thread(load_queue_data)
     if queue_df is None:
         logger.error(f"{logger_info_prefix}: Не вдалося завантажити чергу для очищення.")
         return -1
         
-    sort_df = queue_df.copy()
+    sort_df = queue_df
     if sort_df.empty:
         logger.info(f"{logger_info_prefix}: Черга вже порожня.")
         return 0
 
     initial_records_count = len(sort_df)
 
-    sort_df['Статус_clean'] = sort_df['Статус'].astype(str).str.strip().str.lower()
-    sort_df['Дата_clean'] = sort_df['Дата'].astype(str).str.strip()
-    sort_df['Дата_dt'] = pd.to_datetime(sort_df['Дата_clean'], format="%d.%m.%Y", dayfirst=True, errors='coerce')
-    sort_df['Змінено_clean'] = sort_df['Змінено'].astype(str).str.strip()
-    sort_df['Змінено_dt'] = pd.to_datetime(sort_df['Змінено_clean'], format="%d.%m.%Y %H:%M:%S", dayfirst=True, errors='coerce')
-    
-    current_date_obj = datetime.date.today()
-    unique_ids = sort_df['ID'].unique()
-    index_to_drop = []
-    # index_to_drop.extend(sort_df.loc[(sort_df['Дата_dt'].dt.date < current_date_obj) & (sort_df['Дата_dt'].notna())].index.tolist())
-    index_to_drop.extend(sort_df.loc[sort_df['Статус_clean'].isin(['відхилено'])].index.tolist())
-  
-    for cur_id in unique_ids:
-        max_mod_idx = sort_df[sort_df['ID'] == cur_id]['Змінено_dt'].idxmax()
-        TG_ID = sort_df['TG ID'][max_mod_idx].strip()
-        #index_to_drop.extend(sort_df.loc[(sort_df['ID'] == cur_id) & (sort_df['Змінено_dt'] < sort_df['Змінено_dt'][max_mod_idx]) & ((sort_df['Дата_dt'].dt.date >= current_date_obj) | (sort_df['Дата_dt'].isna())) & (sort_df['Статус_clean'].isin(['відхилено']))].index.tolist())
-        index_to_drop.extend(sort_df.loc[(sort_df['ID'] == cur_id) & (sort_df['Змінено_dt'] < sort_df['Змінено_dt'][max_mod_idx]) & (sort_df['Дата_dt'].dt.date < current_date_obj) & (sort_df['TG ID'] == TG_ID)].index.tolist())
-        if sort_df['Статус_clean'][max_mod_idx] == 'ухвалено':
-            #index_to_drop.extend(sort_df.loc[(sort_df['ID'] == cur_id) & (sort_df['Змінено_dt'] < sort_df['Змінено_dt'][max_mod_idx]) & (sort_df['Статус_clean'].isin(['на розгляді', 'ухвалено'])) & (sort_df['TG ID'] == TG_ID)].index.tolist())
-            index_to_drop.extend(sort_df.loc[(sort_df['ID'] == cur_id) & (sort_df['Змінено_dt'] < sort_df['Змінено_dt'][max_mod_idx]) & (sort_df['Статус_clean'].isin(['на розгляді', 'ухвалено'])) & (sort_df['TG ID'] == TG_ID)].index.tolist())
-            #index_to_drop.extend(sort_df.loc[(sort_df['ID'] == cur_id) & (sort_df['Змінено_dt'] < sort_df['Змінено_dt'][max_mod_idx]) & (sort_df['Статус_clean'].isin(['на розгляді', 'ухвалено'])) & (sort_df['TG ID'] != TG_ID) & (sort_df['Дата_dt'].isna())].index.tolist())
-            #if pd.notna(sort_df['Дата_dt'][max_mod_idx]):
-                #if sort_df['Дата_dt'].dt.date[max_mod_idx] < current_date_obj:
-                    #index_to_drop.extend(sort_df.loc[(sort_df['ID'] == cur_id) & (sort_df['Змінено_dt'] < sort_df['Змінено_dt'][max_mod_idx]) & (sort_df['Статус_clean'].isin(['на розгляді', 'ухвалено'])) & (sort_df['TG ID'] != TG_ID) & (sort_df['Дата_dt'].dt.date >= current_date_obj)].index.tolist())
-                    
-    unique_index_to_drop = list(set(index_to_drop))
-    records_to_keep = sort_df.drop(index=unique_index_to_drop).copy()
-    
-    for col in ['Статус_clean', 'Дата_clean', 'Дата_dt', 'Змінено_dt', 'Змінено_clean']:
-        if col in records_to_keep.columns:
-            records_to_keep = records_to_keep.drop(columns=[col])
+    # Коди категорій статусу: порівняння цілих чисел замість рядків
+    status_codes = get_status_norm(sort_df).cat.codes.to_numpy()
+    approved_code, rejected_code, pending_code = (
+        STATUS_DTYPE.categories.get_loc(name) for name in ('ухвалено', 'відхилено', 'на розгляді')
+    )
+    # Дати вже розібрані в load_queue_data, тут лише дорозбираються відсутні значення;
+    # проміжні дані тримаємо в локальних масивах, не додаючи стовпців до таблиці
+    visit_dt = get_parsed_dates(sort_df, 'Дата')
+    changed_dt = get_parsed_dates(sort_df, 'Змінено')
+    changed = changed_dt.to_numpy()
+    
+    # Дати без часу, тому порівнюємо з опівночі сьогодні без перетворення в datetime.date
+    today_ts = pd.Timestamp(datetime.date.today())
+    
+    # Для кожного рядка - позиція найновішого запису з тим самим ID (максимальне 'Змінено')
+    latest_pos = changed_dt.reset_index(drop=True).groupby(
+        sort_df['ID'].to_numpy(), sort=False, dropna=False
+    ).transform('idxmax').to_numpy()
+    
+    latest_tg = sort_df['TG ID'].astype(str).str.strip().to_numpy()[latest_pos]
+    is_older = changed < changed[latest_pos]
+    same_tg = sort_df['TG ID'].to_numpy() == latest_tg
+    is_past = (visit_dt < today_ts).to_numpy()
+    latest_approved = status_codes[latest_pos] == approved_code
+    is_active = (status_codes == pending_code) | (status_codes == approved_code)
+    
+    drop_mask = (
+        (status_codes == rejected_code)
+        # Старіші записи того ж користувача на дати, що вже минули
+        | (is_older & same_tg & is_past)
+        # Старіші активні заявки, якщо найновіший запис уже ухвалено
+        | (is_older & same_tg & latest_approved & is_active)
+    )
+    # Розібрані дати залишаємо в queue_df, щоб наступні обробники не розбирали їх знову
+    # Після фільтрації за маскою індекс знову суцільний, як у щойно завантаженої черги
+    records_to_keep = sort_df.assign(Дата_dt=visit_dt, Змінено_dt=changed_dt)[~drop_mask].reset_index(drop=True)
 
     config_module.queue_df = records_to_keep
     
-    if not save_queue_data_full(records_to_keep):
+    if not await asyncio.to_thread(save_queue_data_full, records_to_keep):
         logger.error(f"{logger_info_prefix}: Помилка при збереженні очищеної черги в Google Sheet.")
         return -1
 
@@ -119,7 +125,7 @@ async def open_sheet_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 @admin_only
 async def grant_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Додає користувача до списку адміністраторів."""
-    from vlk_bot.config import ADMIN_IDS, config, save_config
+    from vlk_bot.config import ADMIN_IDS, schedule_config_save
     
     user = update.effective_user
     
@@ -141,9 +147,8 @@ async def grant_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             )
             return
 
-        ADMIN_IDS.append(new_admin_id)
-        config['BOT_SETTINGS']['ADMIN_IDS'] = ','.join(map(str, ADMIN_IDS))
-        save_config()
+        config_module.ADMIN_IDS = ADMIN_IDS | {new_admin_id}
+        schedule_config_save()
 
         logger.info(f"Адміністратор {get_user_log_info(user)} додав нового адміністратора: ID {new_admin_id}.")
         await update.message.reply_text(
@@ -161,7 +166,7 @@ async def grant_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 @admin_only
 async def drop_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Видаляє користувача зі списку адміністраторів."""
-    from vlk_bot.config import ADMIN_IDS, config, save_config
+    from vlk_bot.config import ADMIN_IDS, schedule_config_save
     
     user = update.effective_user
     
@@ -191,9 +196,8 @@ async def drop_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
             )
             return
 
-        ADMIN_IDS.remove(admin_to_remove_id)
-        config['BOT_SETTINGS']['ADMIN_IDS'] = ','.join(map(str, ADMIN_IDS))
-        save_config()
+        config_module.ADMIN_IDS = ADMIN_IDS - {admin_to_remove_id}
+        schedule_config_save()
 
         logger.info(f"Адміністратор {get_user_log_info(user)} видалив адміністратора: ID {admin_to_remove_id}.")
         await update.message.reply_text(
@@ -211,7 +215,7 @@ async def drop_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
 @admin_only
 async def ban(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Додає користувача до списку заблокованих."""
-    from vlk_bot.config import BANLIST, config, save_config
+    from vlk_bot.config import BANLIST, schedule_config_save
     
     user = update.effective_user
     
@@ -233,9 +237,8 @@ async def ban(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             )
             return
 
-        BANLIST.append(new_ban_id)
-        config['BOT_SETTINGS']['BANLIST'] = ','.join(map(str, BANLIST))
-        save_config()
+        config_module.BANLIST = BANLIST | {new_ban_id}
+        schedule_config_save()
 
         logger.info(f"Адміністратор {get_user_log_info(user)} заблокував користувача: ID {new_ban_id}.")
         await update.message.reply_text(
@@ -253,7 +256,7 @@ async def ban(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 @admin_only
 async def unban(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Видаляє користувача зі списку заблокованих."""
-    from vlk_bot.config import BANLIST, config, save_config
+    from vlk_bot.config import BANLIST, schedule_config_save
     
     user = update.effective_user
     
@@ -276,9 +279,8 @@ async def unban(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             )
             return
 
-        BANLIST.remove(unban_id)
-        config['BOT_SETTINGS']['BANLIST'] = ','.join(map(str, BANLIST))
-        save_config()
+        config_module.BANLIST = BANLIST - {unban_id}
+        schedule_config_save()
 
         logger.info(f"Адміністратор {get_user_log_info(user)} видалив користувача зі списку заблокованих: ID {unban_id}.")
         await update.message.reply_text(
@@ -304,7 +306,7 @@ async def test_poll(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if context.args:
         user_id = context.args[0]
     else:
-        users = get_users_for_date_from_active_sheet('')
+        users = await asyncio.to_thread(get_users_for_date_from_active_sheet, '')
         for u in users:
             if u.get('tg_id') == str(requester_id):
                 user_id = u['id']
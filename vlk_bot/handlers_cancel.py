@@ -2,9 +2,9 @@
 ConversationHandler для скасування запису.
 """
 
+import asyncio
 import datetime
 import logging
-import re
 
 import pandas as pd
 from telegram import Update
@@ -12,8 +12,11 @@ from telegram.ext import ContextTypes, ConversationHandler
 
 from vlk_bot.config import CANCEL_GETTING_ID
 from vlk_bot.keyboards import MAIN_KEYBOARD, CANCEL_KEYBOARD
-from vlk_bot.sheets import load_queue_data, save_queue_data
-from vlk_bot.utils import get_user_log_info, get_user_telegram_data, is_banned, send_group_notification
+from vlk_bot.sheets import (
+    load_queue_data, save_queue_data, get_parsed_dates, get_id_records,
+    append_pending_queue_row, materialize_queue_df
+)
+from vlk_bot.utils import get_user_log_info, get_user_telegram_data, is_banned, send_group_notification, QUEUE_ID_RE
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +33,7 @@ async def cancel_record_start(update: Update, context: ContextTypes.DEFAULT_TYPE
         return ConversationHandler.END
     
     import vlk_bot.config as config_module
-    config_module.queue_df = load_queue_data()
+    config_module.queue_df = await asyncio.to_thread(load_queue_data)
 
     if config_module.queue_df is None:
         logger.error(f"Помилка завантаження даних для скасування запису користувача {get_user_log_info(update.effective_user)}.")
@@ -55,15 +58,12 @@ async def cancel_record_start(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 async def cancel_record_get_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Отримує ID для скасування."""
-    import vlk_bot.config as config_module
-    queue_df = config_module.queue_df
+    queue_df = materialize_queue_df()
     
     id_to_cancel = update.message.text.strip()
     telegram_user_data = context.user_data.get('telegram_user_data')
 
-    id_pattern = r"^(\d+|\d+\/\d+)$"
-    
-    if not re.match(id_pattern, id_to_cancel):
+    if not QUEUE_ID_RE.fullmatch(id_to_cancel):
         logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів некоректний ID для скасування: '{id_to_cancel}'")
         await update.message.reply_text(
             "Невірний формат номеру. Будь ласка, введіть ціле число або два цілих числа, розділені слешем (наприклад, `9999` або `9999/1`).",
@@ -72,10 +72,11 @@ async def cancel_record_get_id(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return CANCEL_GETTING_ID[0]
 
-    temp_df_for_prev = queue_df.copy()
-    temp_df_for_prev['Змінено_dt'] = pd.to_datetime(temp_df_for_prev['Змінено'].astype(str), format="%d.%m.%Y %H:%M:%S", dayfirst=True, errors='coerce').fillna("01.01.2025 00:00:00")
-
-    last_record_for_id = temp_df_for_prev[temp_df_for_prev['ID'] == id_to_cancel].sort_values(by='Змінено_dt', ascending=False)
+    # Спершу відбираємо записи цього ID, і лише їх дати дорозбираємо та сортуємо
+    id_records = get_id_records(queue_df, id_to_cancel)
+    last_record_for_id = id_records.assign(
+        Змінено_dt=get_parsed_dates(id_records, 'Змінено').fillna(pd.Timestamp("2025-01-01 00:00:00"))
+    ).sort_values(by='Змінено_dt', ascending=False)
     
     if (not last_record_for_id.empty and last_record_for_id.iloc[0]['Дата'] != '') or (not last_record_for_id.empty and last_record_for_id.iloc[0]['Дата'] == '' and last_record_for_id.iloc[0]['Статус'] == 'Відхилено'):
         previous_date = last_record_for_id.iloc[0]['Дата']
@@ -90,16 +91,18 @@ async def cancel_record_get_id(update: Update, context: ContextTypes.DEFAULT_TYP
             **telegram_user_data
         }
         
-        new_entry_df = pd.DataFrame([new_entry])
-        if save_queue_data(new_entry_df):
-            config_module.queue_df = pd.concat([queue_df, new_entry_df], ignore_index=True)
+        if await asyncio.to_thread(save_queue_data, new_entry):
+            append_pending_queue_row(new_entry)
             logger.info(f"Запис з ID '{id_to_cancel}' на `{previous_date}` успішно скасовано користувачем {get_user_log_info(update.effective_user)}.")
             notification_text = f"❎ Користувач {update.effective_user.mention_html()} скасував запис для\nID <code>{id_to_cancel}</code> на <code>{previous_date}</code>" 
-            await send_group_notification(context, notification_text)
-            await update.message.reply_text(
-                f"Ви успішно створили заявку на скасування дати в черзі!\nВаш ID: `{id_to_cancel}` попередній запис на `{previous_date}`\nСтатус заявки: `На розгляді`\nВаша заявка на розгляді у адміністраторів.\nЯкщо вона буде \"Ухвалена\", то через деякий час зникне з жовтої таблиці 🟡TODO.",
-                parse_mode='Markdown',
-                reply_markup=MAIN_KEYBOARD
+            # Повідомлення в групу і відповідь користувачу йдуть у різні чати, надсилаємо їх одночасно
+            await asyncio.gather(
+                send_group_notification(context, notification_text),
+                update.message.reply_text(
+                    f"Ви успішно створили заявку на скасування дати в черзі!\nВаш ID: `{id_to_cancel}` попередній запис на `{previous_date}`\nСтатус заявки: `На розгляді`\nВаша заявка на розгляді у адміністраторів.\nЯкщо вона буде \"Ухвалена\", то через деякий час зникне з жовтої таблиці 🟡TODO.",
+                    parse_mode='Markdown',
+                    reply_markup=MAIN_KEYBOARD
+                )
             )
         else:
             logger.error(f"Не вдалося зберегти скасування запису для ID '{id_to_cancel}' користувачем {get_user_log_info(update.effective_user)}.")
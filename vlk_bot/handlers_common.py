@@ -17,6 +17,18 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 INFOGRAPHIC_PATH = os.path.join(PROJECT_ROOT, 'infographic.jpg')
 
 
+def _remember_infographic_file_id(file_id: str, version: str):
+    """Запам'ятовує file_id інфографіки, щоб не завантажувати файл у Telegram повторно."""
+    import vlk_bot.config as config_module
+    
+    config_module.INFOGRAPHIC_FILE_ID = file_id
+    config_module.INFOGRAPHIC_VERSION = version
+    if config_module.config.has_section('BOT_SETTINGS'):
+        config_module.config['BOT_SETTINGS']['INFOGRAPHIC_FILE_ID'] = file_id
+        config_module.config['BOT_SETTINGS']['INFOGRAPHIC_VERSION'] = version
+        config_module.schedule_config_save()
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обробник команди /start."""
     user = update.effective_user
@@ -35,16 +47,30 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "* <code>Скасувати ввід</code> - скасувати ввід під час діалогу"
     )
 
+    import vlk_bot.config as config_module
+    
     try:
-        with open(INFOGRAPHIC_PATH, 'rb') as photo:
+        version = str(os.stat(INFOGRAPHIC_PATH).st_mtime_ns)
+        if config_module.INFOGRAPHIC_FILE_ID and config_module.INFOGRAPHIC_VERSION == version:
             await update.message.reply_photo(
-                photo=photo,
+                photo=config_module.INFOGRAPHIC_FILE_ID,
                 caption=caption_text,
                 parse_mode='HTML',
                 reply_markup=MAIN_KEYBOARD
             )
+        else:
+            with open(INFOGRAPHIC_PATH, 'rb') as photo:
+                message = await update.message.reply_photo(
+                    photo=photo,
+                    caption=caption_text,
+                    parse_mode='HTML',
+                    reply_markup=MAIN_KEYBOARD
+                )
+            _remember_infographic_file_id(message.photo[-1].file_id, version)
     except Exception as e:
         logger.error(f"Не вдалося надіслати фото (infographic.jpg): {e}")
+        # Наступний /start завантажить файл заново, якщо збережений file_id став недійсним
+        config_module.INFOGRAPHIC_FILE_ID = ""
         await update.message.reply_html(
             caption_text,
             reply_markup=MAIN_KEYBOARD,
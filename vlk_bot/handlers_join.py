@@ -2,12 +2,12 @@
 ConversationHandler для запису в чергу.
 """
 
+import asyncio
 import datetime
 import logging
 import re
 
 import pandas as pd
-from scipy import stats
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
@@ -16,15 +16,35 @@ from vlk_bot.formatters import format_prediction_range_text, calculate_end_date
 from vlk_bot.keyboards import (
     MAIN_KEYBOARD, CANCEL_KEYBOARD, date_keyboard, date_keyboard_from_prediction
 )
-from vlk_bot.prediction import calculate_prediction, calculate_date_probability
-from vlk_bot.sheets import load_queue_data, save_queue_data, get_stats_data
+from vlk_bot.prediction import calculate_prediction, calculate_date_probability, calculate_date_probabilities
+from vlk_bot.sheets import (
+    load_queue_data, save_queue_data, get_stats_data, get_parsed_dates, get_id_records, get_last_entered_max,
+    append_pending_queue_row, materialize_queue_df
+)
 from vlk_bot.utils import (
     get_user_log_info, get_user_telegram_data, is_admin, is_banned,
-    extract_main_id, get_ordinal_date, send_group_notification
+    extract_main_id, send_group_notification, to_working_day, parse_date_ddmmyyyy, QUEUE_ID_RE
 )
 
 logger = logging.getLogger(__name__)
 
+# Дата у форматі ДД.ММ.РРРР або ДД.ММ.РР з довільним роздільником
+_DATE_RE = re.compile(r'(\d{1,2})\W(\d{1,2})\W(\d{4}|\d{2})')
+
+# Шаблони довгих відповідей (Markdown), заповнюються через format_map
+_DATE_PROMPT_TEMPLATE = (
+    "{warning}"
+    "Виберіть бажану дату запису. Ви можете обрати одну з рекомендованих дат: {prediction_text}\n\n"
+    "Або введіть дату з клавіатури. Дата повинна бути в форматі `ДД.ММ.РРРР`, пізнішою за поточну (`{today}`) та бути робочим днем (Понеділок - П'ятниця)."
+)
+_JOIN_SUCCESS_TEMPLATE = (
+    "Ви успішно створили заявку на запис/перенесння дати в черзі!\n"
+    "Ваш ID: `{user_id}`, Обрана дата: `{date}`\n"
+    "Статус заявки: `На розгляді`\n"
+    "Ваша заявка на розгляді у адміністраторів.\n"
+    "Якщо вона буде \"Ухвалена\", то через деякий час з'явиться в жовтій таблиці 🟡TODO."
+)
+
 
 async def check_id_for_queue(main_id: int, previous_state: str, last_status: str):
     """Перевіряє чи ID може бути записаний в чергу."""
@@ -34,7 +54,7 @@ async def check_id_for_queue(main_id: int, previous_state: str, last_status: str
         return True, ''
     
     try:
-        last_entered = stats_df['Останній номер що зайшов'].dropna().max()
+        last_entered = get_last_entered_max(stats_df)
         
         if main_id and last_entered and main_id <= last_entered:
             if previous_state and last_status == 'Ухвалено':
@@ -59,7 +79,7 @@ async def join_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         return ConversationHandler.END
     
     import vlk_bot.config as config_module
-    config_module.queue_df = load_queue_data()
+    config_module.queue_df = await asyncio.to_thread(load_queue_data)
     
     if config_module.queue_df is None:
         logger.error(f"Помилка завантаження даних для запису користувача {get_user_log_info(update.effective_user)}.")
@@ -84,13 +104,11 @@ async def join_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 async def join_get_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Отримує ID від користувача."""
-    import vlk_bot.config as config_module
-    queue_df = config_module.queue_df
+    queue_df = materialize_queue_df()
     
     user_id_input = update.message.text.strip()
-    id_pattern = r"^(\d+|\d+\/\d+)$"
     
-    if not re.match(id_pattern, user_id_input):
+    if not QUEUE_ID_RE.fullmatch(user_id_input):
         logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів некоректний ID: '{user_id_input}'")
         await update.message.reply_text(
             "Невірний формат номеру. Будь ласка, введіть ціле число або два цілих числа, розділені слешем (наприклад, `9999` або `9999/1`).",
@@ -103,11 +121,12 @@ async def join_get_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     context.user_data.pop('warning_shown', None)
     context.user_data.pop('prediction_bounds', None)
     
-    temp_df_for_prev = queue_df.copy()
-    temp_df_for_prev['Змінено_dt'] = pd.to_datetime(temp_df_for_prev['Змінено'].astype(str), format="%d.%m.%Y %H:%M:%S", dayfirst=True, errors='coerce')
-    temp_df_for_prev['Змінено_dt'] = temp_df_for_prev['Змінено_dt'].fillna("01.01.2025 00:00:00")
-
-    last_record_for_id = temp_df_for_prev[(temp_df_for_prev['ID'] == user_id_input) & (temp_df_for_prev['Статус'] == 'Ухвалено')].sort_values(by='Змінено_dt', ascending=False)
+    # Спершу відбираємо ухвалені записи цього ID, і лише їх дати дорозбираємо та сортуємо
+    id_records = get_id_records(queue_df, user_id_input)
+    id_records = id_records[id_records['Статус'] == 'Ухвалено']
+    last_record_for_id = id_records.assign(
+        Змінено_dt=get_parsed_dates(id_records, 'Змінено').fillna(pd.Timestamp("2025-01-01 00:00:00"))
+    ).sort_values(by='Змінено_dt', ascending=False)
     
     previous_date = ''
     if not last_record_for_id.empty:
@@ -142,8 +161,7 @@ async def join_get_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     if can_register:
         today = datetime.date.today()
         
-        stats_df = await get_stats_data()
-        prediction = calculate_prediction(extract_main_id(user_id_input), stats_df)
+        prediction = await asyncio.to_thread(calculate_prediction, extract_main_id(user_id_input))
         
         prediction_text = ""
         if prediction:
@@ -159,9 +177,11 @@ async def join_get_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
             context.user_data['user_notes'] = 'Остання спроба'
         
         await update.message.reply_text(
-            f"{'УВАГА: '+user_warning if user_warning != '' else ''}"
-            f"Виберіть бажану дату запису. Ви можете обрати одну з рекомендованих дат: {prediction_text}\n\n"
-            f"Або введіть дату з клавіатури. Дата повинна бути в форматі `ДД.ММ.РРРР`, пізнішою за поточну (`{today.strftime('%d.%m.%Y')}`) та бути робочим днем (Понеділок - П'ятниця).",
+            _DATE_PROMPT_TEMPLATE.format_map({
+                'warning': f"УВАГА: {user_warning}" if user_warning != '' else '',
+                'prediction_text': prediction_text,
+                'today': today.strftime('%d.%m.%Y'),
+            }),
             parse_mode='Markdown',
             reply_markup=DATE_KEYBOARD
         )
@@ -178,8 +198,9 @@ async def join_get_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
 
 async def join_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Отримує дату від користувача."""
-    import vlk_bot.config as config_module
-    
+    # Один знімок часу на весь обробник: ті самі 'сьогодні' і 'Змінено' в усіх перевірках
+    now = datetime.datetime.now()
+    today = now.date()
     date_input = update.message.text.strip()
     
     user_id = context.user_data.get('temp_id')
@@ -188,7 +209,7 @@ async def join_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     telegram_user_data = context.user_data.get('telegram_user_data')
 
     #match_full = re.search(r'(\d{1,2})\.(\d{1,2})\.(\d{4}|\d{2})', date_input)
-    match_full = re.search(r'(\d{1,2})\W(\d{1,2})\W(\d{4}|\d{2})', date_input)
+    match_full = _DATE_RE.search(date_input)
     
     try:
         if match_full:
@@ -198,13 +219,12 @@ async def join_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
                  chosen_date = datetime.datetime.strptime(match_full.group(1) + '.' + match_full.group(2) + '.' + match_full.group(3), "%d.%m.%y").date()
             else:
                  #chosen_date = datetime.datetime.strptime(date_text, "%d.%m.%Y").date()
-                 chosen_date = datetime.datetime.strptime(match_full.group(1) + '.' + match_full.group(2) + '.' + match_full.group(3), "%d.%m.%Y").date()
+                 chosen_date = parse_date_ddmmyyyy(match_full.group(1) + '.' + match_full.group(2) + '.' + match_full.group(3))
         else:
             raise ValueError()
 
     except ValueError:
         logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів некоректний формат дати: '{date_input}'")
-        today = datetime.date.today()
         DATE_KEYBOARD=date_keyboard(today, 1, days_ahead)
         await update.message.reply_html(
             "Невірний формат дати. Будь ласка, введіть дату у форматі <code>ДД.ММ.РРРР</code> (наприклад, 25.12.2025) або скасуйте дію.",
@@ -212,15 +232,14 @@ async def join_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         )
         return JOIN_GETTING_DATE
 
-    current_date_obj = datetime.date.today()
     prediction = context.user_data.get('prediction_bounds')
 
-    if chosen_date <= current_date_obj:
+    if chosen_date <= today:
         logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів дату раніше ніж наступний робочий день: '{date_input}'")
         await update.message.reply_text(
-            f"Дата повинна бути пізнішою за поточну (`{current_date_obj.strftime('%d.%m.%Y')}`). Будь ласка, спробуйте ще раз або скасуйте дію.",
+            f"Дата повинна бути пізнішою за поточну (`{today.strftime('%d.%m.%Y')}`). Будь ласка, спробуйте ще раз або скасуйте дію.",
             parse_mode='Markdown',
-            reply_markup=date_keyboard_from_prediction(prediction, current_date_obj, days_ahead)
+            reply_markup=date_keyboard_from_prediction(prediction, today, days_ahead)
         )
         return JOIN_GETTING_DATE
     
@@ -228,19 +247,19 @@ async def join_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів вихідний день: '{date_input}'")
         await update.message.reply_html(
             "Ви обрали вихідний день (Субота або Неділя). Будь ласка, оберіть <code>робочий день</code> (Понеділок - П'ятниця) або скасуйте дію.",
-            reply_markup=date_keyboard_from_prediction(prediction, current_date_obj, days_ahead)
+            reply_markup=date_keyboard_from_prediction(prediction, today, days_ahead)
         )
         return JOIN_GETTING_DATE
 
     if previous_state:
         try:
-            previous_date_obj = datetime.datetime.strptime(previous_state, "%d.%m.%Y").date()
+            previous_date_obj = parse_date_ddmmyyyy(previous_state)
             if chosen_date == previous_date_obj:
                 logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів дату, що співпадає з попереднім записом: '{chosen_date.strftime('%d.%m.%Y')}'")
                 await update.message.reply_text(
                     f"Дата не повинна співпадати з поточною датою запису (`{chosen_date.strftime('%d.%m.%Y')}`). Будь ласка, оберіть іншу дату або скасуйте дію.",
                     parse_mode='Markdown',
-                    reply_markup=date_keyboard_from_prediction(prediction, current_date_obj, days_ahead)
+                    reply_markup=date_keyboard_from_prediction(prediction, today, days_ahead)
                 )
                 return JOIN_GETTING_DATE
         except ValueError:
@@ -256,32 +275,22 @@ async def join_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
             warn_msg = None
 
             dist = prediction['dist']
-            try:
-                chosen_ord = get_ordinal_date(chosen_date)
-                chosen_prob = stats.t.cdf(chosen_ord + 1, dist['df'], loc=dist['loc'], scale=dist['scale']) * 100
-            except Exception as e:
-                logger.error(f"Error calculating chosen date probability: {e}")
-                chosen_prob = 0
-                
+
+            # Дата всередині рекомендованого інтервалу не потребує розрахунку ймовірностей
             if chosen_date < prediction['mean']:
+                # Ймовірності обраної дати та меж інтервалу одним викликом t_cdf (при помилці - нулі)
+                chosen_prob, prob_mean, prob_h90 = calculate_date_probabilities(
+                    [chosen_date, prediction['mean'], prediction['h90']], dist
+                )
                 if chosen_prob < 50:
-                    try:
-                        prob_mean = calculate_date_probability(prediction['mean'], dist)
-                        prob_h90 = calculate_date_probability(prediction['h90'], dist)
-                        
-                        range_info = f"`{prediction['mean'].strftime('%d.%m.%Y')}` ({prob_mean:.0f}%) - `{prediction['h90'].strftime('%d.%m.%Y')}` ({prob_h90:.0f}%)"
-                    except Exception as e:
-                        logger.error(f"Помилка обчислення ймовірностей діапазону для попередження: {e}")
-                        range_info = f"`{prediction['mean'].strftime('%d.%m.%Y')}` - `{prediction['h90'].strftime('%d.%m.%Y')}`"
+                    range_info = f"`{prediction['mean'].strftime('%d.%m.%Y')}` ({prob_mean:.0f}%) - `{prediction['h90'].strftime('%d.%m.%Y')}` ({prob_h90:.0f}%)"
 
                     warn_msg = (
                         f"⚠️ *Попередження:* Для обраної дати `{chosen_date.strftime('%d.%m.%Y')}` ви маєте *низьку ймовірність* почати ВЛК ({chosen_prob:.0f}%).\n"
                         f"Рекомендовано обирати дату з інтервалу {range_info}."
                     )
             elif chosen_date > prediction['h90']:
-                current_start = datetime.date.today() + datetime.timedelta(days=1)
-                while current_start.weekday() >= 5:
-                    current_start += datetime.timedelta(days=1)
+                current_start = to_working_day(today + datetime.timedelta(days=1))
                 
                 standard_window_end = calculate_end_date(current_start, days_ahead)
                 threshold_date = max(prediction['h90'], standard_window_end)
@@ -321,22 +330,24 @@ async def join_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         'Дата': chosen_date.strftime("%d.%m.%Y"),
         'Примітки': user_notes,
         'Статус': 'На розгляді',
-        'Змінено': datetime.datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
+        'Змінено': now.strftime("%d.%m.%Y %H:%M:%S"),
         'Попередня дата': previous_state,
         **telegram_user_data
     }
     
-    new_entry_df = pd.DataFrame([new_entry])
-    
-    if save_queue_data(new_entry_df):
-        config_module.queue_df = pd.concat([config_module.queue_df, new_entry_df], ignore_index=True)
+    if await asyncio.to_thread(save_queue_data, new_entry):
+        append_pending_queue_row(new_entry)
         if previous_state:
             notification_text = f"✅ Користувач {update.effective_user.mention_html()}\nпереніс запис для\nID <code>{user_id}</code> на <code>{chosen_date.strftime('%d.%m.%Y')}</code>" 
         else:
             notification_text = f"✅ Користувач {update.effective_user.mention_html()}\nстворив запис для\nID <code>{user_id}</code> на <code>{chosen_date.strftime('%d.%m.%Y')}</code>" 
-        await send_group_notification(context, notification_text)
-        message_text = f"Ви успішно створили заявку на запис/перенесння дати в черзі!\nВаш ID: `{user_id}`, Обрана дата: `{chosen_date.strftime('%d.%m.%Y')}`\nСтатус заявки: `На розгляді`\nВаша заявка на розгляді у адміністраторів.\nЯкщо вона буде \"Ухвалена\", то через деякий час з'явиться в жовтій таблиці 🟡TODO."
-        await update.message.reply_text(message_text, parse_mode='Markdown', reply_markup=MAIN_KEYBOARD)
+        message_text = _JOIN_SUCCESS_TEMPLATE.format_map({'user_id': user_id, 'date': chosen_date.strftime('%d.%m.%Y')})
+        # Повідомлення в групу і відповідь користувачу йдуть у різні чати, надсилаємо їх одночасно;
+        # send_group_notification сам обробляє свої помилки
+        await asyncio.gather(
+            send_group_notification(context, notification_text),
+            update.message.reply_text(message_text, parse_mode='Markdown', reply_markup=MAIN_KEYBOARD)
+        )
         logger.info(f"Запис користувача {get_user_log_info(update.effective_user)} (ID: {user_id}) оновлено/додано на дату: {chosen_date.strftime('%d.%m.%Y')}. Попередня дата: {previous_state if previous_state else 'новий запис'}")
         context.user_data.clear()
         return ConversationHandler.END
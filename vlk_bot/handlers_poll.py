@@ -7,8 +7,6 @@ import datetime
 import logging
 import re
 
-import pandas as pd
-from scipy import stats
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ApplicationHandlerStop
 
@@ -19,15 +17,16 @@ from vlk_bot.config import (
 from vlk_bot.formatters import calculate_end_date
 from vlk_bot.formatters import get_poll_text
 from vlk_bot.keyboards import get_poll_keyboard, date_inline_keyboard_from_prediction, MAIN_KEYBOARD
-from vlk_bot.prediction import calculate_prediction, calculate_date_probability, calculate_prediction_with_daily_data
-from vlk_bot.sheets import load_queue_data, save_queue_data, update_active_sheet_status, get_stats_data
-from vlk_bot.utils import get_ordinal_date
+from vlk_bot.prediction import calculate_prediction, calculate_date_probabilities, calculate_prediction_with_daily_data
+from vlk_bot.sheets import load_queue_data, save_queue_data, update_active_sheet_status, append_pending_queue_row
 from vlk_bot.utils import get_user_log_info, get_user_telegram_data, extract_main_id, save_status_state, \
     load_status_state, send_group_notification
-from vlk_bot.utils import id_to_numeric
+from vlk_bot.utils import id_to_numeric, to_working_day, parse_date_ddmmyyyy
 
 logger = logging.getLogger(__name__)
 
+_DATE_RE = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{2,4})')
+
 
 async def delete_confirmation_message(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int, delay: int = 10):
     """Видаляє повідомлення після затримки."""
@@ -59,7 +58,7 @@ async def handle_poll_response(update: Update, context: ContextTypes.DEFAULT_TYP
     last_known_state = load_status_state()
     
     if action == POLL_CONFIRM:
-        update_active_sheet_status(user_id, "Підтвердив візит")
+        await asyncio.to_thread(update_active_sheet_status, user_id, "Підтвердив візит")
         
         visit_date = context.bot_data.get('next_reception_sheet', '')
         if not visit_date and user_id in last_known_state:
@@ -79,8 +78,7 @@ async def handle_poll_response(update: Update, context: ContextTypes.DEFAULT_TYP
     elif action == POLL_RESCHEDULE:
         today = datetime.date.today()
         
-        stats_df = await get_stats_data()
-        prediction = calculate_prediction(extract_main_id(user_id), stats_df)
+        prediction = await asyncio.to_thread(calculate_prediction, extract_main_id(user_id))
         
         if prediction:
             keyboard = date_inline_keyboard_from_prediction(user_id, prediction, today, days_ahead)
@@ -126,7 +124,7 @@ async def handle_poll_cancel_actions(update: Update, context: ContextTypes.DEFAU
     import vlk_bot.config as config_module
     
     if action == POLL_CANCEL_CONFIRM:
-        config_module.queue_df = load_queue_data()
+        config_module.queue_df = await asyncio.to_thread(load_queue_data)
         
         telegram_user_data = get_user_telegram_data(user)
         new_entry = {
@@ -139,10 +137,9 @@ async def handle_poll_cancel_actions(update: Update, context: ContextTypes.DEFAU
             **telegram_user_data
         }
         
-        new_entry_df = pd.DataFrame([new_entry])
-        if save_queue_data(new_entry_df):
-            config_module.queue_df = pd.concat([config_module.queue_df, new_entry_df], ignore_index=True)
-            update_active_sheet_status(user_id, "Скасував")
+        if await asyncio.to_thread(save_queue_data, new_entry):
+            append_pending_queue_row(new_entry)
+            await asyncio.to_thread(update_active_sheet_status, user_id, "Скасував")
             
             last_known_state = load_status_state()
             if user_id in last_known_state:
@@ -171,8 +168,7 @@ async def handle_poll_cancel_actions(update: Update, context: ContextTypes.DEFAU
     elif action == POLL_CANCEL_RESCHEDULE:
         today = datetime.date.today()
         
-        stats_df = await get_stats_data()
-        prediction = calculate_prediction(extract_main_id(user_id), stats_df)
+        prediction = await asyncio.to_thread(calculate_prediction, extract_main_id(user_id))
         
         if prediction:
             keyboard = date_inline_keyboard_from_prediction(user_id, prediction, today, days_ahead)
@@ -221,7 +217,7 @@ async def handle_poll_date_selection(update: Update, context: ContextTypes.DEFAU
     date_str = parts[3]
     
     import vlk_bot.config as config_module
-    config_module.queue_df = load_queue_data()
+    config_module.queue_df = await asyncio.to_thread(load_queue_data)
     
     telegram_user_data = get_user_telegram_data(user)
     prev_date = context.bot_data.get('next_reception_sheet', '')
@@ -236,10 +232,9 @@ async def handle_poll_date_selection(update: Update, context: ContextTypes.DEFAU
         **telegram_user_data
     }
     
-    new_entry_df = pd.DataFrame([new_entry])
-    if save_queue_data(new_entry_df):
-        config_module.queue_df = pd.concat([config_module.queue_df, new_entry_df], ignore_index=True)
-        update_active_sheet_status(user_id, "Відклав візит")
+    if await asyncio.to_thread(save_queue_data, new_entry):
+        append_pending_queue_row(new_entry)
+        await asyncio.to_thread(update_active_sheet_status, user_id, "Відклав візит")
         
         last_known_state = load_status_state()
         if user_id in last_known_state:
@@ -270,7 +265,7 @@ async def handle_poll_custom_date(update: Update, context: ContextTypes.DEFAULT_
     date_input = update.message.text.strip()
     user_id = context.user_data.get('poll_reschedule_user_id', '')
     
-    date_match = re.search(r'(\d{1,2})\.(\d{1,2})\.(\d{2,4})', date_input)
+    date_match = _DATE_RE.search(date_input)
     if not date_match:
         await update.message.reply_text(
             f"Невірний формат дати. Будь ласка, введіть дату у форматі <code>ДД.ММ.РРРР</code>\n"
@@ -285,7 +280,7 @@ async def handle_poll_custom_date(update: Update, context: ContextTypes.DEFAULT_
     date_str = f"{day.zfill(2)}.{month.zfill(2)}.{year}"
     
     try:
-        chosen_date = datetime.datetime.strptime(date_str, "%d.%m.%Y").date()
+        chosen_date = parse_date_ddmmyyyy(date_str)
     except ValueError:
         await update.message.reply_text(
             f"Некоректна дата. Будь ласка, перевірте та спробуйте ще раз.\n"
@@ -330,38 +325,25 @@ async def handle_poll_custom_date(update: Update, context: ContextTypes.DEFAULT_
                     dist = prediction['dist']
                     warn_msg = None
                     
-                    chosen_ord = get_ordinal_date(chosen_date)
-                    chosen_prob = stats.t.cdf(chosen_ord + 1, dist['df'], loc=dist['loc'], scale=dist['scale']) * 100
+                    # Ймовірності обраної дати та меж інтервалу одним викликом t_cdf
+                    chosen_prob, prob_mean, prob_h90 = calculate_date_probabilities(
+                        [chosen_date, prediction['mean'], prediction['h90']], dist
+                    )
+                    range_info = f"<code>{prediction['mean'].strftime('%d.%m.%Y')}</code> ({prob_mean:.0f}%) - <code>{prediction['h90'].strftime('%d.%m.%Y')}</code> ({prob_h90:.0f}%)"
                     
                     if chosen_date < prediction['mean'] and chosen_prob < 50:
-                        try:
-                            prob_mean = calculate_date_probability(prediction['mean'], dist)
-                            prob_h90 = calculate_date_probability(prediction['h90'], dist)
-                            range_info = f"<code>{prediction['mean'].strftime('%d.%m.%Y')}</code> ({prob_mean:.0f}%) - <code>{prediction['h90'].strftime('%d.%m.%Y')}</code> ({prob_h90:.0f}%)"
-                        except:
-                            range_info = f"<code>{prediction['mean'].strftime('%d.%m.%Y')}</code> - <code>{prediction['h90'].strftime('%d.%m.%Y')}</code>"
-                        
                         warn_msg = (
                             f"⚠️ <b>Попередження:</b> Для обраної дати <code>{date_str}</code> ви маєте "
                             f"<b>низьку ймовірність</b> почати ВЛК ({chosen_prob:.0f}%).\n"
                             f"Рекомендовано обирати дату з інтервалу {range_info}."
                         )
                     elif chosen_date > prediction['h90']:
-                        current_start = today + datetime.timedelta(days=1)
-                        while current_start.weekday() >= 5:
-                            current_start += datetime.timedelta(days=1)
+                        current_start = to_working_day(today + datetime.timedelta(days=1))
                         
                         standard_window_end = calculate_end_date(current_start, 15)
                         threshold_date = max(prediction['h90'], standard_window_end)
                         
                         if chosen_date > threshold_date:
-                            try:
-                                prob_mean = calculate_date_probability(prediction['mean'], dist)
-                                prob_h90 = calculate_date_probability(prediction['h90'], dist)
-                                range_info = f"<code>{prediction['mean'].strftime('%d.%m.%Y')}</code> ({prob_mean:.0f}%) - <code>{prediction['h90'].strftime('%d.%m.%Y')}</code> ({prob_h90:.0f}%)"
-                            except:
-                                range_info = f"<code>{prediction['mean'].strftime('%d.%m.%Y')}</code> - <code>{prediction['h90'].strftime('%d.%m.%Y')}</code>"
-                            
                             warn_msg = (
                                 f"⚠️ <b>Попередження:</b> Обрана дата <code>{date_str}</code> <b>занадто далеко в майбутньому</b>. "
                                 f"Вам не треба так довго чекати, рекомендований інтервал: {range_info}."
@@ -383,7 +365,7 @@ async def handle_poll_custom_date(update: Update, context: ContextTypes.DEFAULT_
         except Exception as e:
             logger.warning(f"Помилка перевірки дати для попередження в poll: {e}")
     
-    update_active_sheet_status(user_id, "Відклав візит")
+    await asyncio.to_thread(update_active_sheet_status, user_id, "Відклав візит")
     
     telegram_user_data = {
         'TG ID': user_tg_id,
@@ -403,22 +385,22 @@ async def handle_poll_custom_date(update: Update, context: ContextTypes.DEFAULT_
         **telegram_user_data
     }
     
-    new_entry_df = pd.DataFrame([new_entry])
-    config_module.queue_df = load_queue_data()
+    config_module.queue_df = await asyncio.to_thread(load_queue_data)
     
-    if save_queue_data(new_entry_df):
-        config_module.queue_df = pd.concat([config_module.queue_df, new_entry_df], ignore_index=True)
-        
-        await update.message.reply_text(
-            f"Запис перенесено.\n"
-            f"Номер: <code>{user_id}</code>\n"
-            f"Нова дата: <code>{date_str}</code>",
-            parse_mode="HTML",
-            reply_markup=MAIN_KEYBOARD
-        )
+    if await asyncio.to_thread(save_queue_data, new_entry):
+        append_pending_queue_row(new_entry)
         
         notification_text = f"✅ Користувач {update.effective_user.mention_html()} подав заявку на перенесення запису для ID <code>{user_id}</code> на <code>{date_str}</code>"
-        await send_group_notification(context, notification_text)
+        await asyncio.gather(
+            update.message.reply_text(
+                f"Запис перенесено.\n"
+                f"Номер: <code>{user_id}</code>\n"
+                f"Нова дата: <code>{date_str}</code>",
+                parse_mode="HTML",
+                reply_markup=MAIN_KEYBOARD
+            ),
+            send_group_notification(context, notification_text)
+        )
         
         logger.info(f"Користувач {user_id} подав заявку на перенесення запису на {date_str} (ручне введення)")
     else:
@@ -2,11 +2,12 @@
 ConversationHandler для відображення черги.
 """
 
+import asyncio
 import datetime
 import logging
 import re
 
-import pandas as pd
+import numpy as np
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
@@ -16,16 +17,18 @@ from vlk_bot.keyboards import (
     MAIN_KEYBOARD, SHOW_OPTION_KEYBOARD, date_keyboard,
     BUTTON_TEXT_SHOW_ALL, BUTTON_TEXT_SHOW_DATE
 )
-from vlk_bot.sheets import load_queue_data
-from vlk_bot.utils import get_user_log_info
+from vlk_bot.sheets import load_queue_data_recent, get_parsed_dates, get_status_norm, materialize_queue_df
+from vlk_bot.utils import get_user_log_info, parse_date_ddmmyyyy
 
 logger = logging.getLogger(__name__)
 
+_DATE_RE = re.compile(r'(\d{2})\.(\d{2})\.(\d{2,4})')
+
 
 async def show_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Запускає процес відображення черги."""
     import vlk_bot.config as config_module
-    config_module.queue_df = load_queue_data()
+    config_module.queue_df = await asyncio.to_thread(load_queue_data_recent)
     
     if config_module.queue_df is None:
         logger.error(f"Помилка завантаження даних для перегляду черги користувача {get_user_log_info(update.effective_user)}.")
@@ -46,14 +49,14 @@ async def show_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 async def show_get_option(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Отримує опцію відображення."""
-    import vlk_bot.config as config_module
-    queue_df = config_module.queue_df
+    queue_df = materialize_queue_df()
     
     choice = update.message.text.strip()
 
     if choice == BUTTON_TEXT_SHOW_ALL:
         logger.info(f"Користувач {get_user_log_info(update.effective_user)} обрав перегляд усіх записів.")
-        await display_queue_data(update, queue_df, title="Усі записи в черзі зі статусом \"Ухвалено\":", reply_markup=MAIN_KEYBOARD)
+        await display_queue_data(update, queue_df, title="Усі записи в черзі зі статусом \"Ухвалено\":", reply_markup=MAIN_KEYBOARD,
+                                 revision=queue_df.attrs.get('revision'))
         context.user_data.clear()
         return ConversationHandler.END
     elif choice == BUTTON_TEXT_SHOW_DATE:
@@ -81,19 +84,19 @@ async def show_get_option(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def show_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Отримує дату для відображення записів."""
-    import vlk_bot.config as config_module
-    queue_df = config_module.queue_df
+    queue_df = materialize_queue_df()
+    today = datetime.date.today()
     
     date_input = update.message.text.strip()
     
-    match = re.search(r'(\d{2})\.(\d{2})\.(\d{2,4})', date_input)
+    match = _DATE_RE.search(date_input)
     if match:
         date_text = match.group(0)
         try:
             if len(match.group(3)) == 2:
                  chosen_date = datetime.datetime.strptime(date_text, "%d.%m.%y").date()
             else:
-                 chosen_date = datetime.datetime.strptime(date_text, "%d.%m.%Y").date()
+                 chosen_date = parse_date_ddmmyyyy(date_text)
         except ValueError:
              chosen_date = None
     else:
@@ -102,13 +105,12 @@ async def show_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 
     try:
         if not chosen_date:
-            chosen_date = datetime.datetime.strptime(date_text, "%d.%m.%Y").date()
+            chosen_date = parse_date_ddmmyyyy(date_text)
     except ValueError:
         try:
             chosen_date = datetime.datetime.strptime(date_text, "%d.%m.%y").date()
         except ValueError:
             logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів некоректний формат дати для перегляду: '{date_input}'")
-            today = datetime.date.today()
             DATE_KEYBOARD = date_keyboard(today, 0, days_ahead)
             await update.message.reply_html(
                 "Невірний формат дати. Будь ласка, введіть дату у форматі <code>ДД.ММ.РРРР</code> (наприклад, 25.12.2025) або скасуйте дію.",
@@ -117,20 +119,17 @@ async def show_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
             return SHOW_GETTING_DATE
 
     try:
-        current_date_obj = datetime.date.today()
-        
-        if chosen_date < current_date_obj:
-            DATE_KEYBOARD = date_keyboard(current_date_obj, 0, days_ahead)
+        if chosen_date < today:
+            DATE_KEYBOARD = date_keyboard(today, 0, days_ahead)
             logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів дату ранішу за поточну: '{chosen_date.strftime('%d.%m.%Y')}'")
             await update.message.reply_text(
-                f"Дата повинна бути не раніше за поточну (`{current_date_obj.strftime('%d.%m.%Y')}`). Будь ласка, спробуйте ще раз або скасуйте дію.",
+                f"Дата повинна бути не раніше за поточну (`{today.strftime('%d.%m.%Y')}`). Будь ласка, спробуйте ще раз або скасуйте дію.",
                 parse_mode='Markdown',
                 reply_markup=DATE_KEYBOARD
             )
             return SHOW_GETTING_DATE
         
         if chosen_date.weekday() >= 5:
-            today = datetime.date.today()
             DATE_KEYBOARD = date_keyboard(today, 0, days_ahead)
             logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів дату що припадає на вихідний: '{chosen_date}'")
             await update.message.reply_text(
@@ -139,29 +138,32 @@ async def show_get_date(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
             )
             return SHOW_GETTING_DATE
 
-        temp_df = queue_df.copy()
-        temp_df['Змінено_dt'] = pd.to_datetime(temp_df['Змінено'].astype(str), format="%d.%m.%Y %H:%M:%S", dayfirst=True, errors='coerce')
-        temp_df['Змінено_dt'] = temp_df['Змінено_dt'].fillna("01.01.2025 00:00:00")
-        actual_records = temp_df.sort_values(by=['ID', 'Змінено_dt'], ascending=[True, True]).drop_duplicates(subset='ID', keep='last')
-        actual_queue = actual_records[actual_records['Дата'].astype(str).str.strip() != '']
+        chosen_date_str = chosen_date.strftime("%d.%m.%Y")
         
-        filtered_df = actual_queue[
-            (actual_queue['Дата'] == chosen_date.strftime("%d.%m.%Y")) &
-            (actual_queue['Статус'].astype(str).str.strip().str.lower() == 'ухвалено')
-        ]
+        # Одна булева маска над усією таблицею без проміжних копій: найновіший запис ID
+        # (стабільне сортування - при однаковому 'Змінено' перемагає пізніше доданий рядок),
+        # обрана дата і статус "Ухвалено"
+        changed_dt = get_parsed_dates(queue_df, 'Змінено').fillna(datetime.datetime(2025, 1, 1, 0, 0, 0)).to_numpy()
+        ids = queue_df['ID'].astype(str).to_numpy()
+        order = np.lexsort((changed_dt, ids))
+        sorted_ids = ids[order]
+        is_latest = np.zeros(len(ids), dtype=bool)
+        is_latest[order[np.append(sorted_ids[1:] != sorted_ids[:-1], True)]] = True
         
-        logger.info(f"Користувач {get_user_log_info(update.effective_user)} переглянув записи на дату: {chosen_date.strftime('%d.%m.%Y')}")
-        next_working_day = current_date_obj + datetime.timedelta(days=1)
-        while next_working_day.weekday() >= 5:
-            next_working_day += datetime.timedelta(days=1)
+        filtered_df = queue_df[
+            is_latest &
+            (queue_df['Дата'] == chosen_date_str).to_numpy() &
+            (get_status_norm(queue_df) == 'ухвалено').to_numpy()
+        ]
         
-        await display_queue_data(update, filtered_df, title=f"Поточна черга зі статусом \"Ухвалено\" на `{chosen_date.strftime('%d.%m.%Y')}`:\n", reply_markup=MAIN_KEYBOARD)
+        logger.info(f"Користувач {get_user_log_info(update.effective_user)} переглянув записи на дату: {chosen_date_str}")
+        await display_queue_data(update, filtered_df, title=f"Поточна черга зі статусом \"Ухвалено\" на `{chosen_date_str}`:\n", reply_markup=MAIN_KEYBOARD,
+                                 revision=queue_df.attrs.get('revision'))
         context.user_data.clear()
         return ConversationHandler.END
 
     except ValueError:
         logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів некоректний формат дати для перегляду: '{date_input}'")
-        today = datetime.date.today()
         DATE_KEYBOARD = date_keyboard(today, 0, days_ahead)
         await update.message.reply_html(
             "Невірний формат дати. Будь ласка, введіть дату у форматі <code>ДД.ММ.РРРР</code> (наприклад, 25.12.2025) або скасуйте дію.",
@@ -2,19 +2,18 @@
 ConversationHandler для перегляду статусу.
 """
 
+import asyncio
 import datetime
 import logging
-import re
 
-import pandas as pd
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 from vlk_bot.config import STATUS_GETTING_ID
 from vlk_bot.keyboards import MAIN_KEYBOARD, CANCEL_KEYBOARD
 from vlk_bot.prediction import calculate_prediction, calculate_date_probability
-from vlk_bot.sheets import load_queue_data, get_stats_data
-from vlk_bot.utils import get_user_log_info, extract_main_id
+from vlk_bot.sheets import load_queue_data, get_stats_data, get_parsed_dates, get_id_records, materialize_queue_df
+from vlk_bot.utils import get_user_log_info, extract_main_id, parse_date_ddmmyyyy, QUEUE_ID_RE
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +21,7 @@ logger = logging.getLogger(__name__)
 async def status_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Запускає процес перегляду статусу."""
     import vlk_bot.config as config_module
-    config_module.queue_df = load_queue_data()
+    config_module.queue_df = await asyncio.to_thread(load_queue_data)
     
     if config_module.queue_df is None:
         logger.error(f"Помилка завантаження даних для перегляду статусу користувача {get_user_log_info(update.effective_user)}.")
@@ -45,13 +44,11 @@ async def status_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
 async def status_get_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Отримує ID від користувача та відображає статус."""
-    import vlk_bot.config as config_module
-    queue_df = config_module.queue_df
+    queue_df = materialize_queue_df()
     
     id_to_check = update.message.text.strip()
-    id_pattern = r"^(\d+|\d+\/\d+)$"
 
-    if not re.match(id_pattern, id_to_check):
+    if not QUEUE_ID_RE.fullmatch(id_to_check):
         logger.warning(f"Користувач {get_user_log_info(update.effective_user)} ввів некоректний ID для перевірки статусу: '{id_to_check}'")
         await update.message.reply_text(
             "Невірний формат номеру. Будь ласка, введіть ціле число або два цілих числа, розділені слешем (наприклад, `9999` або `9999/1`).",
@@ -60,7 +57,7 @@ async def status_get_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         )
         return STATUS_GETTING_ID[0]
 
-    id_records = queue_df[queue_df['ID'] == id_to_check].copy() 
+    id_records = get_id_records(queue_df, id_to_check)
     
     if id_records.empty:
         logger.info(f"Користувач {get_user_log_info(update.effective_user)} запитав статус для ID '{id_to_check}'.")
@@ -72,48 +69,44 @@ async def status_get_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         context.user_data.clear()
         return ConversationHandler.END
 
-    id_records['Змінено_dt'] = pd.to_datetime(
-        id_records['Змінено'].astype(str),
-        format="%d.%m.%Y %H:%M:%S",
-        dayfirst=True,
-        errors='coerce'
+    id_records = id_records.assign(
+        Змінено_dt=get_parsed_dates(id_records, 'Змінено').fillna(datetime.datetime(2025, 1, 1, 0, 0, 0))
     )
-    id_records['Змінено_dt'] = id_records['Змінено_dt'].fillna(datetime.datetime(2025, 1, 1, 0, 0, 0))
 
     latest_record = id_records.sort_values(by='Змінено_dt', ascending=False).iloc[0]
-    is_actual_record = (latest_record['Дата'].strip() != '')
+    is_actual_record = (latest_record['Дата'] != '')
 
     status_message = f"**Статус запису для номеру:** `{latest_record['ID']}`\n"
 
     if is_actual_record:
         status_message += f"**Дата запису:** `{latest_record['Дата']}`\n"
-        status_message += f"**Поточний статус:** `{latest_record['Статус'] if latest_record['Статус'].strip() else 'Невизначений'}`\n"
+        status_message += f"**Поточний статус:** `{latest_record['Статус'] if latest_record['Статус'] else 'Невизначений'}`\n"
         
         try:
             stats_df = await get_stats_data()
             if stats_df is not None and not stats_df.empty:
                 main_id = extract_main_id(latest_record['ID'])
-                prediction = calculate_prediction(main_id, stats_df)
+                prediction = await asyncio.to_thread(calculate_prediction, main_id, stats_df)
                 
                 if prediction:
-                    record_date = datetime.datetime.strptime(latest_record['Дата'], "%d.%m.%Y").date()
+                    record_date = parse_date_ddmmyyyy(latest_record['Дата'])
                     dist = prediction['dist']
                     prob = calculate_date_probability(record_date, dist)
                     status_message += f"*Орієнтовна ймовірність зайти в 252 кабінет і розпочати ВЛК:* `{prob:.0f}%`\n"
         except Exception as e:
              logger.error(f"Помилка при розрахунку ймовірності в status_get_id: {e}")
 
-        if latest_record['Попередня дата'].strip():
+        if latest_record['Попередня дата']:
             status_message += f"**Перенесено з дати:** `{latest_record['Попередня дата']}`\n"
     else:
         status_message += f"**Дата:** `скасування запису`\n"
-        status_message += f"**Поточний статус:** `{latest_record['Статус'] if latest_record['Статус'].strip() else 'Невизначений'}`\n"
-        if latest_record['Попередня дата'].strip():
+        status_message += f"**Поточний статус:** `{latest_record['Статус'] if latest_record['Статус'] else 'Невизначений'}`\n"
+        if latest_record['Попередня дата']:
             status_message += f"**Скасовано запис від:** `{latest_record['Попередня дата']}`\n"
     
-    if latest_record['Статус'].strip().lower() == 'ухвалено':
+    if latest_record['Статус'].lower() == 'ухвалено':
        status_message += f"Вашу заявку ухвалено.\nВона вже або через деякий час з'явиться в жовтій таблиці 🟡TODO."
-    elif latest_record['Статус'].strip().lower() == 'на розгляді':
+    elif latest_record['Статус'].lower() == 'на розгляді':
        status_message += f"Ваша заявка на розгляді у адміністраторів.\nЯкщо вона буде \"Ухвалена\", то через деякий час з'явиться в жовтій таблиці 🟡TODO."
     else:
        status_message += f"Примітка:\nСхоже з вашою заявкою виникли проблеми.\nЗверніться до адміністраторів в групі [ВЛК Закревського 81](https://t.me/vlkzakrevskogo81) за роз'ясненнями."
@@ -4,6 +4,7 @@ UI компоненти: клавіатури та кнопки.
 
 import datetime
 import logging
+from functools import lru_cache
 
 from telegram import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton, InlineKeyboardMarkup
 
@@ -43,71 +44,73 @@ SHOW_OPTION_KEYBOARD = ReplyKeyboardMarkup([
     [KeyboardButton(BUTTON_TEXT_CANCEL_OP)]
 ], one_time_keyboard=True, resize_keyboard=True)
 
+DATE_KEYBOARD_COLUMNS = 3
+_DATE_KEYBOARD_CANCEL_ROW = (button_cancel_op,)
+
 
 def generate_date_options(today=None, days_to_check=0, days_ahead=15, 
                           start_date=None, end_date=None, prediction_dist=None) -> list:
     """
     Генерує список дат для вибору з текстом кнопки та ймовірністю.
     """
-    from vlk_bot.utils import get_ua_weekday
-    from vlk_bot.prediction import calculate_date_probability
-    
     if today is None:
         today = datetime.date.today()
     
-    date_options = []
+    return list(_generate_date_options_cached(today, days_to_check, days_ahead, start_date, end_date,
+                                              _dist_key(prediction_dist)))
+
+
+def _dist_key(prediction_dist) -> tuple | None:
+    """
+    Хешований ключ розподілу прогнозу (df, loc, scale). Розподіл закешованого ID не змінюється,
+    тож повторні клавіатури (помилки вводу, повторні повідомлення) беруться з кешу без нового виклику t_cdf.
+    """
+    if not prediction_dist:
+        return None
+    return (prediction_dist['df'], prediction_dist['loc'], prediction_dist['scale'])
+
+
+@lru_cache(maxsize=256)
+def _generate_date_options_cached(today, days_to_check, days_ahead, start_date, end_date, dist_key) -> tuple:
+    """Варіанти дат для конкретного вікна та параметрів розподілу (df, loc, scale)."""
+    from vlk_bot.utils import UA_WEEKDAYS
+    from vlk_bot.prediction import calculate_date_probabilities
+    
+    prediction_dist = dict(zip(('df', 'loc', 'scale'), dist_key)) if dist_key else None
     current_check_date = today + datetime.timedelta(days=days_to_check)
     
     logger.debug(f"generate_date_options: start_date={start_date}, end_date={end_date}")
     
+    # Спершу збираємо робочі дні, потім рахуємо ймовірності для всіх одним викликом
+    dates = []
     if start_date and end_date:
         iter_date = max(current_check_date, start_date)
-        limit_date = end_date
-        
-        while iter_date <= limit_date:
+        while iter_date <= end_date and len(dates) < 30:
             if iter_date.weekday() < 5:
-                date_str_short = iter_date.strftime("%d.%m.%y")
-                date_str_full = iter_date.strftime("%d.%m.%Y")
-                weekday_str = get_ua_weekday(iter_date)
-                button_text = f"{weekday_str}: {date_str_short}"
-                
-                if prediction_dist:
-                    percent = calculate_date_probability(iter_date, prediction_dist)
-                    if percent >= 0.1:
-                        button_text = f"{button_text} ({percent:.0f}%)"
-                
-                date_options.append({
-                    'date': iter_date,
-                    'text': button_text,
-                    'date_str': date_str_full
-                })
+                dates.append(iter_date)
             iter_date += datetime.timedelta(days=1)
-            if len(date_options) >= 30:
-                break
     else:
-        buttons_added = 0
         iter_date = current_check_date
-        while buttons_added < days_ahead:
+        while len(dates) < days_ahead:
             if iter_date.weekday() < 5:
-                date_str_short = iter_date.strftime("%d.%m.%y")
-                date_str_full = iter_date.strftime("%d.%m.%Y")
-                weekday_str = get_ua_weekday(iter_date)
-                button_text = f"{weekday_str}: {date_str_short}"
-                
-                if prediction_dist:
-                    percent = calculate_date_probability(iter_date, prediction_dist)
-                    if percent >= 0.1:
-                        button_text = f"{button_text} ({percent:.0f}%)"
-                
-                date_options.append({
-                    'date': iter_date,
-                    'text': button_text,
-                    'date_str': date_str_full
-                })
-                buttons_added += 1
+                dates.append(iter_date)
             iter_date += datetime.timedelta(days=1)
     
-    return date_options
+    percents = calculate_date_probabilities(dates, prediction_dist) if prediction_dist and dates else None
+    
+    date_options = []
+    for i, date_obj in enumerate(dates):
+        button_text = f"{UA_WEEKDAYS[date_obj.weekday()]}: {date_obj:%d.%m.%y}"
+        if percents is not None and percents[i] >= 0.1:
+            button_text = f"{button_text} ({percents[i]:.0f}%)"
+        
+        date_options.append({
+            'date': date_obj,
+            'text': button_text,
+            'date_str': date_obj.strftime("%d.%m.%Y")
+        })
+    
+    return tuple(date_options)
 
 
 def date_keyboard(today=None, days_to_check=0, days_ahead=15, 
@@ -118,15 +121,27 @@ def date_keyboard(today=None, days_to_check=0, days_ahead=15,
     if today is None:
         today = datetime.date.today()
     
-    date_options = generate_date_options(today, days_to_check, days_ahead, 
-                                         start_date, end_date, prediction_dist)
-    
-    flat_keyboard_buttons = [KeyboardButton(opt['text']) for opt in date_options]
+    return _date_keyboard_cached(today, days_to_check, days_ahead, start_date, end_date, _dist_key(prediction_dist))
+
+
+@lru_cache(maxsize=64)
+def _date_keyboard_cached(today, days_to_check, days_ahead, start_date, end_date, dist_key) -> ReplyKeyboardMarkup:
+    """Клавіатура дат для конкретного вікна та розподілу: повторні підказки - один пошук у кеші."""
+    date_options = _generate_date_options_cached(today, days_to_check, days_ahead, start_date, end_date, dist_key)
+    return _build_date_reply_keyboard(tuple(opt['text'] for opt in date_options))
+
+
+@lru_cache(maxsize=128)
+def _build_date_reply_keyboard(button_texts: tuple) -> ReplyKeyboardMarkup:
+    """
+    Будує клавіатуру дат за текстами кнопок. ReplyKeyboardMarkup незмінний,
+    тому однакові набори дат (без прогнозу або з тим самим прогнозом) використовують один об'єкт.
+    """
+    flat_keyboard_buttons = [KeyboardButton(text) for text in button_texts]
     
-    chunk_size = 3
-    keyboard_buttons = [flat_keyboard_buttons[i:i + chunk_size] 
-                        for i in range(0, len(flat_keyboard_buttons), chunk_size)]
-    keyboard_buttons.append([button_cancel_op])
+    keyboard_buttons = [flat_keyboard_buttons[i:i + DATE_KEYBOARD_COLUMNS] 
+                        for i in range(0, len(flat_keyboard_buttons), DATE_KEYBOARD_COLUMNS)]
+    keyboard_buttons.append(_DATE_KEYBOARD_CANCEL_ROW)
     
     return ReplyKeyboardMarkup(keyboard_buttons, one_time_keyboard=True, resize_keyboard=True)
 
@@ -147,14 +162,12 @@ def get_prediction_date_range(prediction: dict, today: datetime.date = None) ->
     prediction_dist = prediction.get('dist')
     
     if start_date:
-        start_date = max(start_date, min_date)
-        while start_date.weekday() >= 5:
-            start_date += datetime.timedelta(days=1)
+        from vlk_bot.utils import to_working_day
+        
+        start_date = to_working_day(max(start_date, min_date))
         
         if end_date and start_date > end_date:
-            start_date = min_date
-            while start_date.weekday() >= 5:
-                start_date += datetime.timedelta(days=1)
+            start_date = to_working_day(min_date)
             end_date = None
     
     return start_date, end_date, prediction_dist
@@ -216,8 +229,12 @@ def date_inline_keyboard_from_prediction(user_id: str, prediction: dict,
                                start_date, end_date, prediction_dist, columns)
 
 
+@lru_cache(maxsize=1024)
 def get_poll_keyboard(user_id: str) -> InlineKeyboardMarkup:
-    """Повертає клавіатуру для опитування."""
+    """
+    Повертає клавіатуру для опитування. InlineKeyboardMarkup незмінний, тож клавіатура ID
+    будується один раз і використовується для повторних опитувань.
+    """
     from vlk_bot.config import POLL_CONFIRM, POLL_RESCHEDULE, POLL_CANCEL
     
     return InlineKeyboardMarkup([
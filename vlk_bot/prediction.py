@@ -8,11 +8,12 @@ import logging
 import os
 import statistics
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import List, Dict, Optional
 
 import numpy as np
 import pandas as pd
-from scipy import stats as scipy_stats
+from scipy import special as scipy_special
 
 logger = logging.getLogger(__name__)
 
@@ -44,13 +45,15 @@ class QueueEntry:
 def calculate_prediction(user_id, stats_df=None):
     """
     Розраховує прогноз дати візиту для user_id.
+    Прогноз кешується для кожного ID до зміни attendance_data.json; stats_df не використовується
+    і залишений для сумісності, тож обробникам не треба завантажувати Stats лише для прогнозу.
     """
     try:
         from vlk_bot.config import SHEETS_SERVICE, STATS_SHEET_ID, STATS_WORKSHEET_NAME
         from vlk_bot.sync import sync_daily_sheets
         
         sync_daily_sheets(SHEETS_SERVICE, STATS_SHEET_ID, STATS_WORKSHEET_NAME)
-        prediction = calculate_prediction_with_daily_data(user_id, use_daily_sheets=True)
+        prediction = _get_cached_prediction(user_id)
         if prediction:
             logger.info(f"Використано прогноз з {prediction.get('data_points', 0)} точок даних")
             return prediction
@@ -60,39 +63,95 @@ def calculate_prediction(user_id, stats_df=None):
     return None
 
 
-def calculate_prediction_from_attendance_json(user_id, attendance_data):
+_PREDICTION_CACHE_REVISION = {"rev": None}
+
+
+@lru_cache(maxsize=1)
+def _load_attendance_context(attendance_revision):
+    """Дані attendance_data.json, прочитані один раз для конкретної версії файлу."""
+    from vlk_bot.sync import load_attendance_from_json
+    return load_attendance_from_json()
+
+
+@lru_cache(maxsize=1024)
+def _calculate_prediction_cached(user_id, attendance_revision):
+    """Прогноз для user_id, закешований для конкретної версії attendance_data.json."""
+    return calculate_prediction_with_daily_data(
+        user_id, use_daily_sheets=True, attendance_data=_load_attendance_context(attendance_revision)
+    )
+
+
+def _get_cached_prediction(user_id):
     """
-    Розраховує прогноз на основі даних з attendance_data.json.
+    Повертає прогноз з кешу. Кеш повністю скидається, коли змінюється attendance_data.json.
+    Без attendance_data.json прогноз будується з CSV щоденних аркушів і не кешується.
+    Помилка для одного ID повертає None, щоб виклики для інших ID не переривались.
     """
-    from vlk_bot.utils import get_ordinal_date, get_date_from_ordinal, id_to_numeric
-    
-    points = attendance_data.get('attendance_points', [])
-    if len(points) < 5:
-        return None
-    
-    processed_points = []
-    for point in points:
-        try:
-            date_obj = datetime.datetime.strptime(point['date'], '%Y-%m-%d').date()
-            ordinal = get_ordinal_date(date_obj)
-            
-            numeric_id = id_to_numeric(point['id'])
-            if numeric_id is None:
-                continue
-                
-            processed_points.append({
-                'id': numeric_id,
-                'ordinal': ordinal,
-                'is_live': point.get('is_live', False)
-            })
-        except:
-            continue
+    from vlk_bot.sync import get_attendance_revision
     
-    if len(processed_points) < 5:
+    try:
+        revision = get_attendance_revision()
+        if revision is None:
+            return calculate_prediction_with_daily_data(user_id, use_daily_sheets=True)
+        
+        if revision != _PREDICTION_CACHE_REVISION["rev"]:
+            logger.debug(f"Версія даних відвідуваності змінилась, кеш прогнозів скинуто ({_calculate_prediction_cached.cache_info()})")
+            _calculate_prediction_cached.cache_clear()
+            _PREDICTION_CACHE_REVISION["rev"] = revision
+        return _calculate_prediction_cached(user_id, revision)
+    except Exception as e:
+        logger.error(f"Помилка прогнозування для ID {user_id}: {e}")
         return None
+
+
+def has_prediction_data() -> bool:
+    """
+    Швидка перевірка, чи є з чого будувати регресійний прогноз: attendance_data.json
+    з достатньою кількістю точок або хоча б один завантажений щоденний аркуш.
+    """
+    from vlk_bot.sync import get_attendance_revision, DAILY_SHEETS_CACHE_DIR
     
-    points_df = pd.DataFrame(processed_points)
-    
+    revision = get_attendance_revision()
+    if revision is not None:
+        attendance_data = _load_attendance_context(revision)
+        if attendance_data and len(attendance_data.get('attendance_points', [])) >= 5:
+            return True
+    try:
+        return any(f.endswith('.csv') and f != '_stats.csv' for f in os.listdir(DAILY_SHEETS_CACHE_DIR))
+    except OSError:
+        return False
+
+
+def clear_prediction_cache():
+    """Скидає кеш прогнозів."""
+    _calculate_prediction_cached.cache_clear()
+    _load_attendance_context.cache_clear()
+    _PREDICTION_CACHE_REVISION["rev"] = None
+    _REGRESSION_CACHE.update(data=None, key=None, stats=None)
+
+
+@dataclass
+class RegressionStats:
+    """Параметри зваженої регресії ID -> дата, спільні для всіх user_id одного набору даних."""
+    slope: float
+    intercept: float
+    sumW: float
+    weightedMeanX: float
+    weightedVarX: float
+    mseWeighted: float
+    dof: float
+    tScore90: float
+    tScore50: float
+    max_id: float
+    min_feasible: float
+    data_points: int
+
+
+def _fit_regression(points_df):
+    """
+    Групує точки за ID і будує зважену лінійну регресію.
+    Повертає RegressionStats або None, якщо даних замало.
+    """
     id_groups = points_df.groupby('id').agg({
         'ordinal': 'mean',
         'is_live': 'max'
@@ -140,28 +199,45 @@ def calculate_prediction_from_attendance_json(user_id, attendance_data):
     
     mseWeighted = weightedSumResSq / dof
     
-    tScore90 = scipy_stats.t.ppf(0.95, dof)
-    tScore50 = scipy_stats.t.ppf(0.75, dof)
+    # Обидва квантилі одним викликом ufunc stdtrit (обернена до stdtr), без обгортки scipy.stats.t
+    tScore90, tScore50 = scipy_special.stdtrit(dof, [0.95, 0.75])
+    
+    return RegressionStats(
+        slope=slope,
+        intercept=intercept,
+        sumW=sumW,
+        weightedMeanX=weightedMeanX,
+        weightedVarX=weightedVarX,
+        mseWeighted=mseWeighted,
+        dof=dof,
+        tScore90=tScore90,
+        tScore50=tScore50,
+        max_id=daily_stats['id'].max(),
+        min_feasible=points_df['ordinal'].max() + 1,
+        data_points=len(points_df),
+    )
+
+
+def _predict_for_user(stats, user_id):
+    """Прогноз для одного user_id за вже побудованою регресією."""
+    from vlk_bot.utils import get_date_from_ordinal
     
-    predOrd = slope * user_id + intercept
+    predOrd = stats.slope * user_id + stats.intercept
     
-    term3 = (user_id - weightedMeanX)**2 / weightedVarX
-    sePred = np.sqrt(mseWeighted * (1 + 1/sumW + term3))
+    term3 = (user_id - stats.weightedMeanX)**2 / stats.weightedVarX
+    sePred = np.sqrt(stats.mseWeighted * (1 + 1/stats.sumW + term3))
     
-    margin90 = tScore90 * sePred
-    margin50 = tScore50 * sePred
+    margin90 = stats.tScore90 * sePred
+    margin50 = stats.tScore50 * sePred
     
     l90_ord = predOrd - margin90
     h90_ord = predOrd + margin90
     l50_ord = predOrd - margin50
     h50_ord = predOrd + margin50
     
-    max_hist_ord = points_df['ordinal'].max()
-    min_feasible = max_hist_ord + 1
-    
-    if user_id > daily_stats['id'].max():
-        l90_ord = max(l90_ord, min_feasible)
-        l50_ord = max(l50_ord, min_feasible)
+    if user_id > stats.max_id:
+        l90_ord = max(l90_ord, stats.min_feasible)
+        l50_ord = max(l50_ord, stats.min_feasible)
     
     return {
         'l90': get_date_from_ordinal(l90_ord),
@@ -172,25 +248,83 @@ def calculate_prediction_from_attendance_json(user_id, attendance_data):
         'dist': {
             'loc': predOrd,
             'scale': sePred,
-            'df': dof
+            'df': stats.dof
         },
-        'data_points': len(processed_points),
-        'data_source': 'attendance_json'
+        'data_points': stats.data_points,
     }
 
 
-def calculate_prediction_with_daily_data(user_id, use_daily_sheets=True, use_json_cache=True):
+# Регресія за останнім набором attendance_data: посилання на сам словник і (кількість точок, остання дата)
+_REGRESSION_CACHE = {"data": None, "key": None, "stats": None}
+
+
+def _prepare_regression(attendance_data):
+    """
+    Регресія за attendance_data, закешована для того самого набору даних,
+    щоб прогноз для кожного наступного user_id не перебудовував її з нуля.
+    """
+    from vlk_bot.utils import get_ordinal_dates, ids_to_numeric
+    
+    points = attendance_data.get('attendance_points', [])
+    if len(points) < 5:
+        return None
+    
+    key = (len(points), points[-1].get('date'))
+    if _REGRESSION_CACHE["data"] is attendance_data and _REGRESSION_CACHE["key"] == key:
+        return _REGRESSION_CACHE["stats"]
+    
+    # Дати всіх точок розбираються й переводяться в ordinal одним векторним проходом
+    dates = pd.to_datetime(
+        pd.Series([point.get('date') for point in points], dtype=object), format='%Y-%m-%d', errors='coerce'
+    )
+    valid_dates = dates.notna().to_numpy()
+    ordinals = np.zeros(len(points), dtype=np.int64)
+    if valid_dates.any():
+        ordinals[valid_dates] = get_ordinal_dates(dates[valid_dates].to_numpy())
+    
+    numeric_ids = ids_to_numeric([point.get('id', '') for point in points])
+    keep = valid_dates & ~np.isnan(numeric_ids)
+    
+    stats = None
+    if keep.sum() >= 5:
+        points_df = pd.DataFrame({
+            'id': numeric_ids[keep],
+            'ordinal': ordinals[keep],
+            'is_live': [point.get('is_live', False) for point, kept in zip(points, keep) if kept]
+        })
+        stats = _fit_regression(points_df)
+    
+    _REGRESSION_CACHE.update(data=attendance_data, key=key, stats=stats)
+    return stats
+
+
+def calculate_prediction_from_attendance_json(user_id, attendance_data):
+    """
+    Розраховує прогноз на основі даних з attendance_data.json.
+    """
+    stats = _prepare_regression(attendance_data)
+    if stats is None:
+        return None
+    
+    prediction = _predict_for_user(stats, user_id)
+    prediction['data_source'] = 'attendance_json'
+    return prediction
+
+
+def calculate_prediction_with_daily_data(user_id, use_daily_sheets=True, use_json_cache=True, attendance_data=None):
     """
     Розраховує прогноз дати візиту використовуючи детальні дані зі щоденних аркушів.
+    attendance_data - вже завантажений attendance_data.json, щоб не читати файл для кожного ID.
     """
-    from vlk_bot.utils import get_ordinal_date, get_date_from_ordinal, id_to_numeric
+    from vlk_bot.utils import get_ordinal_dates, ids_to_numeric
     from vlk_bot.sync import load_attendance_from_json, get_historical_attendance_data
     
     if not use_daily_sheets:
         return None
     
     if use_json_cache:
-        attendance_data = load_attendance_from_json()
+        if attendance_data is None:
+            attendance_data = load_attendance_from_json()
         if attendance_data:
             return calculate_prediction_from_attendance_json(user_id, attendance_data)
     
@@ -199,111 +333,39 @@ def calculate_prediction_with_daily_data(user_id, use_daily_sheets=True, use_jso
     if hist_df is None or len(hist_df) < 5:
         return None
     
-    points = []
-    
-    for _, row in hist_df.iterrows():
-        date_ordinal = get_ordinal_date(row['date'])
-        for attended_item in row['attended_data']:
-            numeric_id = id_to_numeric(attended_item['id'])
-            if numeric_id is None:
-                continue
-                
-            points.append({
-                'id': numeric_id,
-                'ordinal': date_ordinal,
-                'is_live': attended_item['is_live']
-            })
-    
-    if len(points) < 5:
-        return None
-    
-    points_df = pd.DataFrame(points)
-    
-    id_groups = points_df.groupby('id').agg({
-        'ordinal': 'mean',
-        'is_live': 'max'
-    }).reset_index()
-    daily_stats = id_groups.sort_values('ordinal')
-    
-    X = daily_stats['id'].values
-    Y = daily_stats['ordinal'].values
-    is_live_mask = daily_stats['is_live'].values
-    n = len(X)
-    
-    if n < 5:
-        return None
-    
-    weightExpMin = -3
-    weightExpMax = 1
-    liveQueueWeight = 0
-    
-    weights = np.exp(weightExpMin + (np.arange(n) / (n - 1)) * (weightExpMax - weightExpMin))
-    weights = np.where(is_live_mask, weights * liveQueueWeight, weights)
-    
-    sumW = np.sum(weights)
-    sumWX = np.sum(weights * X)
-    sumWY = np.sum(weights * Y)
-    sumWXX = np.sum(weights * X**2)
-    sumWXY = np.sum(weights * X * Y)
+    # Усі записи з усіх днів розгортаються в плоскі масиви, ID розбираються одним проходом
+    date_ordinals = get_ordinal_dates(hist_df['date'].to_numpy())
+    attended_lists = hist_df['attended_data'].tolist()
+    counts = np.fromiter((len(items) for items in attended_lists), dtype=np.int64, count=len(attended_lists))
+    items = [item for attended_data in attended_lists for item in attended_data]
+    numeric_ids = ids_to_numeric([item['id'] for item in items])
+    keep = ~np.isnan(numeric_ids)
     
-    denom = sumW * sumWXX - sumWX**2
-    if denom == 0:
+    if keep.sum() < 5:
         return None
     
-    slope = (sumW * sumWXY - sumWX * sumWY) / denom
-    intercept = (sumWY - slope * sumWX) / sumW
-    
-    weightedMeanX = sumWX / sumW
-    weightedVarX = np.sum(weights * (X - weightedMeanX)**2)
+    points_df = pd.DataFrame({
+        'id': numeric_ids[keep],
+        'ordinal': np.repeat(date_ordinals, counts)[keep],
+        'is_live': [item['is_live'] for item, kept in zip(items, keep) if kept]
+    })
     
-    yPred = slope * X + intercept
-    residuals = Y - yPred
-    weightedSumResSq = np.sum(weights * residuals**2)
-    
-    dof = sumW - 2
-    if dof <= 0:
+    stats = _fit_regression(points_df)
+    if stats is None:
         return None
     
-    mseWeighted = weightedSumResSq / dof
-    
-    tScore90 = scipy_stats.t.ppf(0.95, dof)
-    tScore50 = scipy_stats.t.ppf(0.75, dof)
-    
-    predOrd = slope * user_id + intercept
-    
-    term3 = (user_id - weightedMeanX)**2 / weightedVarX
-    sePred = np.sqrt(mseWeighted * (1 + 1/sumW + term3))
-    
-    margin90 = tScore90 * sePred
-    margin50 = tScore50 * sePred
-    
-    l90_ord = predOrd - margin90
-    h90_ord = predOrd + margin90
-    l50_ord = predOrd - margin50
-    h50_ord = predOrd + margin50
-    
-    max_hist_ord = points_df['ordinal'].max()
-    min_feasible = max_hist_ord + 1
-    
-    if user_id > daily_stats['id'].max():
-        l90_ord = max(l90_ord, min_feasible)
-        l50_ord = max(l50_ord, min_feasible)
-    
-    return {
-        'l90': get_date_from_ordinal(l90_ord),
-        'l50': get_date_from_ordinal(l50_ord),
-        'mean': get_date_from_ordinal(predOrd),
-        'h50': get_date_from_ordinal(h50_ord),
-        'h90': get_date_from_ordinal(h90_ord),
-        'dist': {
-            'loc': predOrd,
-            'scale': sePred,
-            'df': dof
-        },
-        'data_points': len(points),
-        'data_source': 'daily_sheets',
-        'using_daily_sheets': True
-    }
+    prediction = _predict_for_user(stats, user_id)
+    prediction['data_source'] = 'daily_sheets'
+    prediction['using_daily_sheets'] = True
+    return prediction
+
+
+def t_cdf(x, df, loc, scale):
+    """
+    Функція розподілу Стьюдента зі зсувом і масштабом. Те саме, що scipy.stats.t.cdf,
+    але напряму через ufunc stdtr, без перевірок аргументів rv_continuous на кожен виклик.
+    """
+    return scipy_special.stdtr(df, (np.asarray(x, dtype=float) - loc) / scale)
 
 
 def calculate_date_probability(date_obj, dist):
@@ -320,13 +382,28 @@ def calculate_date_probability(date_obj, dist):
         df = dist['df']
         # Використовуємо ordinal + 1, оскільки ordinal представляє початок дня,
         # і ми хочемо отримати ймовірність того, що черга настане ДО кінця цього дня.
-        prob = scipy_stats.t.cdf(ordinal + 1, df, loc=loc, scale=scale)
+        prob = float(t_cdf(ordinal + 1, df, loc, scale))
         return prob * 100
     except Exception as e:
         logger.error(f"Помилка обчислення ймовірності для {date_obj}: {e}")
         return 0.0
 
 
+def calculate_date_probabilities(dates, dist) -> np.ndarray:
+    """
+    Векторна версія calculate_date_probability: один виклик t_cdf для списку дат.
+    Повертає масив ймовірностей у відсотках (0-100).
+    """
+    from vlk_bot.utils import get_ordinal_dates
+    
+    try:
+        ordinals = get_ordinal_dates(dates).astype(float)
+        return t_cdf(ordinals + 1, dist['df'], dist['loc'], dist['scale']) * 100
+    except Exception as e:
+        logger.error(f"Помилка обчислення ймовірностей для {len(dates)} дат: {e}")
+        return np.zeros(len(dates))
+
+
 def calculate_daily_entry_probability(tomorrow_ids: list, stats_df: pd.DataFrame, 
                                        target_date: datetime.date = None) -> dict:
     """
@@ -341,30 +418,47 @@ def calculate_daily_entry_probability(tomorrow_ids: list, stats_df: pd.DataFrame
         target_date = datetime.date.today() + datetime.timedelta(days=1)
     
     try:
-        probabilities = {}
+        from vlk_bot.config import SHEETS_SERVICE, STATS_SHEET_ID, STATS_WORKSHEET_NAME
+        from vlk_bot.sync import sync_daily_sheets
         
-        for rank, uid in enumerate(tomorrow_ids, start=1):
-            main_id = extract_main_id(uid)
-            
-            prediction = calculate_prediction(main_id, stats_df)
+        # Синхронізуємо щоденні аркуші один раз для всього списку, а не для кожного ID
+        sync_daily_sheets(SHEETS_SERVICE, STATS_SHEET_ID, STATS_WORKSHEET_NAME)
+        
+        from vlk_bot.utils import get_ordinal_date
+        
+        ranks = np.arange(1, len(tomorrow_ids) + 1)
+        probs = np.zeros(len(tomorrow_ids))
+        if has_prediction_data():
+            predictions = [_get_cached_prediction(extract_main_id(uid)) for uid in tomorrow_ids]
+            has_dist = np.array([bool(p) and 'dist' in p for p in predictions], dtype=bool)
+        else:
+            # Даних для регресії немає - одразу рахуємо запасний варіант для всіх ID
+            logger.debug("Немає даних відвідуваності для прогнозу, використовуємо статистику Stats")
+            predictions = []
+            has_dist = np.zeros(len(tomorrow_ids), dtype=bool)
+        
+        if has_dist.any():
+            dists = [p['dist'] for p, ok in zip(predictions, has_dist) if ok]
+            locs = np.array([d['loc'] for d in dists], dtype=float)
+            scales = np.array([d['scale'] for d in dists], dtype=float)
+            dfs = np.array([d['df'] for d in dists], dtype=float)
+            # Один векторний виклик t_cdf для всіх ID з прогнозом (ordinal + 1 - кінець дня)
+            ordinal = get_ordinal_date(target_date)
+            probs[has_dist] = t_cdf(ordinal + 1, dfs, locs, scales) * 100
+        
+        if not has_dist.all():
+            from vlk_bot.sheets import get_recent_entry_counts
             
-            if prediction and 'dist' in prediction:
-                prob = calculate_date_probability(target_date, prediction['dist'])
-                probabilities[uid] = round(prob, 1)
-            else:
-                target_col = 'Зайшов'
-                counts = pd.to_numeric(stats_df[target_col], errors='coerce').dropna()
-                counts = counts[counts > 0]
-                counts = counts.tail(10)
-                
-                if counts.empty:
-                    probabilities[uid] = 0.0
-                else:
-                    total_days = len(counts)
-                    days_covered = (counts >= rank).sum()
-                    prob = (days_covered / total_days) * 100
-                    probabilities[uid] = round(prob, 1)
+            sorted_counts = get_recent_entry_counts(stats_df)
+            if sorted_counts.size:
+                # Кількість днів, коли зайшло не менше rank людей, для всіх позицій одразу
+                fallback_ranks = ranks[~has_dist]
+                days_covered = sorted_counts.size - np.searchsorted(sorted_counts, fallback_ranks, side='left')
+                probs[~has_dist] = days_covered / sorted_counts.size * 100
         
+        probabilities = {}
+        for uid, prob in zip(tomorrow_ids, probs):
+            probabilities[uid] = round(float(prob), 1)
         return probabilities
         
     except Exception as e:
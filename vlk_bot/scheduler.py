@@ -2,108 +2,168 @@
 Заплановані завдання.
 """
 
+import asyncio
 import datetime
 import logging
+import time
 
+import numpy as np
 import pandas as pd
 from pytz import timezone
+from telegram.error import RetryAfter
 
 from vlk_bot.formatters import get_poll_text
 from vlk_bot.keyboards import get_poll_keyboard
-from vlk_bot.sheets import load_queue_data, get_sheets_list, get_users_for_date_from_active_sheet
+from vlk_bot.sheets import load_queue_data_recent, get_sheets_list, get_users_for_date_from_active_sheet, get_stats_data, get_parsed_dates
 from vlk_bot.utils import get_next_working_days, load_status_state, save_status_state
 
 logger = logging.getLogger(__name__)
 
+# Скільки сповіщень може очікувати відповіді Telegram одночасно
+NOTIFICATION_CONCURRENCY = 25
+_SEND_SEMAPHORE = asyncio.Semaphore(NOTIFICATION_CONCURRENCY)
+# Темп розсилки: Telegram обмежує бота ~30 повідомленнями на секунду, тримаємо запас
+NOTIFICATIONS_PER_SECOND = 25
+# Скільки разів повторювати надсилання після RetryAfter (429) від Telegram
+SEND_RETRY_ATTEMPTS = 3
+# Найближчий момент (time.monotonic), коли можна надіслати наступне повідомлення
+_SEND_RATE_STATE = {"next_slot": 0.0}
+# Колонки, без яких запис не можна використати для сповіщень
+NOTIFY_REQUIRED_COLUMNS = ['ID', 'Дата', 'Статус', 'Змінено', 'TG ID']
+# Версія таблиці, для якої notify_status востаннє завершив перевірку
+_NOTIFY_STATUS_STATE = {"revision": None}
+
+
+async def _wait_send_slot():
+    """Чекає на наступний вільний слот, щоб розсилка не перевищувала NOTIFICATIONS_PER_SECOND."""
+    now = time.monotonic()
+    slot = max(now, _SEND_RATE_STATE["next_slot"])
+    _SEND_RATE_STATE["next_slot"] = slot + 1 / NOTIFICATIONS_PER_SECOND
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
+
+async def send_message_throttled(context, **kwargs):
+    """
+    Надсилає повідомлення з обмеженням одночасних запитів і темпу розсилки.
+    Після RetryAfter чекає вказаний Telegram час (разом з усією розсилкою) і повторює спробу.
+    """
+    async with _SEND_SEMAPHORE:
+        for attempt in range(SEND_RETRY_ATTEMPTS + 1):
+            await _wait_send_slot()
+            try:
+                return await context.bot.send_message(**kwargs)
+            except RetryAfter as e:
+                if attempt == SEND_RETRY_ATTEMPTS:
+                    raise
+                delay = e.retry_after
+                if isinstance(delay, datetime.timedelta):
+                    delay = delay.total_seconds()
+                logger.warning(f"Telegram обмежив розсилку, повтор через {delay} с")
+                _SEND_RATE_STATE["next_slot"] = max(_SEND_RATE_STATE["next_slot"], time.monotonic() + delay)
+
 
 async def send_user_notification(context, tg_id: str, text: str):
     """Надсилає повідомлення користувачу."""
     if not tg_id or not tg_id.strip():
         return
     try:
-        await context.bot.send_message(chat_id=int(tg_id), text=text, parse_mode='HTML')
+        await send_message_throttled(context, chat_id=int(tg_id), text=text, parse_mode='HTML')
     except Exception as e:
         logger.warning(f"Не вдалося надіслати повідомлення користувачу {tg_id}: {e}")
 
 
+def get_latest_entries(queue_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Повертає найактуальніший запис (максимальне 'Змінено_dt') для кожного ID.
+    Стабільне сортування за спаданням залишає першим перший з однакових записів, як idxmax.
+    """
+    return queue_df.sort_values('Змінено_dt', ascending=False, kind='stable').drop_duplicates(subset='ID', keep='first')
+
+
 async def notify_status(context) -> None:
     """Функція для відстеження зміни статусу запису та надсилання сповіщень."""
     logger.info("Початок перевірки зміни статусів записів.")
     
     # 1. Завантажуємо дані з Google Sheets
     import vlk_bot.config as config_module
-    config_module.queue_df = load_queue_data()
+    config_module.queue_df = await asyncio.to_thread(load_queue_data_recent)
     queue_df = config_module.queue_df
     
     if queue_df is None or queue_df.empty:
         logger.warning("Черга порожня або не завантажена")
         return
     
+    # Якщо версія таблиці та сама, нових змін статусів немає (кешована черга завантажується без запиту до Sheets)
+    revision = queue_df.attrs.get('revision')
+    if revision is not None and revision == _NOTIFY_STATUS_STATE["revision"]:
+        logger.info(f"Таблиця не змінилась з останньої перевірки (версія {revision}), пропускаємо.")
+        return
+    
     # 2. Очищаємо та готуємо дані
-    queue_df['Змінено_dt'] = pd.to_datetime(queue_df['Змінено'], format="%d.%m.%Y %H:%M:%S", errors='coerce')
+    queue_df['Змінено_dt'] = get_parsed_dates(queue_df, 'Змінено')
     # Використовуємо стару дату (2000 рік), щоб записи без дати зміни не перекривали актуальні записи при сортуванні
     queue_df['Змінено_dt'] = queue_df['Змінено_dt'].fillna(pd.Timestamp("2000-01-01 00:00:00"))
-    queue_df.dropna(inplace=True)
-    queue_df['TG ID'] = queue_df['TG ID'].astype(str)    
+    # 'Змінено_dt' вже заповнено, тож перевіряються лише колонки, порожнеча яких робить запис непридатним
+    queue_df.dropna(subset=NOTIFY_REQUIRED_COLUMNS, inplace=True)
 
     # 3. Знаходимо найактуальніший запис для кожного користувача
-    latest_entries = queue_df.loc[queue_df.groupby('ID')['Змінено_dt'].idxmax()]
+    latest_entries = get_latest_entries(queue_df)
 
     # 4. Завантажуємо останній відомий стан
     last_known_state = load_status_state()
     
-    # 5. Перевіряємо зміни та відправляємо сповіщення
-    new_state = {}
-    for index, row in latest_entries.iterrows():
-        user_id = row['ID']
-        target_date = row['Дата']
-        note = row['Примітки']
-        current_status = row['Статус']
-        modified = row['Змінено']
-        prev_date = row['Попередня дата']
-        tg_id = row['TG ID']
-              
-        last_status_info = last_known_state.get(user_id)
-
-        if not last_status_info:
-            confirmation = ''
-        elif 'confirmation' not in last_status_info:
-            confirmation = ''
+    # 5. Порівнюємо з попереднім станом одним вирівнюванням за ID замість перевірки кожного рядка
+    ids = latest_entries['ID'].astype(str).to_numpy()
+    target_dates = latest_entries['Дата'].to_numpy(dtype=object)
+    statuses = latest_entries['Статус'].to_numpy(dtype=object)
+    modified_values = latest_entries['Змінено'].to_numpy(dtype=object)
+    
+    prev_df = pd.DataFrame.from_dict(last_known_state, orient='index')
+    prev_df = prev_df.reindex(index=ids, columns=['date', 'status', 'modified', 'confirmation'])
+    known = pd.Index(ids).isin(list(last_known_state))
+    
+    # Стан змінився або це новий запис
+    changed = (
+        ~known
+        | (prev_df['status'].to_numpy(dtype=object) != statuses)
+        | (prev_df['date'].to_numpy(dtype=object) != target_dates)
+        | (prev_df['modified'].to_numpy(dtype=object) != modified_values)
+    )
+    notify_mask = changed & (statuses != 'На розгляді')
+    
+    # Відправляємо сповіщення лише для змінених записів, одночасно (з обмеженням кількості та темпу, див. send_message_throttled)
+    sends = []
+    notify_columns = ['ID', 'Дата', 'Примітки', 'Статус', 'Попередня дата', 'TG ID']
+    for user_id, target_date, note, current_status, prev_date, tg_id in latest_entries.loc[notify_mask, notify_columns].itertuples(index=False, name=None):
+        # Формуємо текст повідомлення
+        if target_date != '':
+            to_date = f" на <code>{target_date}</code>"
+            if prev_date != '':
+                rmc = 'перенесення' 
+            else:
+                   rmc = 'створення'
         else:
-            confirmation = last_status_info['confirmation']
-      
-        # Якщо стан змінився або це новий запис
-        if ((not last_status_info) 
-            or (last_status_info['status'] != current_status and last_status_info['date'] == target_date and last_status_info['modified'] == modified)
-            or (last_status_info['date'] != target_date or last_status_info['modified'] != modified)
-        ):
-            # Формуємо текст повідомлення
-            if current_status != 'На розгляді':
-                if target_date != '':
-                    to_date = f" на <code>{target_date}</code>"
-                    if prev_date != '':
-                        rmc = 'перенесення' 
-                    else:
-                           rmc = 'створення'
-                else:
-                    rmc = 'скасування'
-                    to_date = ""
-                emo = '🟢' if current_status == 'Ухвалено' else '🔴'
-                notification_text = f"{emo} Заявку на {rmc} запису ID <code>{user_id}</code> {to_date}\n<code>{current_status}</code>"
-                notification_warning = f'\nПримітка: <code>{note}</code>' if note !='' else ''
-                notification = notification_text+notification_warning
-                await send_user_notification(context, tg_id, notification)
-        
-        # Оновлюємо стан для збереження
-        new_state[user_id] = {
-            'date': target_date,
-            'status': current_status,
-            'modified': modified,
-            'confirmation': confirmation
-        }
+            rmc = 'скасування'
+            to_date = ""
+        emo = '🟢' if current_status == 'Ухвалено' else '🔴'
+        notification_text = f"{emo} Заявку на {rmc} запису ID <code>{user_id}</code> {to_date}\n<code>{current_status}</code>"
+        notification_warning = f'\nПримітка: <code>{note}</code>' if note !='' else ''
+        notification = notification_text+notification_warning
+        sends.append(send_user_notification(context, tg_id, notification))
+    await asyncio.gather(*sends, return_exceptions=True)
+    
+    # Оновлюємо стан для збереження
+    confirmations = prev_df['confirmation'].fillna('').to_numpy(dtype=object)
+    new_state = {
+        user_id: {'date': target_date, 'status': current_status, 'modified': modified, 'confirmation': confirmation}
+        for user_id, target_date, current_status, modified, confirmation
+        in zip(ids, target_dates, statuses, modified_values, confirmations)
+    }
 
     # 6. Зберігаємо оновлений стан
     save_status_state(new_state)
+    _NOTIFY_STATUS_STATE["revision"] = revision
     logger.info("Завершення перевірки зміни статусів записів.")
 
 
@@ -112,55 +172,52 @@ async def date_reminder(context) -> None:
     logger.info("Початок процедури нагадування і підтвердження дати візиту.")
     
     import vlk_bot.config as config_module
-    config_module.queue_df = load_queue_data()
+    config_module.queue_df = await asyncio.to_thread(load_queue_data_recent)
     queue_df = config_module.queue_df
     
     if queue_df is None or queue_df.empty:
         logger.warning("Черга порожня або не завантажена")
         return
     
-    queue_df['Змінено_dt'] = pd.to_datetime(queue_df['Змінено'], format="%d.%m.%Y %H:%M:%S", errors='coerce')
-    queue_df['Змінено_dt'] = queue_df['Змінено_dt'].fillna(pd.Timestamp("2000-01-01 00:00:00"))
-    queue_df['Дата_dt'] = pd.to_datetime(queue_df['Дата'], format="%d.%m.%Y", errors='coerce').dt.date
-    queue_df.dropna(inplace=True)
-    queue_df['TG ID'] = queue_df['TG ID'].astype(str)    
+    queue_df['Змінено_dt'] = get_parsed_dates(queue_df, 'Змінено').fillna(pd.Timestamp("2000-01-01 00:00:00"))
+    queue_df['Дата_dt'] = get_parsed_dates(queue_df, 'Дата').dt.date
+    queue_df.dropna(subset=NOTIFY_REQUIRED_COLUMNS + ['Дата_dt'], inplace=True)
 
-    latest_entries = queue_df.loc[queue_df.groupby('ID')['Змінено_dt'].idxmax()]
+    latest_entries = get_latest_entries(queue_df)
     
     current_date_obj = datetime.date.today()
     one_day_later = current_date_obj + datetime.timedelta(days=1)
     three_days_later = current_date_obj + datetime.timedelta(days=3)
     
-    for index, row in latest_entries.iterrows():
-        user_id = row['ID']
-        target_date = row['Дата']
-        target_date_dt = row['Дата_dt']
-        note = row['Примітки']
-        current_status = row['Статус']
-        tg_id = row['TG ID']
-        remind = False
-        nr_days = ''
-     
-        if target_date_dt == current_date_obj:
-            remind = True
-            nr_days = 'на сьогодні'        
-        if target_date_dt == one_day_later:
-            remind = True
-            nr_days = 'на завтра'
-        if target_date_dt == three_days_later:
-            remind = True
-            nr_days = 'за 3 дні'
-        
-        if remind and current_status == 'Ухвалено':
-            emo = '❗️'
-            notification_text = f"{emo}<code>Нагадування!</code>\n  Для вашого номеру <code>{user_id}</code> призначено візит {nr_days}: <code>{target_date}</code>"
-            notification_warning = f'\nПримітка: <code>{note}</code>' if note !='' else ''
-            notification = notification_text+notification_warning
-            await send_user_notification(context, tg_id, notification)
+    # Мітки нагадування для всіх записів одним проходом; у циклі лише ті, кому треба надіслати
+    target_dates = latest_entries['Дата_dt']
+    nr_days_all = np.select(
+        [target_dates == current_date_obj, target_dates == one_day_later, target_dates == three_days_later],
+        ['на сьогодні', 'на завтра', 'за 3 дні'],
+        default=''
+    )
+    remind_mask = (nr_days_all != '') & (latest_entries['Статус'] == 'Ухвалено').to_numpy()
+    
+    sends = []
+    remind_rows = latest_entries.loc[remind_mask, ['ID', 'Дата', 'Примітки', 'TG ID']].itertuples(index=False, name=None)
+    for (user_id, target_date, note, tg_id), nr_days in zip(remind_rows, nr_days_all[remind_mask]):
+        emo = '❗️'
+        notification_text = f"{emo}<code>Нагадування!</code>\n  Для вашого номеру <code>{user_id}</code> призначено візит {nr_days}: <code>{target_date}</code>"
+        notification_warning = f'\nПримітка: <code>{note}</code>' if note !='' else ''
+        notification = notification_text+notification_warning
+        sends.append(send_user_notification(context, tg_id, notification))
+    await asyncio.gather(*sends, return_exceptions=True)
 
     logger.info("Завершення процедури нагадування і підтвердження дати візиту.")
 
 
+async def prefetch_stats(context) -> None:
+    """Фоново оновлює кеш 'Stats', щоб запити користувачів не чекали на Google Sheets."""
+    stats_df = await get_stats_data()
+    if stats_df is None:
+        logger.warning("Не вдалося попередньо завантажити Stats")
+
+
 async def check_new_daily_sheet(context) -> None:
     """Перевіряє чи з'явився аркуш з датою наступного прийомного дня."""
     from vlk_bot.config import STATS_SHEET_ID
@@ -173,7 +230,7 @@ async def check_new_daily_sheet(context) -> None:
             logger.debug("Опитування вже надіслано сьогодні, пропускаємо перевірку")
             return
     
-    existing_sheets = get_sheets_list(STATS_SHEET_ID)
+    existing_sheets = await asyncio.to_thread(get_sheets_list, STATS_SHEET_ID)
     if not existing_sheets:
         logger.warning("Не вдалося отримати список аркушів")
         return
@@ -224,35 +281,41 @@ async def send_visit_poll(context) -> None:
     
     logger.info(f"Надсилання опитування для дати {next_sheet}")
     
-    users = get_users_for_date_from_active_sheet(next_sheet)
+    users = await asyncio.to_thread(get_users_for_date_from_active_sheet, next_sheet)
     
     if not users:
         logger.info(f"Не знайдено користувачів для дати {next_sheet}")
         return
     
-    sent_count = 0
-    error_count = 0
-    
-    for user_data in users:
-        user_id = user_data.get('id')
-        tg_id = user_data.get('tg_id')
-        
-        if not tg_id or not tg_id.strip():
-            logger.debug(f"Пропущено ID {user_id} - немає TG ID")
-            continue
-        
+    async def send_poll(user_id, tg_id) -> bool:
         try:
-            await context.bot.send_message(
+            await send_message_throttled(
+                context,
                 chat_id=int(tg_id),
                 text=get_poll_text(user_id, next_sheet),
                 reply_markup=get_poll_keyboard(user_id),
                 parse_mode="HTML"
             )
-            sent_count += 1
             logger.info(f"Опитування надіслано: ID {user_id}, TG {tg_id}")
+            return True
         except Exception as e:
-            error_count += 1
             logger.warning(f"Помилка надсилання опитування ID {user_id}: {e}")
+            return False
+    
+    sends = []
+    for user_data in users:
+        user_id = user_data.get('id')
+        tg_id = user_data.get('tg_id')
+        
+        if not tg_id or not tg_id.strip():
+            logger.debug(f"Пропущено ID {user_id} - немає TG ID")
+            continue
+        sends.append(send_poll(user_id, tg_id))
+    
+    # Опитування надсилаються одночасно з тим самим обмеженням темпу й повтором після RetryAfter, що й сповіщення
+    results = await asyncio.gather(*sends)
+    sent_count = sum(results)
+    error_count = len(results) - sent_count
     
     logger.info(f"Опитування завершено: надіслано {sent_count}, помилок {error_count}")
 
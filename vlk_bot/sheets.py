@@ -2,12 +2,17 @@
 Операції з Google Sheets API.
 """
 
+import asyncio
 import datetime
+import itertools
 import logging
 import os
 import socket
+import threading
 import time
+from dataclasses import dataclass
 
+import numpy as np
 import pandas as pd
 from googleapiclient.errors import HttpError
 
@@ -16,6 +21,160 @@ logger = logging.getLogger(__name__)
 RETRY_DELAYS = [1, 5]
 RETRY_EXCEPTIONS = (BrokenPipeError, ConnectionError, ConnectionResetError, OSError, socket.timeout, TimeoutError)
 
+# Виклики Google API виконуються з потоків (asyncio.to_thread), а httplib2 не потокобезпечний,
+# тому всі запити через спільне HTTP-з'єднання серіалізуються
+SHEETS_API_LOCK = threading.Lock()
+# Оновлення кешу Stats (пам'ять + _stats.csv) виконується лише одним потоком одночасно
+_STATS_LOCK = threading.Lock()
+
+# Кеш у пам'яті, який інвалідується за версією файлу таблиці (Drive API)
+_QUEUE_CACHE = {"rev": None, "store": None, "df": None, "disk_checked": False, "recent": None, "loaded_at": None}
+_STATS_CACHE = {"rev": None, "df": None, "loaded_at": None, "last_entered_max": None, "recent_entry_counts": None}
+
+# Скільки останніх днів з ненульовою кількістю тих, хто зайшов, враховує запасний прогноз
+RECENT_ENTRY_DAYS = 10
+
+
+# Колонки з датами, які розбираються один раз при завантаженні черги (колонка -> формат)
+QUEUE_DATE_COLUMNS = {'Дата': "%d.%m.%Y", 'Змінено': "%d.%m.%Y %H:%M:%S"}
+
+# Нормалізовані (без пробілів, у нижньому регістрі) статуси заявок; невідомі значення стають NaN.
+# Колонка 'Статус' у таблиці не змінюється, категоріальна копія зберігається в 'Статус_norm'
+QUEUE_STATUSES = ['на розгляді', 'ухвалено', 'відхилено']
+STATUS_DTYPE = pd.CategoricalDtype(categories=QUEUE_STATUSES)
+
+
+def normalize_statuses(values) -> pd.Categorical:
+    """Приводить статуси до категоріального типу для швидкого порівняння за кодами."""
+    normalized = pd.Series(values, dtype=object).astype(str).str.strip().str.casefold()
+    return pd.Categorical(normalized.where(normalized.isin(QUEUE_STATUSES)), dtype=STATUS_DTYPE)
+
+
+# Колонки з повторюваними значеннями: коди категорій замість окремого рядка Python на кожен запис
+CATEGORICAL_QUEUE_COLUMNS = ('ID', 'Статус')
+# Текстові колонки, з яких пробіли прибираються один раз під час завантаження
+STRIPPED_QUEUE_COLUMNS = ('Дата', 'Статус', 'Попередня дата', 'Примітки', 'TG ID')
+
+
+@dataclass
+class QueueStore:
+    """
+    Колонкове представлення черги: окремий масив NumPy для кожної колонки.
+    Дати розбираються один раз під час завантаження у колонки '<назва>_dt',
+    статус нормалізується в категоріальну колонку 'Статус_norm'.
+    'ID' і 'Статус' мають небагато різних значень і зберігаються як категоріальні.
+    """
+    cols: dict
+
+    @classmethod
+    def from_columns(cls, columns_data: dict) -> "QueueStore":
+        """Створює сховище з масивів колонок і розбирає дати."""
+        cols = dict(columns_data)
+        for name in STRIPPED_QUEUE_COLUMNS:
+            if name in cols:
+                cols[name] = pd.Series(cols[name], dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+        for name, date_format in QUEUE_DATE_COLUMNS.items():
+            cols[f"{name}_dt"] = pd.to_datetime(cols[name], format=date_format, errors='coerce').to_numpy()
+        cols['Статус_norm'] = normalize_statuses(cols['Статус'])
+        for name in CATEGORICAL_QUEUE_COLUMNS:
+            cols[name] = pd.Categorical(cols[name])
+        return cls(cols)
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray, columns: list) -> "QueueStore":
+        """Створює сховище з двовимірного масиву рядків таблиці."""
+        return cls.from_columns({name: np.ascontiguousarray(rows[:, i]) for i, name in enumerate(columns)})
+
+    @classmethod
+    def from_sheet_values(cls, rows: list, columns: list) -> "QueueStore":
+        """
+        Створює сховище з рядків відповіді Sheets API різної довжини.
+        zip_longest транспонує рядки в колонки і доповнює короткі рядки порожніми значеннями,
+        зайві колонки відкидаються.
+        """
+        transposed = list(itertools.zip_longest(*rows, fillvalue=''))[:len(columns)]
+        cols = {}
+        for i, name in enumerate(columns):
+            if i < len(transposed):
+                cols[name] = np.array(transposed[i], dtype=object)
+            else:
+                cols[name] = np.full(len(rows), '', dtype=object)
+        return cls.from_columns(cols)
+
+    def __len__(self) -> int:
+        return len(self.cols['ID'])
+
+    def to_dataframe(self, columns: list) -> pd.DataFrame:
+        """Створює новий DataFrame з вказаних колонок та розібраних дат (DataFrame копіює масиви)."""
+        names = list(columns) + [f"{name}_dt" for name in QUEUE_DATE_COLUMNS] + ['Статус_norm']
+        return pd.DataFrame({name: self.cols[name] for name in names}, columns=names)
+
+
+def get_status_norm(df: pd.DataFrame) -> pd.Series:
+    """
+    Повертає нормалізовані статуси як категоріальну колонку. Використовує 'Статус_norm'
+    з load_queue_data і нормалізує лише рядки, яких там немає.
+    """
+    if 'Статус_norm' not in df.columns:
+        return pd.Series(normalize_statuses(df['Статус']), index=df.index)
+    
+    status = df['Статус_norm']
+    if not isinstance(status.dtype, pd.CategoricalDtype):
+        status = status.astype(STATUS_DTYPE)
+    missing = status.isna()
+    if missing.any():
+        status = status.copy()
+        status[missing] = normalize_statuses(df.loc[missing, 'Статус'])
+    return status
+
+
+# Розібрані значення рядків дат, яких немає серед дат з load_queue_data (порожні дати скасувань,
+# щойно додані записи): при кожному запуску планувальника розбираються лише нові рядки
+_PARSED_DATES_CACHE = {name: {} for name in QUEUE_DATE_COLUMNS}
+PARSED_DATES_CACHE_SIZE = 10000
+
+
+def _parse_dates_cached(values: pd.Series, column: str) -> pd.Series:
+    """Розбирає рядки дат колонки, звертаючись до pd.to_datetime лише для ще не бачених значень."""
+    cache = _PARSED_DATES_CACHE[column]
+    raw = values.astype(str).str.strip()
+    new_values = raw[~raw.isin(cache.keys())].unique()
+    if len(new_values):
+        if len(cache) + len(new_values) > PARSED_DATES_CACHE_SIZE:
+            cache.clear()
+        cache.update(zip(new_values, pd.to_datetime(new_values, format=QUEUE_DATE_COLUMNS[column], errors='coerce')))
+    return pd.to_datetime(raw.map(cache))
+
+
+def get_parsed_dates(df: pd.DataFrame, column: str) -> pd.Series:
+    """
+    Повертає колонку дат як datetime. Використовує значення, розібрані в load_queue_data,
+    і розбирає лише рядки, яких там немає (наприклад, щойно додані записи).
+    """
+    parsed_column = f"{column}_dt"
+    if parsed_column not in df.columns:
+        return _parse_dates_cached(df[column], column)
+    
+    parsed = df[parsed_column]
+    missing = parsed.isna()
+    if missing.any():
+        parsed = parsed.copy()
+        parsed[missing] = _parse_dates_cached(df.loc[missing, column], column)
+    return parsed
+
+
+# Позиції рядків кожного ID для останньої таблиці черги; таблиця не змінюється на місці
+# (нові рядки дають нову таблицю), тож індекс будується заново лише для нової таблиці
+_ID_INDEX = {"df": None, "positions": None}
+
+
+def get_id_records(df: pd.DataFrame, user_id: str) -> pd.DataFrame:
+    """Повертає записи черги з вказаним ID без перегляду всієї таблиці на кожен запит."""
+    if _ID_INDEX["df"] is not df:
+        _ID_INDEX["positions"] = df.groupby('ID', sort=False, observed=True).indices
+        _ID_INDEX["df"] = df
+    return df.iloc[_ID_INDEX["positions"].get(user_id, [])]
+
 
 def _execute_with_retry(func_name: str, api_call_func):
     """
@@ -35,7 +194,8 @@ def _execute_with_retry(func_name: str, api_call_func):
         start_time = time.time()
         try:
             logger.info(f"{func_name}: API виклик розпочато...")
-            result = api_call_func()
+            with SHEETS_API_LOCK:
+                result = api_call_func()
             elapsed = time.time() - start_time
             logger.info(f"{func_name}: API виклик завершено за {elapsed:.2f}с")
             return result
@@ -50,6 +210,106 @@ def _execute_with_retry(func_name: str, api_call_func):
                 raise
 
 
+def get_spreadsheet_revision(spreadsheet_id: str) -> str | None:
+    """
+    Повертає маркер версії таблиці (version + modifiedTime з Drive API).
+    Це дешевий запит метаданих замість повного читання значень.
+    Повертає None, якщо версію отримати не вдалося - тоді кеш не використовується.
+    """
+    from vlk_bot.config import DRIVE_SERVICE
+    
+    if DRIVE_SERVICE is None:
+        return None
+    
+    try:
+        meta = _execute_with_retry(
+            "get_spreadsheet_revision",
+            lambda: DRIVE_SERVICE.files().get(
+                fileId=spreadsheet_id, fields="modifiedTime,version"
+            ).execute()
+        )
+        return f"{meta.get('version')}:{meta.get('modifiedTime')}"
+    except HttpError as err:
+        if err.resp.status in (403, 404):
+            # Drive API не увімкнено в проєкті або немає доступу до файлу - повторні запити
+            # лише додаватимуть затримку, тому вимикаємо перевірку версії до перезапуску
+            import vlk_bot.config as config_module
+            config_module.DRIVE_SERVICE = None
+            logger.warning(f"Drive API недоступний ({err.resp.status}), кешування за версією таблиці вимкнено.")
+        else:
+            logger.warning(f"Не вдалося отримати версію таблиці: {err.resp.status}")
+        return None
+    except RETRY_EXCEPTIONS:
+        return None
+    except Exception as e:
+        logger.warning(f"Помилка отримання версії таблиці: {e}")
+        return None
+
+
+def invalidate_queue_cache():
+    """Скидає кеш черги (викликається після запису в таблицю)."""
+    _QUEUE_CACHE["rev"] = None
+    _QUEUE_CACHE["store"] = None
+    _QUEUE_CACHE["df"] = None
+    _QUEUE_CACHE["recent"] = None
+    _QUEUE_CACHE["loaded_at"] = None
+    # Версія Drive може оновитись пізніше за запис, тож відрендерена черга за старою версією вже застаріла
+    from vlk_bot.formatters import clear_queue_render_cache
+    clear_queue_render_cache()
+
+
+# Рядки, дописані в таблицю після останнього завантаження черги; до config.queue_df
+# додаються одним concat при наступному читанні, а не копіюванням таблиці на кожен запис
+_PENDING_QUEUE_ROWS = []
+
+
+def append_pending_queue_row(new_entry: dict):
+    """Запам'ятовує рядок, щойно збережений у Google Sheet, для config.queue_df."""
+    _PENDING_QUEUE_ROWS.append(new_entry)
+
+
+def materialize_queue_df() -> pd.DataFrame | None:
+    """Дописує відкладені рядки до config.queue_df і повертає актуальну таблицю."""
+    import vlk_bot.config as config_module
+    
+    if _PENDING_QUEUE_ROWS and config_module.queue_df is not None:
+        config_module.queue_df = pd.concat(
+            [config_module.queue_df, pd.DataFrame(_PENDING_QUEUE_ROWS)], ignore_index=True
+        )
+        # Таблиця з дописаними рядками вже не відповідає версії з Drive: без неї кеші за версією не застосовуються
+        config_module.queue_df.attrs.pop('revision', None)
+    _PENDING_QUEUE_ROWS.clear()
+    return config_module.queue_df
+
+
+def _load_queue_cache_file():
+    """Відновлює кеш черги з локального parquet-файлу (після перезапуску бота)."""
+    from vlk_bot.config import QUEUE_CACHE_FILE, REQUIRED_COLUMNS
+    
+    if not os.path.exists(QUEUE_CACHE_FILE):
+        return
+    try:
+        df = pd.read_parquet(QUEUE_CACHE_FILE)
+        _QUEUE_CACHE["store"] = QueueStore.from_rows(df[REQUIRED_COLUMNS].to_numpy(dtype=object), REQUIRED_COLUMNS)
+        _QUEUE_CACHE["rev"] = df.attrs.get('revision')
+        _QUEUE_CACHE["df"] = None
+        logger.info(f"Кеш черги відновлено з {QUEUE_CACHE_FILE} (версія {_QUEUE_CACHE['rev']})")
+    except Exception as e:
+        logger.warning(f"Помилка читання {QUEUE_CACHE_FILE}: {e}")
+
+
+def _save_queue_cache_file(df: pd.DataFrame, revision: str):
+    """Зберігає чергу разом з версією таблиці у локальний parquet-файл."""
+    from vlk_bot.config import QUEUE_CACHE_FILE
+    
+    try:
+        df_to_save = df.copy(deep=False)
+        df_to_save.attrs['revision'] = revision
+        df_to_save.to_parquet(QUEUE_CACHE_FILE, index=False)
+    except Exception as e:
+        logger.warning(f"Помилка збереження {QUEUE_CACHE_FILE}: {e}")
+
+
 def load_queue_data() -> pd.DataFrame | None:
     """Завантажує дані черги з Google Sheet."""
     from vlk_bot.config import SHEETS_SERVICE, SPREADSHEET_ID, SHEET_NAME, REQUIRED_COLUMNS
@@ -58,6 +318,20 @@ def load_queue_data() -> pd.DataFrame | None:
         logger.error("Google Sheets API не ініціалізовано. Неможливо завантажити дані.")
         return None
 
+    revision = get_spreadsheet_revision(SPREADSHEET_ID)
+    if revision is not None and not _QUEUE_CACHE["disk_checked"]:
+        _QUEUE_CACHE["disk_checked"] = True
+        _load_queue_cache_file()
+    if revision is not None and revision == _QUEUE_CACHE["rev"] and _QUEUE_CACHE["store"] is not None:
+        logger.info(f"Дані черги не змінились (версія {revision}), використано кеш.")
+        if _QUEUE_CACHE["df"] is None:
+            _QUEUE_CACHE["df"] = _QUEUE_CACHE["store"].to_dataframe(REQUIRED_COLUMNS)
+            _QUEUE_CACHE["df"].attrs['revision'] = revision
+        # Поверхнева копія без копіювання даних: завдяки copy-on-write зміни викликача не зачіпають кеш
+        return _QUEUE_CACHE["df"].copy(deep=False)
+
+    # Свіже читання таблиці вже містить усі дописані раніше рядки
+    _PENDING_QUEUE_ROWS.clear()
     try:
         range_name = f"{SHEET_NAME}!A:{chr(ord('A') + len(REQUIRED_COLUMNS) - 1)}"
         result = _execute_with_retry(
@@ -72,21 +346,17 @@ def load_queue_data() -> pd.DataFrame | None:
             logger.warning("Google Sheet порожній. Ініціалізація заголовків.")
             return pd.DataFrame(columns=REQUIRED_COLUMNS)
 
-        columns = values[0]
-        data = values[1:]
+        store = QueueStore.from_sheet_values(values[1:], REQUIRED_COLUMNS)
+        df = store.to_dataframe(REQUIRED_COLUMNS)
 
-        expected_num_columns = len(REQUIRED_COLUMNS)
-        processed_data = []
-        for row in data:
-            if len(row) < expected_num_columns:
-                processed_row = row + [''] * (expected_num_columns - len(row))
-            elif len(row) > expected_num_columns:
-                processed_row = row[:expected_num_columns]
-            else:
-                processed_row = row
-            processed_data.append(processed_row)
-
-        df = pd.DataFrame(processed_data, columns=REQUIRED_COLUMNS)
+        _QUEUE_CACHE["rev"] = revision
+        _QUEUE_CACHE["store"] = store if revision is not None else None
+        _QUEUE_CACHE["df"] = None
+        if revision is not None:
+            _save_queue_cache_file(df[REQUIRED_COLUMNS], revision)
+            df.attrs['revision'] = revision
+            _QUEUE_CACHE["df"] = df
+            df = df.copy(deep=False)
 
         logger.info(f"Дані успішно завантажено з Google Sheet. Завантажено {len(df)} записів.")
         return df
@@ -101,19 +371,50 @@ def load_queue_data() -> pd.DataFrame | None:
         return None
 
 
-def save_queue_data(df_to_save) -> bool:
-    """Зберігає дані черги у Google Sheet (додавання рядків)."""
+def load_queue_data_recent() -> pd.DataFrame | None:
+    """
+    Повертає чергу, завантажену не більше QUEUE_RELOAD_TTL_SECONDS тому, без звернення до Drive і Sheets;
+    інакше завантажує її через load_queue_data. Запис у таблицю скидає цей кеш.
+    """
+    from vlk_bot.config import QUEUE_RELOAD_TTL_SECONDS
+    
+    loaded_at = _QUEUE_CACHE["loaded_at"]
+    if _QUEUE_CACHE["recent"] is not None and loaded_at is not None and time.monotonic() - loaded_at < QUEUE_RELOAD_TTL_SECONDS:
+        logger.info("Черга завантажувалась щойно, використано збережену таблицю.")
+        return _QUEUE_CACHE["recent"].copy(deep=False)
+    
+    df = load_queue_data()
+    if df is not None:
+        # Поверхнева копія: зміни викликача на місці не потрапляють у збережену таблицю
+        _QUEUE_CACHE["recent"] = df.copy(deep=False)
+        _QUEUE_CACHE["loaded_at"] = time.monotonic()
+    return df
+
+
+def save_queue_data(entries) -> bool:
+    """
+    Зберігає дані черги у Google Sheet (додавання рядків).
+    Приймає словник одного запису, список словників або DataFrame.
+    """
     from vlk_bot.config import SHEETS_SERVICE, SPREADSHEET_ID, SHEET_NAME, REQUIRED_COLUMNS
     
     if SHEETS_SERVICE is None:
         logger.error("Google Sheets API не ініціалізовано. Неможливо зберегти дані.")
         return False
-    if df_to_save.empty:
+    if isinstance(entries, dict):
+        entries = [entries]
+    if len(entries) == 0:
         logger.warning("Спроба зберегти порожній запис у Google Sheet. Пропущено.")
         return True
 
+    invalidate_queue_cache()
     try:
-        data_to_append = df_to_save[REQUIRED_COLUMNS].values.tolist()
+        if isinstance(entries, pd.DataFrame):
+            data_to_append = entries[REQUIRED_COLUMNS].values.tolist()
+            first_id = entries.iloc[0]['ID']
+        else:
+            data_to_append = [[entry.get(name, '') for name in REQUIRED_COLUMNS] for entry in entries]
+            first_id = entries[0].get('ID')
 
         _execute_with_retry(
             "save_queue_data",
@@ -125,7 +426,7 @@ def save_queue_data(df_to_save) -> bool:
             ).execute()
         )
         
-        logger.info(f"Новий запис успішно додано до Google Sheet '{SHEET_NAME}'. ID: {df_to_save.iloc[0]['ID']}")
+        logger.info(f"Новий запис успішно додано до Google Sheet '{SHEET_NAME}'. ID: {first_id}")
         return True
     except HttpError as err:
         logger.error(f"Google API HttpError при збереженні даних: {err.resp.status} - {err.content}")
@@ -147,36 +448,19 @@ def save_queue_data_full(df: pd.DataFrame) -> bool:
         logger.error("Google Sheets API не ініціалізовано. Неможливо зберегти дані.")
         return False
 
+    invalidate_queue_cache()
     try:
-        _execute_with_retry(
-            "save_queue_data_full.clear",
-            lambda: SHEETS_SERVICE.spreadsheets().values().clear(
-                spreadsheetId=SPREADSHEET_ID, range=f"{SHEET_NAME}!A:Z"
-            ).execute()
-        )
-        logger.info(f"Google Sheet '{SHEET_NAME}' було очищено перед записом.")
-
-        if df.empty:
-            logger.info(f"DataFrame для запису порожній, записано лише заголовки.")
-            body = {'values': [REQUIRED_COLUMNS]}
-            _execute_with_retry(
-                "save_queue_data_full.headers",
-                lambda: SHEETS_SERVICE.spreadsheets().values().update(
-                    spreadsheetId=SPREADSHEET_ID, range=f"{SHEET_NAME}!A1",
-                    valueInputOption='RAW', body=body
-                ).execute()
-            )
-            return True
-
-        df_to_save = df.copy()
-        for col in REQUIRED_COLUMNS:
-            if col not in df_to_save.columns:
-                df_to_save[col] = ''
-        df_to_save = df_to_save[REQUIRED_COLUMNS]
-
-        data_to_write = [df_to_save.columns.tolist()]
-        data_to_write.extend(df_to_save.values.tolist())
-
+        # Колонки беремо напряму з DataFrame без копії; відсутні заповнюємо порожніми рядками
+        n_rows = len(df)
+        columns = [
+            df[col].to_numpy(dtype=object) if col in df.columns else np.full(n_rows, '', dtype=object)
+            for col in REQUIRED_COLUMNS
+        ]
+        data_to_write = [list(REQUIRED_COLUMNS)]
+        data_to_write.extend(map(list, zip(*columns)))
+
+        # Спершу записуємо нові дані поверх старих, потім очищаємо лише залишки праворуч і знизу,
+        # щоб аркуш ні на мить не залишався порожнім для інших читачів
         _execute_with_retry(
             "save_queue_data_full.update",
             lambda: SHEETS_SERVICE.spreadsheets().values().update(
@@ -185,6 +469,15 @@ def save_queue_data_full(df: pd.DataFrame) -> bool:
                 body={'values': data_to_write}
             ).execute()
         )
+        last_row = len(data_to_write)
+        first_free_col = chr(ord('A') + len(REQUIRED_COLUMNS))
+        _execute_with_retry(
+            "save_queue_data_full.clear",
+            lambda: SHEETS_SERVICE.spreadsheets().values().batchClear(
+                spreadsheetId=SPREADSHEET_ID,
+                body={'ranges': [f"{SHEET_NAME}!A{last_row + 1}:Z", f"{SHEET_NAME}!{first_free_col}1:Z{last_row}"]}
+            ).execute()
+        )
         logger.info(f"Дані успішно записано до Google Sheet '{SHEET_NAME}'.")
         return True
     except HttpError as err:
@@ -197,61 +490,196 @@ def save_queue_data_full(df: pd.DataFrame) -> bool:
         return False
 
 
+def batch_get_values(spreadsheet_id: str, ranges: list, func_name: str = "batch_get_values") -> dict:
+    """
+    Читає кілька діапазонів однієї таблиці одним запитом values.batchGet.
+    Повертає словник {діапазон: список рядків} у порядку запиту.
+    """
+    from vlk_bot.config import SHEETS_SERVICE
+    
+    result = _execute_with_retry(
+        func_name,
+        lambda: SHEETS_SERVICE.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id, ranges=ranges
+        ).execute()
+    )
+    value_ranges = result.get('valueRanges', [])
+    return {range_name: value_range.get('values', []) for range_name, value_range in zip(ranges, value_ranges)}
+
+
+def fetch_all_sheets() -> dict:
+    """
+    Завантажує аркуш 'Stats' таблиці статистики через values.batchGet.
+    Повертає словник {діапазон: список рядків}.
+    """
+    from vlk_bot.config import STATS_SHEET_ID, STATS_WORKSHEET_NAME
+    
+    ranges = [f"{STATS_WORKSHEET_NAME}!A1:Z"]
+    return batch_get_values(STATS_SHEET_ID, ranges, func_name="fetch_all_sheets")
+
+
+# Числові колонки stats та їх цілочисельні типи (з підтримкою пропусків)
+STATS_INT_COLUMNS = {
+    'Останній номер що зайшов': 'Int32',
+    'Перший номер що зайшов': 'Int32',
+    'Зайшов': 'Int16',
+}
+
+
+def _prepare_stats_df(stats_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Приводить числові колонки та дату прийому stats до потрібних типів.
+    Числа перетворюються один раз при завантаженні, щоб не розбирати їх на кожен запит.
+    """
+    for column, dtype in STATS_INT_COLUMNS.items():
+        if column in stats_df.columns:
+            stats_df[column] = pd.to_numeric(stats_df[column], errors='coerce').round().astype(dtype)
+    stats_df['Дата прийому'] = pd.to_datetime(stats_df['Дата прийому'], format="%d.%m.%Y", dayfirst=True, errors='coerce')
+    return stats_df
+
+
+def _calculate_last_entered_max(stats_df: pd.DataFrame) -> int | None:
+    """Повертає найбільший номер, що вже зайшов, або None."""
+    if 'Останній номер що зайшов' not in stats_df.columns:
+        return None
+    last_entered = stats_df['Останній номер що зайшов']
+    if not pd.api.types.is_numeric_dtype(last_entered):
+        last_entered = pd.to_numeric(last_entered, errors='coerce')
+    last_entered = last_entered.to_numpy(dtype=float, na_value=np.nan)
+    last_entered = last_entered[~np.isnan(last_entered)]
+    return int(last_entered.max()) if last_entered.size else None
+
+
+def _calculate_recent_entry_counts(stats_df: pd.DataFrame) -> np.ndarray:
+    """
+    Повертає відсортований масив кількості тих, хто зайшов, за останні RECENT_ENTRY_DAYS днів прийому.
+    """
+    if 'Зайшов' not in stats_df.columns:
+        return np.empty(0, dtype=np.int64)
+    counts = stats_df['Зайшов']
+    if not pd.api.types.is_numeric_dtype(counts):
+        counts = pd.to_numeric(counts, errors='coerce')
+    counts = counts.to_numpy(dtype=float, na_value=np.nan)
+    counts = counts[counts > 0][-RECENT_ENTRY_DAYS:]
+    return np.sort(counts.astype(np.int64))
+
+
+def _store_stats_cache(stats_df: pd.DataFrame, revision: str | None):
+    """Зберігає stats у кеші в пам'яті разом з попередньо обчисленими агрегатами."""
+    _STATS_CACHE["df"] = stats_df
+    _STATS_CACHE["rev"] = revision
+    _STATS_CACHE["loaded_at"] = datetime.datetime.now()
+    _STATS_CACHE["last_entered_max"] = _calculate_last_entered_max(stats_df)
+    _STATS_CACHE["recent_entry_counts"] = _calculate_recent_entry_counts(stats_df)
+
+
+def get_last_entered_max(stats_df: pd.DataFrame) -> int | None:
+    """
+    Повертає найбільший номер, що вже зайшов. Для закешованого stats_df значення
+    береться з кешу, для будь-якого іншого DataFrame обчислюється на місці.
+    """
+    if stats_df is _STATS_CACHE["df"]:
+        return _STATS_CACHE["last_entered_max"]
+    return _calculate_last_entered_max(stats_df)
+
+
+def get_recent_entry_counts(stats_df: pd.DataFrame) -> np.ndarray:
+    """
+    Повертає відсортовану кількість тих, хто зайшов, за останні дні прийому.
+    Для закешованого stats_df масив береться з кешу.
+    """
+    if stats_df is _STATS_CACHE["df"]:
+        return _STATS_CACHE["recent_entry_counts"]
+    return _calculate_recent_entry_counts(stats_df)
+
+
 async def get_stats_data(force_refresh: bool = False) -> pd.DataFrame | None:
+    """
+    Завантажує дані з аркуша 'Stats' в окремому потоці, не блокуючи event loop бота.
+    """
+    return await asyncio.to_thread(_get_stats_data_sync, force_refresh)
+
+
+def write_csv_atomic(df: pd.DataFrame, path: str):
+    """Записує CSV через тимчасовий файл, щоб паралельні читачі не бачили частково записаний файл."""
+    tmp_path = f"{path}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _get_stats_data_sync(force_refresh: bool = False) -> pd.DataFrame | None:
+    """Серіалізує оновлення кешу Stats між потоками."""
+    with _STATS_LOCK:
+        return _load_stats_data(force_refresh)
+
+
+def _load_stats_data(force_refresh: bool = False) -> pd.DataFrame | None:
     """
     Завантажує дані з аркуша 'Stats'.
-    Використовує локальний кеш з TTL 30 хвилин.
+    Використовує кеш у пам'яті та локальний кеш з TTL 30 хвилин.
+    Після спливання TTL спершу перевіряється версія таблиці, і якщо вона не змінилась - 
+    дані повторно не завантажуються.
     """
     from vlk_bot.config import (
-        SHEETS_SERVICE, STATS_SHEET_ID, STATS_WORKSHEET_NAME, 
+        STATS_SHEET_ID, STATS_WORKSHEET_NAME, 
         DAILY_SHEETS_CACHE_DIR, STATS_CACHE_TTL_MINUTES
     )
     
     stats_cache_file = os.path.join(DAILY_SHEETS_CACHE_DIR, "_stats.csv")
+    revision = None
+    
+    if not force_refresh and _STATS_CACHE["df"] is not None:
+        age_minutes = (datetime.datetime.now() - _STATS_CACHE["loaded_at"]).total_seconds() / 60
+        if age_minutes < STATS_CACHE_TTL_MINUTES:
+            return _STATS_CACHE["df"]
+        
+        revision = get_spreadsheet_revision(STATS_SHEET_ID)
+        if revision is not None and revision == _STATS_CACHE["rev"]:
+            _STATS_CACHE["loaded_at"] = datetime.datetime.now()
+            logger.debug(f"Stats не змінились (версія {revision}), використано кеш")
+            return _STATS_CACHE["df"]
     
-    if not force_refresh and os.path.exists(stats_cache_file):
+    if not force_refresh and _STATS_CACHE["df"] is None and os.path.exists(stats_cache_file):
         mod_time = datetime.datetime.fromtimestamp(os.path.getmtime(stats_cache_file))
         age_minutes = (datetime.datetime.now() - mod_time).total_seconds() / 60
         
         if age_minutes < STATS_CACHE_TTL_MINUTES:
             try:
-                stats_df = pd.read_csv(stats_cache_file)
-                if 'Останній номер що зайшов' in stats_df.columns:
-                    stats_df['Останній номер що зайшов'] = pd.to_numeric(stats_df['Останній номер що зайшов'], errors='coerce')
-                if 'Перший номер що зайшов' in stats_df.columns:
-                    stats_df['Перший номер що зайшов'] = pd.to_numeric(stats_df['Перший номер що зайшов'], errors='coerce')
-                stats_df['Дата прийому'] = pd.to_datetime(stats_df['Дата прийому'], format="%d.%m.%Y", dayfirst=True, errors='coerce')
+                stats_df = _prepare_stats_df(pd.read_csv(stats_cache_file))
+                _store_stats_cache(stats_df, None)
+                _STATS_CACHE["loaded_at"] = mod_time
                 logger.debug(f"Stats з кешу (вік: {age_minutes:.1f} хв)")
                 return stats_df
             except Exception as e:
                 logger.warning(f"Помилка читання кешу stats: {e}, завантажуємо з API")
     
     try:
+        if revision is None:
+            revision = get_spreadsheet_revision(STATS_SHEET_ID)
         range_name = f"{STATS_WORKSHEET_NAME}!A1:Z"
-        result = _execute_with_retry(
-            "get_stats_data",
-            lambda: SHEETS_SERVICE.spreadsheets().values().get(
-                spreadsheetId=STATS_SHEET_ID, range=range_name
-            ).execute()
-        )
+        sheets_data = fetch_all_sheets()
         
-        list_of_lists = result.get("values", [])
+        list_of_lists = sheets_data.get(range_name, [])
 
         if not list_of_lists:
             logger.warning("Аркуш 'Stats' порожній.")
             return pd.DataFrame()
 
-        stats_df = pd.DataFrame(list_of_lists[1:], columns=list_of_lists[0])
+        # Короткі рядки (API обрізає порожні клітинки в кінці) доповнюються None,
+        # а масив передається у column-major порядку, щоб колонки лежали неперервно
+        columns = list_of_lists[0]
+        rows = np.full((len(list_of_lists) - 1, len(columns)), None, dtype=object)
+        for i, row in enumerate(list_of_lists[1:]):
+            row_len = min(len(row), len(columns))
+            rows[i, :row_len] = row[:row_len]
+        stats_df = pd.DataFrame(np.asfortranarray(rows), columns=columns)
         
         os.makedirs(DAILY_SHEETS_CACHE_DIR, exist_ok=True)
-        stats_df.to_csv(stats_cache_file, index=False)
+        write_csv_atomic(stats_df, stats_cache_file)
         logger.info(f"Stats завантажено з API та збережено в кеш ({len(stats_df)} рядків)")
         
-        if 'Останній номер що зайшов' in stats_df.columns:
-            stats_df['Останній номер що зайшов'] = pd.to_numeric(stats_df['Останній номер що зайшов'], errors='coerce')
-        if 'Перший номер що зайшов' in stats_df.columns:
-            stats_df['Перший номер що зайшов'] = pd.to_numeric(stats_df['Перший номер що зайшов'], errors='coerce')
-        stats_df['Дата прийому'] = pd.to_datetime(stats_df['Дата прийому'], format="%d.%m.%Y", dayfirst=True, errors='coerce')
+        stats_df = _prepare_stats_df(stats_df)
+        _store_stats_cache(stats_df, revision)
         
         return stats_df
 
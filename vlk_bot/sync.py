@@ -6,15 +6,30 @@ import csv
 import datetime
 import logging
 import os
+import random
+import threading
 import time
 
 import pandas as pd
 from googleapiclient.errors import HttpError
 
+from vlk_bot.sheets import SHEETS_API_LOCK, write_csv_atomic
+
 logger = logging.getLogger(__name__)
 
 DAILY_SHEETS_CACHE_DIR = "daily_sheets_cache"
 SYNC_CACHE_TTL_MINUTES = 30
+# Скільки щоденних аркушів запитується одним batchGet
+DAILY_SHEETS_BATCH_SIZE = 50
+# Верхня межа паузи між повторними спробами, секунд
+MAX_RETRY_DELAY = 30.0
+
+# Розібрані записи тих, хто зайшов, для кожного CSV щоденного аркуша: шлях -> (час зміни файлу, записи).
+# Аркуші минулих днів не змінюються, тож повторні розрахунки не розбирають їх знову
+_ATTENDED_IDS_CACHE = {}
+
+# Синхронізація може викликатися з кількох потоків (прогнози в обробниках), виконуємо її по черзі
+_SYNC_LOCK = threading.Lock()
 
 
 def ensure_cache_dir():
@@ -26,10 +41,11 @@ def download_stats(sheets_service, stats_sheet_id, stats_worksheet_name):
     """Завантажує stats аркуш."""
     try:
         range_name = f"{stats_worksheet_name}!A:Z"
-        result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=stats_sheet_id,
-            range=range_name
-        ).execute()
+        with SHEETS_API_LOCK:
+            result = sheets_service.spreadsheets().values().get(
+                spreadsheetId=stats_sheet_id,
+                range=range_name
+            ).execute()
         
         values = result.get('values', [])
         if not values:
@@ -49,7 +65,7 @@ def download_stats(sheets_service, stats_sheet_id, stats_worksheet_name):
         df = pd.DataFrame(normalized_data, columns=headers)
         
         stats_file = os.path.join(DAILY_SHEETS_CACHE_DIR, "_stats.csv")
-        df.to_csv(stats_file, index=False)
+        write_csv_atomic(df, stats_file)
         logger.info(f"Stats оновлено: {len(df)} рядків")
         
         return df
@@ -59,27 +75,49 @@ def download_stats(sheets_service, stats_sheet_id, stats_worksheet_name):
         return None
 
 
-def download_daily_sheet(sheets_service, stats_sheet_id, sheet_name, retry_delay=0.5):
+def _backoff_delay(retry_delay, attempt):
     """
-    Завантажує один щоденний аркуш за назвою.
+    Пауза перед повторною спробою з повним випадковим розкидом (full jitter): одночасні
+    запити, що отримали 429, повторюються в різний час, а не однією хвилею.
     """
+    return random.uniform(0, min(retry_delay * (2 ** attempt), MAX_RETRY_DELAY))
+
+
+def _daily_sheet_cache_file(sheet_name):
+    """Повертає шлях до кешу щоденного аркуша або None, якщо назва аркуша не є датою."""
     try:
         date_obj = datetime.datetime.strptime(sheet_name, "%d.%m.%Y").date()
-        cache_filename = date_obj.strftime("%Y-%m-%d.csv")
     except ValueError:
         logger.error(f"Невірний формат дати: {sheet_name}")
+        return None
+    return os.path.join(DAILY_SHEETS_CACHE_DIR, date_obj.strftime("%Y-%m-%d.csv"))
+
+
+def _write_daily_sheet(cache_file, values):
+    """Записує рядки щоденного аркуша у CSV-кеш."""
+    with open(cache_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for row in values:
+            writer.writerow(row)
+
+
+def download_daily_sheet(sheets_service, stats_sheet_id, sheet_name, retry_delay=0.5):
+    """
+    Завантажує один щоденний аркуш за назвою.
+    """
+    cache_file = _daily_sheet_cache_file(sheet_name)
+    if cache_file is None:
         return False
     
-    cache_file = os.path.join(DAILY_SHEETS_CACHE_DIR, cache_filename)
-    
     max_retries = 3
     for attempt in range(max_retries):
         try:
             range_name = f"{sheet_name}!A:Z"
-            result = sheets_service.spreadsheets().values().get(
-                spreadsheetId=stats_sheet_id,
-                range=range_name
-            ).execute()
+            with SHEETS_API_LOCK:
+                result = sheets_service.spreadsheets().values().get(
+                    spreadsheetId=stats_sheet_id,
+                    range=range_name
+                ).execute()
             
             values = result.get('values', [])
             
@@ -87,19 +125,16 @@ def download_daily_sheet(sheets_service, stats_sheet_id, sheet_name, retry_delay
                 logger.warning(f"Аркуш {sheet_name} порожній")
                 return False
             
-            with open(cache_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                for row in values:
-                    writer.writerow(row)
+            _write_daily_sheet(cache_file, values)
             
-            logger.debug(f"Завантажено {sheet_name} -> {cache_filename}")
+            logger.debug(f"Завантажено {sheet_name} -> {os.path.basename(cache_file)}")
             return True
             
         except HttpError as err:
             if err.resp.status == 429:
                 if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    logger.warning(f"Rate limit для {sheet_name}, чекаю {wait_time}s...")
+                    wait_time = _backoff_delay(retry_delay, attempt)
+                    logger.warning(f"Rate limit для {sheet_name}, чекаю {wait_time:.2f}s...")
                     time.sleep(wait_time)
                     continue
                 else:
@@ -110,8 +145,8 @@ def download_daily_sheet(sheets_service, stats_sheet_id, sheet_name, retry_delay
             return False
         except (ConnectionError, BrokenPipeError, OSError) as e:
             if attempt < max_retries - 1:
-                wait_time = retry_delay * (2 ** attempt)
-                logger.warning(f"Мережева помилка для {sheet_name} ({type(e).__name__}), чекаю {wait_time}s...")
+                wait_time = _backoff_delay(retry_delay, attempt)
+                logger.warning(f"Мережева помилка для {sheet_name} ({type(e).__name__}), чекаю {wait_time:.2f}s...")
                 time.sleep(wait_time)
                 continue
             else:
@@ -124,11 +159,90 @@ def download_daily_sheet(sheets_service, stats_sheet_id, sheet_name, retry_delay
     return False
 
 
+def _batch_get_daily_sheets(sheets_service, stats_sheet_id, sheet_names, retry_delay=0.5):
+    """
+    Отримує значення кількох аркушів одним запитом batchGet.
+    Повертає список valueRanges у порядку sheet_names або None, якщо пакетний запит не вдався.
+    """
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            with SHEETS_API_LOCK:
+                result = sheets_service.spreadsheets().values().batchGet(
+                    spreadsheetId=stats_sheet_id,
+                    ranges=[f"{sheet_name}!A:Z" for sheet_name in sheet_names]
+                ).execute()
+            return result.get('valueRanges', [])
+        except HttpError as err:
+            if err.resp.status == 429 and attempt < max_retries - 1:
+                wait_time = _backoff_delay(retry_delay, attempt)
+                logger.warning(f"Rate limit для пакета з {len(sheet_names)} аркушів, чекаю {wait_time:.2f}s...")
+                time.sleep(wait_time)
+                continue
+            # 400 - у пакеті є аркуш, якого не існує; такі аркуші обробляються поодинці
+            logger.warning(f"Пакетне завантаження аркушів не вдалося (HTTP {err.resp.status})")
+            return None
+        except (ConnectionError, BrokenPipeError, OSError) as e:
+            if attempt < max_retries - 1:
+                wait_time = _backoff_delay(retry_delay, attempt)
+                logger.warning(f"Мережева помилка пакетного завантаження ({type(e).__name__}), чекаю {wait_time:.2f}s...")
+                time.sleep(wait_time)
+                continue
+            logger.error(f"Мережева помилка пакетного завантаження після {max_retries} спроб: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Невідома помилка пакетного завантаження аркушів: {e}")
+            return None
+    
+    return None
+
+
+def download_daily_sheets(sheets_service, stats_sheet_id, sheet_names):
+    """
+    Завантажує щоденні аркуші пакетами по DAILY_SHEETS_BATCH_SIZE (один batchGet на пакет).
+    Якщо пакет не вдалося отримати, його аркуші завантажуються поодинці.
+    Повертає кількість збережених аркушів.
+    """
+    saved_count = 0
+    for start in range(0, len(sheet_names), DAILY_SHEETS_BATCH_SIZE):
+        batch = sheet_names[start:start + DAILY_SHEETS_BATCH_SIZE]
+        value_ranges = _batch_get_daily_sheets(sheets_service, stats_sheet_id, batch)
+        
+        if value_ranges is None:
+            for i, sheet_name in enumerate(batch):
+                if download_daily_sheet(sheets_service, stats_sheet_id, sheet_name):
+                    saved_count += 1
+                if i < len(batch) - 1:
+                    time.sleep(0.3)
+            continue
+        
+        for sheet_name, value_range in zip(batch, value_ranges):
+            cache_file = _daily_sheet_cache_file(sheet_name)
+            if cache_file is None:
+                continue
+            values = value_range.get('values', [])
+            if not values:
+                logger.warning(f"Аркуш {sheet_name} порожній")
+                continue
+            _write_daily_sheet(cache_file, values)
+            saved_count += 1
+            logger.debug(f"Завантажено {sheet_name} -> {os.path.basename(cache_file)}")
+    
+    return saved_count
+
+
 def sync_daily_sheets(sheets_service, stats_sheet_id, stats_worksheet_name, 
                       force_refresh_stats=False, force_refresh_all_sheets=False):
     """
     Синхронізує щоденні аркуші на основі колонки "Аркуш" зі stats.
     """
+    with _SYNC_LOCK:
+        return _sync_daily_sheets(sheets_service, stats_sheet_id, stats_worksheet_name,
+                                  force_refresh_stats, force_refresh_all_sheets)
+
+
+def _sync_daily_sheets(sheets_service, stats_sheet_id, stats_worksheet_name, 
+                       force_refresh_stats=False, force_refresh_all_sheets=False):
     ensure_cache_dir()
     
     attendance_file = os.path.join(os.path.dirname(__file__), "..", "attendance_data.json")
@@ -201,12 +315,8 @@ def sync_daily_sheets(sheets_service, stats_sheet_id, stats_worksheet_name,
     sheets_updated = False
     if sheets_to_update:
         logger.info(f"Завантаження {len(sheets_to_update)} аркушів (включно з оновленням останніх {REFRESH_LAST_N_DAYS} днів)...")
-        for i, sheet_name in enumerate(sheets_to_update):
-            if download_daily_sheet(sheets_service, stats_sheet_id, sheet_name):
-                sheets_updated = True
-            
-            if i < len(sheets_to_update) - 1:
-                time.sleep(0.3)
+        if download_daily_sheets(sheets_service, stats_sheet_id, sheets_to_update):
+            sheets_updated = True
     
     if sheets_updated or should_refresh:
         logger.info("Оновлення attendance_data.json...")
@@ -221,55 +331,48 @@ def parse_daily_sheet_attendance(csv_file):
     """
     Парсить щоденний аркуш і повертає дані про ФАКТИЧНУ відвідуваність.
     """
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
-    
-    if len(rows) < 4:
-        return None
-    
-    data_start_idx = None
-    for i, row in enumerate(rows):
-        if len(row) > 0 and row[0].strip() == '№':
-            data_start_idx = i + 1
-            break
-    
-    if data_start_idx is None:
-        return None
-    
     attended = 0
     no_show = 0
     postponed = 0
     total = 0
+    row_count = 0
+    found_header = False
     
-    for row in rows[data_start_idx:]:
-        if len(row) < 3:
-            continue
-        
-        number = row[0].strip()
-        person_id = row[1].strip()
-        status = row[2].strip()
-        
-        if not number:
-            continue
-        
-        if not number.isdigit():
-            continue
-        
-        if not any(char.isdigit() for char in person_id):
-            continue
+    # Файл читається потоково: до рядка-заголовка '№' рядки лише пропускаються
+    with open(csv_file, 'r', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            row_count += 1
+            if not found_header:
+                found_header = len(row) > 0 and row[0].strip() == '№'
+                continue
             
-        total += 1
-        status_lower = status.lower()
-        
-        if 'зайшов' in status_lower and 'не зайшов' not in status_lower and "не з'явився" not in status_lower:
-            attended += 1
-        elif 'не зайшов' in status_lower or "не з'явився" in status_lower:
-            no_show += 1
-        elif 'відклав' in status_lower:
-            postponed += 1
-    
-    if total == 0:
+            if len(row) < 3:
+                continue
+            
+            number = row[0].strip()
+            person_id = row[1].strip()
+            status = row[2].strip()
+            
+            if not number:
+                continue
+            
+            if not number.isdigit():
+                continue
+            
+            if not any(char.isdigit() for char in person_id):
+                continue
+                
+            total += 1
+            status_lower = status.lower()
+            
+            if 'зайшов' in status_lower and 'не зайшов' not in status_lower and "не з'явився" not in status_lower:
+                attended += 1
+            elif 'не зайшов' in status_lower or "не з'явився" in status_lower:
+                no_show += 1
+            elif 'відклав' in status_lower:
+                postponed += 1
+    
+    if row_count < 4 or total == 0:
         return None
     
     return {
@@ -285,46 +388,61 @@ def extract_attended_ids_from_sheet(csv_file):
     """
     Витягує список ID людей які ЗАЙШЛИ з щоденного аркуша.
     """
+    attended_ids = []
+    row_count = 0
+    found_header = False
+    
+    # Файл читається потоково: до рядка-заголовка '№' рядки лише пропускаються
     with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
+        for row in csv.reader(f):
+            row_count += 1
+            if not found_header:
+                found_header = len(row) > 0 and row[0].strip() == '№'
+                continue
+            
+            if len(row) < 3:
+                continue
+            
+            number = row[0].strip()
+            person_id = row[1].strip()
+            status = row[2].strip()
+            
+            if not number or not person_id or not number.isdigit():
+                continue
+            
+            if not any(char.isdigit() for char in person_id):
+                continue
+                
+            id_val = person_id.strip()
+            
+            status_lower = status.lower()
+            if 'зайшов' in status_lower and 'не зайшов' not in status_lower and "не з'явився" not in status_lower:
+                is_live = 'за живою чергою' in status_lower
+                attended_ids.append({'id': id_val, 'is_live': is_live})
     
-    if len(rows) < 4:
+    # Як і раніше, аркуш коротший за 4 рядки вважається порожнім
+    if row_count < 4:
         return []
     
-    data_start_idx = None
-    for i, row in enumerate(rows):
-        if len(row) > 0 and row[0].strip() == '№':
-            data_start_idx = i + 1
-            break
-    
-    if data_start_idx is None:
+    return attended_ids
+
+
+def load_attended_ids(csv_file):
+    """
+    Повертає записи тих, хто зайшов, з кешу в пам'яті; CSV розбирається заново лише якщо файл змінився.
+    """
+    try:
+        mtime = os.stat(csv_file).st_mtime_ns
+    except OSError:
         return []
     
-    attended_ids = []
-    
-    for row in rows[data_start_idx:]:
-        if len(row) < 3:
-            continue
-        
-        number = row[0].strip()
-        person_id = row[1].strip()
-        status = row[2].strip()
-        
-        if not number or not person_id or not number.isdigit():
-            continue
-        
-        if not any(char.isdigit() for char in person_id):
-            continue
-            
-        id_val = person_id.strip()
-        
-        status_lower = status.lower()
-        if 'зайшов' in status_lower and 'не зайшов' not in status_lower and "не з'явився" not in status_lower:
-            is_live = 'за живою чергою' in status_lower
-            attended_ids.append({'id': id_val, 'is_live': is_live})
+    cached = _ATTENDED_IDS_CACHE.get(csv_file)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
     
-    return attended_ids
+    attended_data = extract_attended_ids_from_sheet(csv_file)
+    _ATTENDED_IDS_CACHE[csv_file] = (mtime, attended_data)
+    return attended_data
 
 
 def get_historical_attendance_data():
@@ -350,7 +468,7 @@ def get_historical_attendance_data():
             continue
         
         filepath = os.path.join(DAILY_SHEETS_CACHE_DIR, filename)
-        attended_data = extract_attended_ids_from_sheet(filepath)
+        attended_data = load_attended_ids(filepath)
         
         if attended_data:
             attended_ids = []
@@ -431,7 +549,7 @@ def generate_attendance_json(output_file='attendance_data.json'):
         
         visit_date = sheet_to_date[sheet_name]
         filepath = os.path.join(DAILY_SHEETS_CACHE_DIR, filename)
-        attended_data = extract_attended_ids_from_sheet(filepath)
+        attended_data = load_attended_ids(filepath)
         
         if attended_data:
             for person_data in attended_data:
@@ -455,6 +573,16 @@ def generate_attendance_json(output_file='attendance_data.json'):
         return False
 
 
+def get_attendance_revision(json_file='attendance_data.json'):
+    """
+    Повертає версію attendance_data.json (час зміни файлу) або None, якщо файлу немає.
+    """
+    try:
+        return os.stat(json_file).st_mtime_ns
+    except OSError:
+        return None
+
+
 def load_attendance_from_json(json_file='attendance_data.json'):
     """
     Завантажує дані відвідуваності з JSON файлу.
@@ -3,15 +3,27 @@
 """
 
 import datetime
-import json
 import logging
 import os
 import re
+from functools import lru_cache
 
+import numpy as np
+import orjson
 from telegram import User
 
 logger = logging.getLogger(__name__)
 
+_ID_PREFIX_RE = re.compile(r'^\d+')
+# Номер у черзі: ціле число або два цілих числа через слеш (9999 або 9999/1)
+QUEUE_ID_RE = re.compile(r'\d+(?:/\d+)?')
+# Звичайний ID з ASCII-цифр для векторного розбору; решта йде через id_to_numeric
+_PLAIN_ID_PATTERN = r'^(?P<main>[0-9]+)(?:/(?P<sub>[0-9]+))?$'
+
+# Якірна дата для ordinal: 5 січня 1970 року (понеділок)
+_ORDINAL_ANCHOR = datetime.date(1970, 1, 5)
+_ORDINAL_ANCHOR_NP = np.datetime64(_ORDINAL_ANCHOR, 'D')
+
 
 def is_admin(user_id: int) -> bool:
     """Перевіряє, чи є користувач адміністратором."""
@@ -53,7 +65,10 @@ def get_user_telegram_data(user: User) -> dict:
 def extract_main_id(id_string):
     """Витягує основний номер ID з рядка."""
     if isinstance(id_string, str):
-        match = re.match(r'^\d+', id_string)
+        # Найчастіший випадок - ID без дробу, наприклад "9999"
+        if id_string.isdecimal():
+            return int(id_string)
+        match = _ID_PREFIX_RE.match(id_string)
         if match:
             return int(match.group())
     return None
@@ -63,35 +78,56 @@ def load_status_state() -> dict:
     """Завантажує останній відомий стан статусів з JSON-файлу."""
     from vlk_bot.config import STATUS_FILE
     if os.path.exists(STATUS_FILE):
-        with open(STATUS_FILE, "r", encoding='utf8') as f:
-            return json.load(f)
+        with open(STATUS_FILE, "rb") as f:
+            return orjson.loads(f.read())
     return {}
 
 
 def save_status_state(state: dict):
-    """Зберігає поточний стан статусів у JSON-файл."""
+    """Зберігає поточний стан статусів у JSON-файл (через тимчасовий файл, щоб читачі не бачили його частково)."""
     from vlk_bot.config import STATUS_FILE
-    with open(STATUS_FILE, "w", encoding='utf8') as f:
-        json.dump(state, f, indent=4, ensure_ascii=False)
+    tmp_path = f"{STATUS_FILE}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(state, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    os.replace(tmp_path, STATUS_FILE)
 
 
 def get_ordinal_date(date_obj):
     """Конвертує дату в ordinal (порядковий номер робочого дня) для регресії."""
-    # Якірна дата: 5 січня 1970 року (понеділок)
-    anchor = datetime.date(1970, 1, 5)
-    diff = (date_obj - anchor).days
-    weeks = diff // 7
-    days = diff % 7
+    weeks, days = divmod((date_obj - _ORDINAL_ANCHOR).days, 7)
     return weeks * 5 + min(days, 5)
 
 
+def get_ordinal_dates(dates) -> np.ndarray:
+    """Векторна версія get_ordinal_date для масиву дат."""
+    diff = (np.asarray(dates, dtype='datetime64[D]') - _ORDINAL_ANCHOR_NP).astype(np.int64)
+    weeks, days = np.divmod(diff, 7)
+    return weeks * 5 + np.minimum(days, 5)
+
+
 def get_date_from_ordinal(ordinal):
     """Конвертує ordinal назад в дату."""
-    anchor = datetime.date(1970, 1, 5)
-    weeks = int(ordinal) // 5
-    days = int(ordinal) % 5
-    total_days = weeks * 7 + days
-    return anchor + datetime.timedelta(days=total_days)
+    weeks, days = divmod(int(ordinal), 5)
+    return _ORDINAL_ANCHOR + datetime.timedelta(days=weeks * 7 + days)
+
+
+def to_working_day(date_obj):
+    """Повертає дату без змін, якщо це робочий день, інакше - наступний понеділок."""
+    weekday = date_obj.weekday()
+    return date_obj + datetime.timedelta(days=7 - weekday) if weekday >= 5 else date_obj
+
+
+@lru_cache(maxsize=4096)
+def parse_date_ddmmyyyy(date_str: str) -> datetime.date:
+    """
+    Розбирає дату ДД.ММ.РРРР так само, як strptime з "%d.%m.%Y", але без розбору формату на кожен виклик.
+    Некоректний рядок викликає ValueError.
+    """
+    parts = date_str.split('.')
+    if (len(parts) != 3 or not all(part.isdigit() for part in parts)
+            or len(parts[0]) > 2 or len(parts[1]) > 2 or len(parts[2]) != 4):
+        raise ValueError(f"Некоректна дата: '{date_str}'")
+    return datetime.date(int(parts[2]), int(parts[1]), int(parts[0]))
 
 
 def get_next_working_days(count: int = 3) -> list:
@@ -107,9 +143,13 @@ def get_next_working_days(count: int = 3) -> list:
     return result
 
 
+# Скорочені назви днів тижня (понеділок = 0), не залежать від локалі процесу
+UA_WEEKDAYS = ('Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Нд')
+
+
 def get_ua_weekday(date_obj):
     """Повертає скорочену назву дня тижня."""
-    return date_obj.strftime('%a').title()
+    return UA_WEEKDAYS[date_obj.weekday()]
 
 
 def id_to_numeric(id_val):
@@ -132,12 +172,34 @@ def id_to_numeric(id_val):
             return main + (sub / 100.0)
         return float(s)
     except ValueError:
-        match = re.match(r'^(\d+)', s)
+        match = _ID_PREFIX_RE.match(s)
         if match:
-            return float(match.group(1))
+            return float(match.group())
         return None
 
 
+def ids_to_numeric(id_values) -> np.ndarray:
+    """
+    Векторна версія id_to_numeric для масиву ID.
+    Повертає float-масив, де нерозпізнані ID дорівнюють NaN.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    
+    ids = pc.utf8_trim_whitespace(pa.array([str(value) for value in id_values], type=pa.string()))
+    parts = pc.extract_regex(ids, _PLAIN_ID_PATTERN)
+    main = pc.cast(pc.struct_field(parts, 'main'), pa.float64()).to_numpy(zero_copy_only=False)
+    sub_str = pc.struct_field(parts, 'sub')
+    sub = pc.cast(pc.if_else(pc.equal(sub_str, ''), '0', sub_str), pa.float64()).fill_null(0)
+    result = main + sub.to_numpy(zero_copy_only=False) / 100.0
+    
+    # Нестандартні ID (префікси, пробіли всередині тощо) розбираються поштучно
+    for i in np.flatnonzero(np.isnan(main)).tolist():
+        value = id_to_numeric(ids[i].as_py())
+        result[i] = np.nan if value is None else value
+    return result
+
+
 async def send_group_notification(context, text: str):
     """Надсилає повідомлення в групу."""
     from vlk_bot.config import GROUP_ID, is_bot_in_group